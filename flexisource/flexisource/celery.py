@@ -0,0 +1,19 @@
+"""
+Celery config for flexisource project.
+
+Workers are started with ``celery -A flexisource worker``. Set
+``CELERY_TASK_ALWAYS_EAGER=True`` to run tasks in-process instead.
+
+For more information on this file, see
+https://docs.celeryq.dev/en/stable/django/first-steps-with-django.html
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "flexisource.settings")
+
+app = Celery("flexisource")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "flexitrade.middleware.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -77,19 +78,237 @@ WSGI_APPLICATION = "flexisource.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# DATABASE_ENGINE selects the profile: "sqlite" (the default) for a single
+# machine, or "postgresql" to scale out to several app and Celery workers.
+
+DATABASE_ENGINE = config("DATABASE_ENGINE", default="sqlite")
+# The alias of the read replica, if one is configured below
+DATABASE_REPLICA_ALIAS = config("DATABASE_REPLICA_ALIAS", default="replica")
+
+if DATABASE_ENGINE == "postgresql":
+    # With POSTGRES_POOL_MAX_SIZE set, every worker process keeps a psycopg
+    # pool of connections. Otherwise connections persist for CONN_MAX_AGE
+    # seconds, and are checked before reuse. Django can't do both at once.
+    POSTGRES_POOL_MAX_SIZE = config(
+        "POSTGRES_POOL_MAX_SIZE", default=0, cast=int
+    )
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": config("POSTGRES_DB", default="flexisource"),
+            "USER": config("POSTGRES_USER", default="flexisource"),
+            "PASSWORD": config("POSTGRES_PASSWORD", default=""),
+            "HOST": config("POSTGRES_HOST", default="localhost"),
+            "PORT": config("POSTGRES_PORT", default=5432, cast=int),
+            "CONN_MAX_AGE": (
+                0
+                if POSTGRES_POOL_MAX_SIZE
+                else config("CONN_MAX_AGE", default=600, cast=int)
+            ),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
     }
-}
+    if POSTGRES_POOL_MAX_SIZE:
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": config("POSTGRES_POOL_MIN_SIZE", default=2, cast=int),
+            "max_size": POSTGRES_POOL_MAX_SIZE,
+            "timeout": config("POSTGRES_POOL_TIMEOUT", default=10, cast=int),
+        }
+    # A streaming replica, e.g. on another host, or another local server
+    POSTGRES_REPLICA_HOST = config("POSTGRES_REPLICA_HOST", default="")
+    if POSTGRES_REPLICA_HOST:
+        DATABASES[DATABASE_REPLICA_ALIAS] = {
+            **DATABASES["default"],
+            "HOST": POSTGRES_REPLICA_HOST,
+            "PORT": config(
+                "POSTGRES_REPLICA_PORT",
+                default=DATABASES["default"]["PORT"],
+                cast=int,
+            ),
+            "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+        }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": config(
+                "SQLITE_PATH", default=str(BASE_DIR / "db.sqlite3")
+            ),
+            "OPTIONS": {
+                # In WAL mode readers don't block the writer, nor the reverse
+                "init_command": (
+                    "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;"
+                ),
+                # Seconds a writer waits for the write lock before failing
+                "timeout": config("SQLITE_BUSY_TIMEOUT", default=20, cast=int),
+                # SQLite has no row locks: take the write lock when a
+                # transaction starts, so what it read can't change before it
+                # writes
+                "transaction_mode": "IMMEDIATE",
+            },
+        }
+    }
+    # A copy of the database file, refreshed by `sync_replica`
+    SQLITE_REPLICA_PATH = config("SQLITE_REPLICA_PATH", default="")
+    if SQLITE_REPLICA_PATH:
+        DATABASES[DATABASE_REPLICA_ALIAS] = {
+            **DATABASES["default"],
+            "NAME": SQLITE_REPLICA_PATH,
+            "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+        }
+
+# Read replica
+# The read-only endpoints (portfolio, trade history, market) read from the
+# DATABASE_REPLICA_ALIAS database, if configured above, except for
+# REPLICA_READ_YOUR_WRITES seconds after the user trades. Writes, and the
+# reads a write depends on, always go to the primary. Tests read the primary.
+
+DATABASE_ROUTERS = ["flexitrade.routers.ReadReplicaRouter"]
+if DATABASE_REPLICA_ALIAS in DATABASES:
+    DATABASES[DATABASE_REPLICA_ALIAS]["TEST"] = {"MIRROR": "default"}
+REPLICA_READ_YOUR_WRITES = config(
+    "REPLICA_READ_YOUR_WRITES", default=10, cast=int
+)
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "flexitrade.authentication.CachedTokenAuthentication",
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "flexitrade.instrumentation.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ],
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory by default. Set REDIS_CACHE_URL to share the cache between
+# processes, e.g. redis://localhost:6379/1
+
+REDIS_CACHE_URL = config("REDIS_CACHE_URL", default="")
+if REDIS_CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+PORTFOLIO_CACHE_ENABLED = config(
+    "PORTFOLIO_CACHE_ENABLED", default=True, cast=bool
+)
+PORTFOLIO_CACHE_TIMEOUT = config(
+    "PORTFOLIO_CACHE_TIMEOUT", default=300, cast=int
+)
+
+# Users of API tokens are cached in each process for TOKEN_CACHE_TIMEOUT
+# seconds, 0 to disable. A deleted token is revoked through the cache above,
+# so it must be shared for every process to honour it at once.
+TOKEN_CACHE_TIMEOUT = config("TOKEN_CACHE_TIMEOUT", default=60, cast=int)
+TOKEN_CACHE_MAX_SIZE = config("TOKEN_CACHE_MAX_SIZE", default=10000, cast=int)
+
+# Trade history
+# /trades/ pages hold TRADE_HISTORY_PAGE_SIZE trades unless a `limit` is
+# given. /trades/export.csv reads TRADE_EXPORT_CHUNK_SIZE rows per query.
+
+TRADE_HISTORY_PAGE_SIZE = config(
+    "TRADE_HISTORY_PAGE_SIZE", default=100, cast=int
+)
+TRADE_HISTORY_MAX_PAGE_SIZE = config(
+    "TRADE_HISTORY_MAX_PAGE_SIZE", default=1000, cast=int
+)
+TRADE_EXPORT_CHUNK_SIZE = config(
+    "TRADE_EXPORT_CHUNK_SIZE", default=2000, cast=int
+)
+
+# Portfolio snapshots
+# build_portfolio_snapshots checkpoints the holdings at the end of every
+# PORTFOLIO_SNAPSHOT_INTERVAL seconds that had trades. Trades younger than
+# PORTFOLIO_SNAPSHOT_DELAY seconds are left to the next run, since they may
+# not be committed yet.
+
+PORTFOLIO_SNAPSHOT_INTERVAL = config(
+    "PORTFOLIO_SNAPSHOT_INTERVAL", default=3600, cast=int
+)
+PORTFOLIO_SNAPSHOT_DELAY = config(
+    "PORTFOLIO_SNAPSHOT_DELAY", default=60, cast=int
+)
+
+# Trade batches
+# The most orders a JSON array posted to /trades/batch/ may have
+
+TRADE_BATCH_MAX_ORDERS = config(
+    "TRADE_BATCH_MAX_ORDERS", default=1000, cast=int
+)
+
+# Stock prices
+# The most ticks a JSON array posted to /prices/ may have
+
+PRICE_UPDATE_MAX_TICKS = config(
+    "PRICE_UPDATE_MAX_TICKS", default=100000, cast=int
+)
+
+# Market
+# /market/<symbol>/holders/ lists MARKET_TOP_HOLDERS_LIMIT holders unless a
+# `limit` is given.
+
+MARKET_TOP_HOLDERS_LIMIT = config(
+    "MARKET_TOP_HOLDERS_LIMIT", default=10, cast=int
+)
+MARKET_TOP_HOLDERS_MAX_LIMIT = config(
+    "MARKET_TOP_HOLDERS_MAX_LIMIT", default=100, cast=int
+)
+
+# Bulk trades
+# Files are streamed in chunks of BULK_TRADE_CHUNK_SIZE rows, so memory use
+# depends on the chunk size rather than the file size.
+
+BULK_TRADE_CHUNK_SIZE = config(
+    "BULK_TRADE_CHUNK_SIZE", default=10000, cast=int
+)
+BULK_TRADE_MAX_ROWS = config("BULK_TRADE_MAX_ROWS", default=1000000, cast=int)
+BULK_TRADE_INBOX_DIR = config(
+    "BULK_TRADE_INBOX_DIR", default=str(BASE_DIR / "inbox")
+)
+
+# Trade journal
+# Every committed trade is also appended to TRADE_JOURNAL_PATH, a binary file
+# of fixed-width records that is replayed without the ORM (see
+# `flexitrade.journal`). An empty path disables the journal.
+
+TRADE_JOURNAL_PATH = config(
+    "TRADE_JOURNAL_PATH", default=str(BASE_DIR / "trades.journal")
+)
+
+# Background jobs
+# https://docs.celeryq.dev/en/stable/django/first-steps-with-django.html
+
+CELERY_BROKER_URL = config(
+    "CELERY_BROKER_URL", default="redis://localhost:6379/0"
+)
+CELERY_TASK_ALWAYS_EAGER = config(
+    "CELERY_TASK_ALWAYS_EAGER", default=False, cast=bool
+)
+
+
+# Instrumentation
+# Queries slower than this are logged with their SQL. 0 disables the log.
+
+SLOW_QUERY_THRESHOLD_MS = config(
+    "SLOW_QUERY_THRESHOLD_MS", default=0, cast=float
+)
+# /metrics/ is only served to staff users, and without authentication to
+# these client addresses, e.g. the Prometheus server: 10.0.0.5,10.0.0.6
+
+METRICS_ALLOWED_IPS = config("METRICS_ALLOWED_IPS", default="", cast=Csv())
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -128,6 +347,10 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded files, e.g. bulk trade files waiting for a worker
+
+MEDIA_ROOT = BASE_DIR / "media"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
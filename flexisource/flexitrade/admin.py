@@ -1,6 +1,17 @@
 from django.contrib import admin
 
-from .models import Stock, Trade
+from .models import (
+    BulkTradeJob,
+    Holding,
+    Stock,
+    StockPrice,
+    StockRollup,
+    Trade,
+)
 
 admin.site.register(Stock)
+admin.site.register(StockPrice)
+admin.site.register(StockRollup)
 admin.site.register(Trade)
+admin.site.register(Holding)
+admin.site.register(BulkTradeJob)
@@ -6,12 +6,24 @@ class FlexitradeConfig(AppConfig):
     name = "flexitrade"
 
     def ready(self):
-        """Override ready hook. Runs after server is ready
-
-        Reference:
-        https://medium.com/@kevin.michael.horan/scheduling-tasks-in-django-with
-        -the-advanced-python-scheduler-663f17e868e6
+        """Measure the SQL queries of every request, on every connection,
+        keep the stock registry coherent with the stocks, revoke the cached
+        tokens that are deleted, and check that deployments share the cache
+        with the job workers
         """
-        from .scheduler import schedule_csv_import
+        from django.core.checks import Tags, register
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+        from rest_framework.authtoken.models import Token
+
+        from .authentication import revoke_deleted_token
+        from .instrumentation import install_query_measurement
+        from .jobs import check_progress_cache
+        from .models import Stock
+        from .stock_registry import invalidate_stock_registry
 
-        schedule_csv_import()
+        connection_created.connect(install_query_measurement)
+        post_save.connect(invalidate_stock_registry, sender=Stock)
+        post_delete.connect(invalidate_stock_registry, sender=Stock)
+        post_delete.connect(revoke_deleted_token, sender=Token)
+        register(check_progress_cache, Tags.caches, deploy=True)
@@ -0,0 +1,98 @@
+"""Token authentication with an in-process cache of token -> user
+
+Every authenticated request would otherwise join `authtoken_token` to
+`auth_user`. The cache is per process and bounded both in size (least
+recently used entries are evicted) and in age, so a user deactivated
+meanwhile is honoured within `TOKEN_CACHE_TIMEOUT` seconds.
+
+A deleted token, e.g. on logout, is revoked at once in every process: the
+revocation is kept in the shared cache, which is checked on every hit of the
+in-process one.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+_entries: "OrderedDict[str, Tuple[float, Tuple]]" = OrderedDict()
+_entries_lock = threading.Lock()
+
+
+def _cached(key) -> Optional[Tuple]:
+    """The (user, token) of a key, if cached and not expired"""
+    with _entries_lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        expires_at, user_auth = entry
+        if expires_at <= time.monotonic():
+            del _entries[key]
+            return None
+        _entries.move_to_end(key)
+        return user_auth
+
+
+def _store(key, user_auth: Tuple) -> None:
+    expires_at = time.monotonic() + settings.TOKEN_CACHE_TIMEOUT
+    with _entries_lock:
+        _entries[key] = (expires_at, user_auth)
+        _entries.move_to_end(key)
+        while len(_entries) > settings.TOKEN_CACHE_MAX_SIZE:
+            _entries.popitem(last=False)
+
+
+def _revoked_key(key) -> str:
+    return f"token:revoked:{key}"
+
+
+def invalidate_token(key) -> None:
+    """Forget a token in this process"""
+    with _entries_lock:
+        _entries.pop(key, None)
+
+
+def revoke_token(key) -> None:
+    """Forget a token in every process, e.g. when it's deleted on logout
+
+    The revocation is kept for as long as a process may have cached it.
+    """
+    invalidate_token(key)
+    if settings.TOKEN_CACHE_TIMEOUT > 0:
+        cache.set(_revoked_key(key), True, settings.TOKEN_CACHE_TIMEOUT)
+
+
+def revoke_deleted_token(sender, instance, **kwargs) -> None:
+    """Signal receiver: revoke every token that is deleted"""
+    revoke_token(instance.key)
+
+
+def clear_token_cache() -> None:
+    with _entries_lock:
+        _entries.clear()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """`TokenAuthentication` that remembers the user of recently seen tokens
+
+    The cached user instances are shared between requests, so views must
+    treat `request.user` as read-only.
+    """
+
+    def authenticate_credentials(self, key):
+        if settings.TOKEN_CACHE_TIMEOUT <= 0:
+            return super().authenticate_credentials(key)
+
+        user_auth = _cached(key)
+        if user_auth is not None and cache.get(_revoked_key(key)):
+            invalidate_token(key)
+            user_auth = None
+        if user_auth is None:
+            # Invalid or inactive tokens raise, and are never cached
+            user_auth = super().authenticate_credentials(key)
+            _store(key, user_auth)
+        return user_auth
@@ -8,3 +8,12 @@ class TradeActionChoices(models.TextChoices):
 
     BUY = ("b", "User buys.")
     SELL = ("s", "User sells.")
+
+
+class BulkTradeJobStatusChoices(models.TextChoices):
+    """Lifecycle of a bulk trade job"""
+
+    PENDING = ("pending", "Waiting for a worker.")
+    RUNNING = ("running", "Being validated and executed.")
+    SUCCEEDED = ("succeeded", "All trades were executed.")
+    FAILED = ("failed", "No trades were executed.")
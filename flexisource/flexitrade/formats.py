@@ -0,0 +1,121 @@
+"""Readers of the bulk trade file formats
+
+A file is read in chunks of `BULK_TRADE_CHUNK_SIZE` rows, whatever its
+format, and every chunk is indexed by its row numbers in the whole file.
+
+CSV is read as strings, to be parsed and checked by the validator. Parquet
+and Arrow IPC files are typed: their columns are cast to the expected types
+when they're read, so an integer `quantity` column needs no parsing at all.
+"""
+
+from contextlib import contextmanager
+from pathlib import PurePath
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc
+import pyarrow.parquet
+from django.conf import settings
+
+# Columns that are identifiers or words, whatever type the file gives them
+STRING_COLUMNS = ["username", "symbol", "action", "order_id"]
+
+# Text stays in Arrow memory, so the validator's string checks are vectorized
+ARROW_STRINGS = {pa.string(): pd.StringDtype("pyarrow")}
+
+CSV_FORMAT = "csv"
+PARQUET_FORMAT = "parquet"
+ARROW_FILE_FORMAT = "arrow"
+ARROW_STREAM_FORMAT = "arrow stream"
+
+FORMATS_BY_EXTENSION = {
+    ".csv": CSV_FORMAT,
+    ".parquet": PARQUET_FORMAT,
+    ".arrow": ARROW_FILE_FORMAT,
+    ".feather": ARROW_FILE_FORMAT,
+    ".arrows": ARROW_STREAM_FORMAT,
+}
+
+
+def file_format(name: str) -> str:
+    """The format of a bulk trade file, by extension. Raises ValueError"""
+    extension = PurePath(name or "").suffix.lower()
+    if extension not in FORMATS_BY_EXTENSION:
+        raise ValueError(
+            "File is not CSV, Parquet or Arrow type "
+            f"({', '.join(FORMATS_BY_EXTENSION)})"
+        )
+    return FORMATS_BY_EXTENSION[extension]
+
+
+def _typed_batch(batch: pa.RecordBatch) -> pa.RecordBatch:
+    """Cast the identifier columns to strings, keep the others as they are"""
+    columns = []
+    for field, column in zip(batch.schema, batch.columns):
+        if field.name in STRING_COLUMNS and not pa.types.is_string(field.type):
+            column = pc.cast(column, pa.string())
+        columns.append(column)
+    return pa.RecordBatch.from_arrays(columns, names=batch.schema.names)
+
+
+def _arrow_chunks(batches: Iterator[pa.RecordBatch]) -> Iterator[pd.DataFrame]:
+    """Group the record batches of a file into numbered chunks"""
+    chunk_size = settings.BULK_TRADE_CHUNK_SIZE
+    pending, pending_rows, first_row = [], 0, 0
+
+    def flush():
+        table = pa.Table.from_batches(pending)
+        df = table.to_pandas(types_mapper=ARROW_STRINGS.get)
+        df.index = pd.RangeIndex(first_row, first_row + len(df))
+        return df
+
+    for batch in batches:
+        batch = _typed_batch(batch)
+        while len(batch):
+            taken = batch.slice(0, chunk_size - pending_rows)
+            batch = batch.slice(len(taken))
+            pending.append(taken)
+            pending_rows += len(taken)
+            if pending_rows == chunk_size:
+                yield flush()
+                pending, pending_rows = [], 0
+                first_row += chunk_size
+
+    if pending_rows:
+        yield flush()
+
+
+@contextmanager
+def read_bulk_file(file, keep_default_na=True) -> Iterator[pd.DataFrame]:
+    """Read a bulk trade file one chunk of rows at a time
+
+    The format is told by the file's name. `keep_default_na=False` reads the
+    blanks of a CSV file as empty strings instead of missing values. Raises
+    ValueError if the file can't be read.
+    """
+    fmt = file_format(getattr(file, "name", ""))
+    if fmt == CSV_FORMAT:
+        with pd.read_csv(
+            file,
+            delimiter=",",
+            dtype=str,
+            keep_default_na=keep_default_na,
+            chunksize=settings.BULK_TRADE_CHUNK_SIZE,
+        ) as reader:
+            yield reader
+        return
+
+    if fmt == PARQUET_FORMAT:
+        batches = pyarrow.parquet.ParquetFile(file).iter_batches(
+            batch_size=settings.BULK_TRADE_CHUNK_SIZE
+        )
+    elif fmt == ARROW_FILE_FORMAT:
+        reader = pyarrow.ipc.open_file(file)
+        batches = (
+            reader.get_batch(i) for i in range(reader.num_record_batches)
+        )
+    else:
+        batches = iter(pyarrow.ipc.open_stream(file))
+    yield _arrow_chunks(batches)
@@ -0,0 +1,210 @@
+"""Maintenance of the materialized `Holding` table"""
+
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from django.db import transaction
+from django.db.models import F
+
+from .enums import TradeActionChoices
+from .models import Holding
+from .portfolio_cache import invalidate_all_portfolios, invalidate_portfolios
+from .queries import chunked, replay_holdings
+from .rollups import (
+    apply_rollup_change,
+    apply_rollup_changes,
+    holder_change,
+    rebuild_rollups,
+)
+from .routers import pin_to_primary
+
+HoldingKey = Tuple[int, int]  # (actor_id, stock_id)
+
+
+class OversellError(Exception):
+    """A sell of more shares than the holding has, found under lock"""
+
+
+def signed_quantity(action, quantity) -> int:
+    """The change in owned shares a trade causes: + for buys, - for sells"""
+    if action == TradeActionChoices.SELL:
+        return -int(quantity)
+    return int(quantity)
+
+
+def lock_owned_shares(owner, stock_id) -> int:
+    """Lock the owner's holding of the stock and return its quantity
+
+    Must be called in the transaction that writes the trade, before checking
+    a sell against the result. On Postgres the holding row is locked with
+    SELECT ... FOR UPDATE until the transaction ends, so only trades of the
+    same user and stock wait for each other.
+
+    SQLite has no row locks and ignores FOR UPDATE. There, transactions are
+    started with BEGIN IMMEDIATE (see `DATABASES`), which takes the database
+    write lock up front. SQLite allows one writer at a time anyway, so this
+    costs no throughput, and the quantity read can't change until commit.
+    """
+    owned_shares = (
+        Holding.objects.select_for_update()
+        .filter(actor=owner, stock_id=stock_id)
+        .values_list("quantity", flat=True)
+    )
+    return next(iter(owned_shares), None) or 0
+
+
+def apply_trade(owner, stock_id, action, quantity) -> None:
+    """Apply a single trade to the owner's holding of the stock
+
+    Must be called in the same transaction as the `Trade` insert. The update
+    is done with an F() expression so concurrent writers don't lose updates.
+    The holding is read locked, so the change in the stock's holders is
+    known exactly and recorded for its rollup.
+    """
+    delta = signed_quantity(action, quantity)
+    holding, created = Holding.objects.select_for_update().get_or_create(
+        actor=owner, stock_id=stock_id, defaults={"quantity": delta}
+    )
+    owned_shares = 0 if created else holding.quantity
+    if not created:
+        Holding.objects.filter(pk=holding.pk).update(
+            quantity=F("quantity") + delta
+        )
+    apply_rollup_change(stock_id, delta, holder_change(owned_shares, delta))
+    invalidate_portfolios([owner.pk])
+    pin_to_primary([owner.pk])
+
+
+def apply_deltas(deltas: Dict[HoldingKey, int]) -> None:
+    """Apply the net change of many trades to the holdings at once
+
+    Must be called in the same transaction as the `Trade` inserts. Existing
+    holdings are locked and read in a few queries, then written back with one
+    bulk update. Missing holdings are bulk created. The net change per stock
+    is then recorded for the rollups.
+
+    Raises `OversellError` if a holding would go negative, i.e. a concurrent
+    trade sold the shares after the batch was validated.
+    """
+    holdings = {}
+    for actor_ids in chunked({actor_id for actor_id, _ in deltas}):
+        for stock_ids in chunked({stock_id for _, stock_id in deltas}):
+            # Locked in primary key order, so that concurrent bulk trades
+            # don't deadlock on each other's holdings
+            queryset = (
+                Holding.objects.select_for_update()
+                .filter(actor_id__in=actor_ids, stock_id__in=stock_ids)
+                .order_by("pk")
+            )
+            for holding in queryset:
+                holdings[(holding.actor_id, holding.stock_id)] = holding
+
+    to_create = []
+    to_update = []
+    rollup_changes = defaultdict(lambda: (0, 0))
+    for (actor_id, stock_id), delta in deltas.items():
+        holding = holdings.get((actor_id, stock_id))
+        owned_shares = holding.quantity if holding else 0
+        if owned_shares + delta < 0:
+            raise OversellError(
+                f"User {actor_id} would own {owned_shares + delta} shares "
+                f"of stock {stock_id}"
+            )
+        shares, holders = rollup_changes[stock_id]
+        rollup_changes[stock_id] = (
+            shares + delta,
+            holders + holder_change(owned_shares, delta),
+        )
+        if holding is None:
+            to_create.append(
+                Holding(actor_id=actor_id, stock_id=stock_id, quantity=delta)
+            )
+        elif delta:
+            holding.quantity += delta
+            to_update.append(holding)
+
+    Holding.objects.bulk_create(to_create, batch_size=1000)
+    Holding.objects.bulk_update(to_update, ["quantity"], batch_size=1000)
+    apply_rollup_changes(rollup_changes)
+    actor_ids = {actor_id for actor_id, _ in deltas}
+    invalidate_portfolios(actor_ids)
+    pin_to_primary(actor_ids)
+
+
+def load_expected_holdings() -> Dict[HoldingKey, int]:
+    """Replay the whole trade history into {(actor_id, stock_id): quantity}"""
+    return {
+        (row["actor_id"], row["stock_id"]): row["total_quantity"] or 0
+        for row in replay_holdings().iterator()
+    }
+
+
+def load_current_holdings() -> Dict[HoldingKey, int]:
+    """Read the materialized holdings into {(actor_id, stock_id): quantity}"""
+    return {
+        (actor_id, stock_id): quantity
+        for actor_id, stock_id, quantity in Holding.objects.values_list(
+            "actor_id", "stock_id", "quantity"
+        ).iterator()
+    }
+
+
+def diff_holdings(
+    expected: Dict[HoldingKey, int], current: Dict[HoldingKey, int]
+) -> List[Tuple[HoldingKey, int, int]]:
+    """List (key, expected, current) for every holding that doesn't match
+
+    A missing holding is reported with a current quantity of None, and a
+    holding that has no trades behind it with an expected quantity of None.
+    """
+    mismatches = []
+    for key in sorted(expected.keys() | current.keys()):
+        if expected.get(key) != current.get(key):
+            mismatches.append((key, expected.get(key), current.get(key)))
+    return mismatches
+
+
+def rebuild_holdings() -> Dict[str, int]:
+    """Rebuild the `Holding` table from trade history in one transaction
+
+    Only rows that differ from the replay are touched, and the rollups are
+    rebuilt from the same replay. Returns the number of holdings created,
+    updated and deleted, and of rollups changed.
+    """
+    with transaction.atomic():
+        expected = load_expected_holdings()
+        existing = {
+            (holding.actor_id, holding.stock_id): holding
+            for holding in Holding.objects.select_for_update()
+        }
+
+        to_create = [
+            Holding(actor_id=actor_id, stock_id=stock_id, quantity=quantity)
+            for (actor_id, stock_id), quantity in expected.items()
+            if (actor_id, stock_id) not in existing
+        ]
+        to_update = []
+        for key, holding in existing.items():
+            if key in expected and holding.quantity != expected[key]:
+                holding.quantity = expected[key]
+                to_update.append(holding)
+        to_delete = [
+            holding.pk
+            for key, holding in existing.items()
+            if key not in expected
+        ]
+
+        Holding.objects.bulk_create(to_create, batch_size=1000)
+        Holding.objects.bulk_update(to_update, ["quantity"], batch_size=1000)
+        Holding.objects.filter(pk__in=to_delete).delete()
+        if to_create or to_update or to_delete:
+            invalidate_all_portfolios()
+            pin_to_primary()
+        rollups = rebuild_rollups(expected)
+
+    return {
+        "created": len(to_create),
+        "updated": len(to_update),
+        "deleted": len(to_delete),
+        "rollups": rollups,
+    }
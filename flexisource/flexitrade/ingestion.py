@@ -0,0 +1,136 @@
+"""Single-leader ingestion of the trade files dropped into an inbox directory
+
+Only one runner at a time holds the inbox's lock file, every other runner
+waits as a standby. Each file is executed at most once: its content hash is
+recorded in the same transaction as its trades, and it is then moved to the
+`processed/` or `failed/` subdirectory of the inbox.
+"""
+
+import fcntl
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from django.db import transaction
+
+from .formats import FORMATS_BY_EXTENSION
+from .ledger import file_sha256
+from .models import IngestedFile
+from .views.trade import PlaceBulkTrade
+
+LOCK_FILE_NAME = ".ingestion.lock"
+PROCESSED_DIR_NAME = "processed"
+FAILED_DIR_NAME = "failed"
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """An exclusive, non-blocking lock on a file in the inbox
+
+    The lock belongs to the process, so it is released by the OS if the
+    runner dies, and a standby can take over.
+    """
+
+    def __init__(self, inbox: Path):
+        self.path = inbox / LOCK_FILE_NAME
+        self.file = None
+
+    def acquire(self) -> bool:
+        """Try to become the leader, returns whether it succeeded"""
+        self.file = open(self.path, "a")
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.file.close()
+            self.file = None
+            return False
+        return True
+
+    def release(self) -> None:
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+
+
+class InboxWatcher:
+    """Find the trade files in the inbox that are ready to be ingested
+
+    A file is ready once its size and modification time haven't changed
+    between two scans, so files that are still being written are skipped.
+    """
+
+    def __init__(self, inbox: Path):
+        self.inbox = inbox
+        self.last_seen: Dict[str, Tuple[int, int]] = {}
+
+    def ready_files(self) -> List[Path]:
+        seen = {}
+        ready = []
+        with os.scandir(self.inbox) as entries:
+            for entry in entries:
+                extension = os.path.splitext(entry.name)[1].lower()
+                if (
+                    not entry.is_file()
+                    or extension not in FORMATS_BY_EXTENSION
+                ):
+                    continue
+                stat = entry.stat()
+                seen[entry.name] = (stat.st_size, stat.st_mtime_ns)
+                if self.last_seen.get(entry.name) == seen[entry.name]:
+                    ready.append(Path(entry.path))
+
+        self.last_seen = seen
+        return sorted(ready)
+
+
+def execute_file(path: Path, sha256: str) -> bool:
+    """Execute the trades of a file, returns whether they were executed
+
+    The users are taken from the file's `username` column.
+    """
+    with open(path, "rb") as trade_file:
+        errors, executed_trades = PlaceBulkTrade().ingest_file(
+            trade_file, username=None, file_hash=sha256
+        )
+
+    if errors:
+        logger.warning("Trades of %s not executed: %s", path.name, errors)
+    else:
+        logger.info(
+            "%d trade(s) of %s executed", len(executed_trades), path.name
+        )
+    return not errors
+
+
+def ingest_file(path: Path) -> str:
+    """Execute the trades of a file once, then move it out of the inbox
+
+    Returns "skipped" if the same content was already executed, otherwise
+    "processed" or "failed". A file that can't be executed for any reason
+    fails, without stopping the runner.
+    """
+    sha256 = file_sha256(path)
+    if IngestedFile.objects.filter(sha256=sha256).exists():
+        outcome = "skipped"
+    else:
+        try:
+            with transaction.atomic():
+                is_ok = execute_file(path, sha256)
+                if is_ok:
+                    IngestedFile.objects.create(sha256=sha256, name=path.name)
+        except Exception:
+            logger.exception("Could not ingest %s", path.name)
+            is_ok = False
+        outcome = "processed" if is_ok else "failed"
+
+    # The hash keeps files that are dropped again under the same name apart
+    target_dir = path.parent / (
+        FAILED_DIR_NAME if outcome == "failed" else PROCESSED_DIR_NAME
+    )
+    target_dir.mkdir(exist_ok=True)
+    shutil.move(path, target_dir / f"{path.stem}.{sha256[:12]}{path.suffix}")
+    return outcome
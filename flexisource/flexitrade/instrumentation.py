@@ -0,0 +1,238 @@
+"""Per-request timings and in-process histograms in the Prometheus format
+
+The metrics of a request are collected by `InstrumentationMiddleware`, and
+its SQL queries by `measure_query`. Code on the request path can time its
+own phases with `timed()`, e.g. parsing, validation and inserts of a bulk
+trade file. Outside of a request (Celery, the ingestion runner) neither the
+queries nor the phases are measured.
+
+The histograms are kept per process: with several workers, each one exposes
+its own and Prometheus sums them per instance.
+"""
+
+import logging
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+from .queries import format_sql
+
+slow_query_logger = logging.getLogger("flexitrade.slow_queries")
+
+# Upper bounds of the buckets, in seconds or in queries
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+)  # fmt: skip
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """A Prometheus histogram with any number of label sets"""
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # Per label set: the count of every bucket, then the sum
+        self._series: Dict[Labels, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self._series.get(
+                key, ([0] * (len(self.buckets) + 1), 0)
+            )
+            counts[bisect_left(self.buckets, value)] += 1
+            self._series[key] = (counts, total + value)
+
+    def expose(self) -> str:
+        """The histogram in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, (counts, total) in series:
+            labels = [f'{name}="{value}"' for name, value in key]
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                bucket_labels = ",".join(labels + [f'le="{bound}"'])
+                lines.append(
+                    f"{self.name}_bucket{{{bucket_labels}}} {cumulative}"
+                )
+            series_labels = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{series_labels} {total}")
+            lines.append(f"{self.name}_count{series_labels} {cumulative}")
+        return "\n".join(lines)
+
+
+REQUEST_DURATION = Histogram(
+    "flexitrade_request_duration_seconds",
+    "Time spent handling a request, by view.",
+    DURATION_BUCKETS,
+)
+REQUEST_SQL_DURATION = Histogram(
+    "flexitrade_request_sql_duration_seconds",
+    "Time a request spent waiting on SQL queries, by view.",
+    DURATION_BUCKETS,
+)
+REQUEST_SQL_QUERIES = Histogram(
+    "flexitrade_request_sql_queries",
+    "Number of SQL queries run by a request, by view.",
+    QUERY_COUNT_BUCKETS,
+)
+PHASE_DURATION = Histogram(
+    "flexitrade_request_phase_duration_seconds",
+    "Time spent in a phase of a request, e.g. parse, validate or insert.",
+    DURATION_BUCKETS,
+)
+HISTOGRAMS = (
+    REQUEST_DURATION,
+    REQUEST_SQL_DURATION,
+    REQUEST_SQL_QUERIES,
+    PHASE_DURATION,
+)
+
+
+class RequestMetrics:
+    """What a single request spent its time on"""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.duration = 0.0
+        self.sql_queries = 0
+        self.sql_duration = 0.0
+        self.phases: Dict[str, float] = defaultdict(float)
+
+    def finish(self) -> None:
+        self.duration = perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """The metrics as a `Server-Timing` header, durations in ms
+
+        `app` is the time spent in Python, i.e. outside of the database.
+        """
+        metrics = [
+            f"total;dur={self.duration * 1000:.1f}",
+            f"app;dur={(self.duration - self.sql_duration) * 1000:.1f}",
+            f'db;dur={self.sql_duration * 1000:.1f};desc="'
+            f'{self.sql_queries} queries"',
+        ]
+        metrics.extend(
+            f"{phase};dur={duration * 1000:.1f}"
+            for phase, duration in self.phases.items()
+        )
+        return ", ".join(metrics)
+
+    def observe(self, view: str) -> None:
+        """Add the metrics of the request to the histograms"""
+        REQUEST_DURATION.observe(self.duration, view=view)
+        REQUEST_SQL_DURATION.observe(self.sql_duration, view=view)
+        REQUEST_SQL_QUERIES.observe(self.sql_queries, view=view)
+        for phase, duration in self.phases.items():
+            PHASE_DURATION.observe(duration, view=view, phase=phase)
+
+
+current_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    "current_metrics", default=None
+)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Add the time spent in the block to a phase of the current request
+
+    A phase that is entered several times, e.g. once per chunk, adds up.
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.phases[phase] += perf_counter() - start
+
+
+def timed_iter(items: Iterable, phase: str) -> Iterator:
+    """Iterate over `items`, adding the time spent producing each to a phase
+
+    Meant for lazy readers, e.g. the chunks of `pd.read_csv`.
+    """
+    iterator = iter(items)
+    while True:
+        with timed(phase):
+            item = next(iterator, StopIteration)
+        if item is StopIteration:
+            return
+        yield item
+
+
+def measure_query(execute, sql, params, many, context):
+    """Database execute wrapper adding every query to the current request
+
+    Queries slower than `SLOW_QUERY_THRESHOLD_MS` are logged, if it's set.
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = perf_counter() - start
+        metrics.sql_queries += 1
+        metrics.sql_duration += duration
+        if 0 < settings.SLOW_QUERY_THRESHOLD_MS <= duration * 1000:
+            log_slow_query(duration, sql, params, many, context)
+
+
+def log_slow_query(duration, sql, params, many, context) -> None:
+    if not many:
+        # The query with its parameters, as the database received it
+        sql = context["connection"].ops.last_executed_query(
+            context["cursor"], sql, params
+        )
+    slow_query_logger.warning(
+        "Slow query (%.1fms):\n%s", duration * 1000, format_sql(sql)
+    )
+
+
+def install_query_measurement(sender, connection, **kwargs) -> None:
+    """Add `measure_query` to a new database connection
+
+    Connected to `connection_created`, so that the queries are measured on
+    whichever thread runs them, e.g. the threads of the async ORM. The
+    current request is found through a context variable, which follows it
+    to those threads.
+    """
+    if measure_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(measure_query)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSON renderer adding its time to the `render` phase of the request"""
+
+    def render(self, *args, **kwargs):
+        with timed("render"):
+            return super().render(*args, **kwargs)
+
+
+def expose_metrics() -> str:
+    """Every histogram in the Prometheus text exposition format"""
+    return "\n".join(histogram.expose() for histogram in HISTOGRAMS) + "\n"
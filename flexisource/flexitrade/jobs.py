@@ -0,0 +1,123 @@
+"""Background processing of bulk trade files
+
+The live progress of a job is published through the cache, so the workers
+and the web processes must share it (e.g. Redis): `check --deploy` fails
+otherwise.
+"""
+
+import logging
+from typing import Dict
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.core.checks import Error
+
+from .enums import BulkTradeJobStatusChoices
+from .ledger import MSG_SKIPPED
+from .models import BulkTradeJob
+
+PROGRESS_TIMEOUT = 60 * 60 * 24
+
+# Caches that only the process that wrote to them can read
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def check_progress_cache(app_configs, **kwargs):
+    """System check: the cache must be shared with the job workers"""
+    backend = settings.CACHES["default"]["BACKEND"]
+    if (
+        settings.CELERY_TASK_ALWAYS_EAGER
+        or backend not in PROCESS_LOCAL_CACHES
+    ):
+        return []
+    return [
+        Error(
+            "The progress of bulk trade jobs is published through a cache "
+            "that the web processes can't read.",
+            hint="Set REDIS_CACHE_URL to a cache shared with the workers.",
+            id="flexitrade.E001",
+        )
+    ]
+
+
+def progress_cache_key(job_id) -> str:
+    """Cache key of the live progress of a running job"""
+    return f"bulk_trade_job:{job_id}:progress"
+
+
+def get_job_progress(job: BulkTradeJob) -> Dict[str, int]:
+    """The live progress of a running job, empty for any other job
+
+    The trades of a job are committed all at once, so while it runs the
+    counters are kept in the cache instead of the job's row.
+    """
+    if job.status != BulkTradeJobStatusChoices.RUNNING:
+        return {}
+    return cache.get(progress_cache_key(job.pk)) or {}
+
+
+@shared_task
+def run_bulk_trade_job(job_id) -> None:
+    """Validate and execute the stored file of a bulk trade job"""
+    from .views.trade import PlaceBulkTrade  # Avoid a circular import
+
+    job = BulkTradeJob.objects.select_related("owner").get(pk=job_id)
+    job.status = BulkTradeJobStatusChoices.RUNNING
+    job.save(update_fields=["status"])
+
+    progress = {"rows_validated": 0, "rows_staged": 0}
+
+    def on_progress(rows_validated, rows_staged):
+        progress.update(rows_validated=rows_validated, rows_staged=rows_staged)
+        cache.set(progress_cache_key(job.pk), progress, PROGRESS_TIMEOUT)
+
+    try:
+        with job.file.open("rb") as csv_file:
+            errors, executed_trades = PlaceBulkTrade().ingest_file(
+                csv_file,
+                job.owner.username,
+                on_progress,
+                partial=job.partial,
+            )
+    except ValueError as err:
+        errors, executed_trades = {"error": f"Read failure {str(err)}"}, {}
+    except Exception as err:
+        # The job must not be left running: record the failure, then let
+        # the worker report it too
+        logger.exception("Bulk trade job %s failed", job.pk)
+        finish_job(job, progress, {"error": f"Job failure {str(err)}"}, {})
+        raise
+
+    finish_job(job, progress, errors, executed_trades)
+
+
+def finish_job(job, progress, errors, executed_trades) -> None:
+    """Record the outcome and the final counters of a job
+
+    Only the trades that were inserted are counted as committed, not the
+    rows skipped by the ingestion ledger.
+    """
+    committed = sum(msg != MSG_SKIPPED for msg in executed_trades.values())
+
+    job.rows_validated = progress["rows_validated"]
+    if job.partial and executed_trades:
+        # The rows that failed are reported, the others are committed
+        job.status = BulkTradeJobStatusChoices.SUCCEEDED
+        job.rows_committed = committed
+        job.errors = errors
+    elif errors:
+        job.status = BulkTradeJobStatusChoices.FAILED
+        job.errors = errors
+    else:
+        job.status = BulkTradeJobStatusChoices.SUCCEEDED
+        job.rows_committed = committed
+    job.save(
+        update_fields=["status", "rows_validated", "rows_committed", "errors"]
+    )
+    cache.delete(progress_cache_key(job.pk))
@@ -0,0 +1,277 @@
+"""Append-only binary journal of the executed trades
+
+Every committed trade is also appended to `TRADE_JOURNAL_PATH` as a record
+of fixed width, after a small header. Replaying the journal doesn't go
+through the ORM: the file is memory-mapped as a NumPy structured array and
+the holdings are summed per (actor, stock) in a few vectorized passes.
+
+Records are appended once the transaction commits, with the file locked,
+in one write per transaction. A record torn by a crash is dropped before
+the next append. A trade whose append was lost is found, and appended, by
+the `verify_journal` management command. `Trade` remains the source of
+truth: the journal can always be rewritten from it.
+"""
+
+import fcntl
+import os
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .enums import TradeActionChoices
+from .models import Trade
+
+HoldingKey = Tuple[int, int]  # (actor_id, stock_id)
+
+MAGIC = b"FLXTRJ01"
+RECORD = np.dtype(
+    {
+        "names": [
+            "trade_id",
+            "created",
+            "actor_id",
+            "stock_id",
+            "quantity",
+            "action",
+        ],
+        "formats": ["<i8", "<i8", "<i8", "<i8", "<i4", "S1"],
+        "offsets": [0, 8, 16, 24, 32, 36],
+        # Padded to a multiple of 8 bytes, so the 64-bit fields stay aligned
+        "itemsize": 40,
+    }
+)
+HEADER = MAGIC + RECORD.itemsize.to_bytes(8, "little")
+FIELDS = list(RECORD.names)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+SELL = TradeActionChoices.SELL.encode()
+
+
+class JournalError(Exception):
+    """A file that isn't a trade journal of this format"""
+
+
+def to_micros(timestamp: datetime) -> int:
+    """Microseconds since the epoch of an aware datetime"""
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+
+def to_records(rows: Iterable[Tuple]) -> np.ndarray:
+    """Records of (trade_id, created, actor_id, stock_id, quantity, action)
+    rows, e.g. the `values_list` of trades, in that order
+    """
+    rows = list(rows)
+    records = np.zeros(len(rows), dtype=RECORD)
+    if not rows:
+        return records
+
+    trade_ids, created, actor_ids, stock_ids, quantities, actions = zip(*rows)
+    records["trade_id"] = trade_ids
+    records["created"] = [to_micros(timestamp) for timestamp in created]
+    records["actor_id"] = actor_ids
+    records["stock_id"] = stock_ids
+    records["quantity"] = quantities
+    records["action"] = [action.encode() for action in actions]
+    return records
+
+
+def _to_bytes(records: np.ndarray) -> bytes:
+    # NumPy drops the padding of a structured dtype in some operations,
+    # e.g. concatenation, which would change the width of the records
+    return records.astype(RECORD, copy=False).tobytes()
+
+
+def _write(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _open_locked(path: str) -> int:
+    """Open the journal for appending, created if missing, and lock it
+
+    A journal may be renamed over while waiting for the lock (see
+    `rewrite_journal`): the new one is opened then.
+    """
+    while True:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.stat(path).st_ino == os.fstat(fd).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+
+def append_records(records: np.ndarray, path: str = None) -> None:
+    """Append records to the journal, creating it if needed
+
+    The file is locked for the write, so appends of several processes never
+    interleave. A torn record at the end is truncated first, so every record
+    stays at its offset.
+    """
+    path = path or settings.TRADE_JOURNAL_PATH
+    fd = _open_locked(path)
+    try:
+        size = os.fstat(fd).st_size
+        if size < len(HEADER):
+            os.ftruncate(fd, 0)
+            _write(fd, HEADER)
+        else:
+            torn = (size - len(HEADER)) % RECORD.itemsize
+            if torn:
+                os.ftruncate(fd, size - torn)
+        _write(fd, _to_bytes(records))
+    finally:
+        # Closing the file releases the lock
+        os.close(fd)
+
+
+def journal_trades(trades: Iterable[Trade]) -> None:
+    """Append the trades to the journal once the transaction commits
+
+    Must be called in the transaction that inserts them, after the insert,
+    so they have their ids. Nothing is written if it's rolled back, or if
+    the journal is disabled. A failed append doesn't fail the trades.
+    """
+    if not settings.TRADE_JOURNAL_PATH:
+        return
+
+    # The rows are taken now, but only turned into records and written once
+    # committed, so a journal error can never roll back or fail the trades
+    rows = [
+        (
+            trade.pk,
+            trade.created,
+            trade.actor_id,
+            trade.stock_id,
+            trade.quantity,
+            trade.action,
+        )
+        for trade in trades
+    ]
+    transaction.on_commit(
+        lambda: append_records(to_records(rows)), robust=True
+    )
+
+
+def read_journal(path: str = None) -> np.ndarray:
+    """Memory-map the records of the journal, read-only
+
+    A missing journal has no records. A torn record at the end is ignored.
+    Raises `JournalError` if the file isn't a journal of this format.
+    """
+    path = path or settings.TRADE_JOURNAL_PATH
+    if not os.path.exists(path):
+        return np.zeros(0, dtype=RECORD)
+
+    with open(path, "rb") as journal:
+        header = journal.read(len(HEADER))
+    if header != HEADER:
+        raise JournalError(f"{path} isn't a trade journal of this format")
+
+    count = (os.path.getsize(path) - len(HEADER)) // RECORD.itemsize
+    if not count:
+        return np.zeros(0, dtype=RECORD)
+    return np.memmap(
+        path, dtype=RECORD, mode="r", offset=len(HEADER), shape=(count,)
+    )
+
+
+def replay_journal(
+    records: np.ndarray, as_of: datetime = None
+) -> Dict[HoldingKey, int]:
+    """Sum the records into {(actor_id, stock_id): quantity}
+
+    Only the trades created at or before `as_of` count, if given. Like
+    `load_expected_holdings`, every pair that was traded is present, even if
+    its quantity is back to 0.
+    """
+    if as_of is not None:
+        records = records[records["created"] <= to_micros(as_of)]
+    if not len(records):
+        return {}
+
+    quantities = records["quantity"].astype(np.int64)
+    signed = np.where(records["action"] == SELL, -quantities, quantities)
+
+    # One sortable key per pair, then a sum over each run of equal keys
+    actor_ids = records["actor_id"]
+    stock_ids = records["stock_id"]
+    keys = actor_ids * (int(stock_ids.max()) + 1) + stock_ids
+    order = np.argsort(keys)
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    totals = np.add.reduceat(signed[order], starts)
+
+    first = order[starts]
+    pairs = zip(actor_ids[first].tolist(), stock_ids[first].tolist())
+    return dict(zip(pairs, totals.tolist()))
+
+
+def load_trade_records(chunk_size: int = 10000) -> np.ndarray:
+    """The records of every trade of the `Trade` table, by trade id"""
+    trades = Trade.objects.order_by("pk").values_list(
+        "id", "created", "actor_id", "stock_id", "quantity", "action"
+    )
+    chunks = []
+    rows = []
+    for row in trades.iterator(chunk_size=chunk_size):
+        rows.append(row)
+        if len(rows) == chunk_size:
+            chunks.append(to_records(rows))
+            rows = []
+    chunks.append(to_records(rows))
+    return np.concatenate(chunks).astype(RECORD, copy=False)
+
+
+def diff_journal(
+    journal: np.ndarray, expected: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """The trade ids of every discrepancy of the journal with `expected`
+
+    "missing" trades aren't in the journal, "unknown" ones only are in it,
+    "duplicated" ones are in it more than once, and "mismatched" ones were
+    recorded with other values.
+    """
+    journal_ids, first, counts = np.unique(
+        journal["trade_id"], return_index=True, return_counts=True
+    )
+    _, in_journal, in_expected = np.intersect1d(
+        journal_ids, expected["trade_id"], return_indices=True
+    )
+    recorded = journal[first[in_journal]][FIELDS]
+    mismatched = recorded != expected[in_expected][FIELDS]
+
+    return {
+        "missing": np.setdiff1d(expected["trade_id"], journal_ids),
+        "unknown": np.setdiff1d(journal_ids, expected["trade_id"]),
+        "duplicated": journal_ids[counts > 1],
+        "mismatched": recorded["trade_id"][mismatched],
+    }
+
+
+def rewrite_journal(records: np.ndarray, path: str = None) -> None:
+    """Replace the journal with the records, atomically
+
+    The new journal is written next to the old one and renamed over it,
+    with the old one locked, so appends wait and then go to the new one.
+    """
+    path = path or settings.TRADE_JOURNAL_PATH
+    tmp_path = f"{path}.tmp"
+    fd = _open_locked(path)
+    try:
+        with open(tmp_path, "wb") as journal:
+            journal.write(HEADER)
+            journal.write(_to_bytes(records))
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        os.close(fd)
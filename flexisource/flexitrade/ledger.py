@@ -0,0 +1,149 @@
+"""Ledger of the bulk trade rows that have been executed
+
+A row is identified either by the client-supplied `order_id` column, scoped
+to the user who places it, or by the hash of its file plus its row number.
+Rows found in the ledger are skipped, so re-processing a file never executes
+the same trade twice.
+"""
+
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from django.contrib.auth import get_user_model
+
+from .models import IngestionLedgerEntry
+from .queries import chunked
+
+UserModel = get_user_model()
+
+ORDER_ID_COLUMN = "order_id"
+ORDER_ID_MAX_LENGTH = IngestionLedgerEntry._meta.get_field("ref").max_length
+
+MSG_SKIPPED = "already executed, skipped"
+MSG_ORDER_ID_TOO_LONG = (
+    f"order_id should be max {ORDER_ID_MAX_LENGTH} characters"
+)
+
+LedgerKey = Tuple[str, str]  # (source, ref)
+
+
+def file_sha256(path) -> str:
+    """Hash the content of a file without loading all of it in memory"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def order_id_source(owner_id) -> str:
+    """The ledger namespace of the order ids of a user"""
+    return f"order_id:{owner_id}"
+
+
+def duplicate_message(first_index) -> str:
+    return f"order_id already used by row {first_index} of the file"
+
+
+def _owner_ids(usernames: pd.Series) -> pd.Series:
+    """The user id of every username, missing for unknown users"""
+    owner_ids = {}
+    for usernames_chunk in chunked(usernames.dropna().unique()):
+        owner_ids.update(
+            UserModel.objects.filter(username__in=usernames_chunk).values_list(
+                "username", "pk"
+            )
+        )
+    return usernames.map(owner_ids)
+
+
+def ledger_keys(
+    df: pd.DataFrame, file_hash: str = None, username: str = None
+) -> Optional[pd.DataFrame]:
+    """The ledger key, `source` and `ref`, of every row
+
+    With an `order_id` column, a row is keyed by its order id, in the
+    namespace of its owner: `username`, or the row's `username` column.
+    Otherwise it's keyed by its row number in the file of `file_hash`.
+    Rows without an order id or a known owner get no key and are never
+    skipped. Returns None if the rows can't be tracked at all.
+    """
+    if ORDER_ID_COLUMN in df:
+        if username is not None:
+            usernames = pd.Series(username, index=df.index)
+        else:
+            usernames = df.get("username", pd.Series(index=df.index))
+        owner_ids = _owner_ids(usernames).dropna().astype(int)
+        sources = owner_ids.map(order_id_source).reindex(df.index)
+        order_ids = df[ORDER_ID_COLUMN].str.strip()
+        has_key = sources.notna() & order_ids.notna() & (order_ids != "")
+        return pd.DataFrame(
+            {
+                "source": sources.where(has_key),
+                "ref": order_ids.where(has_key),
+            }
+        )
+
+    if file_hash is None:
+        return None
+    return pd.DataFrame(
+        {"source": file_hash, "ref": df.index.astype(str)}, index=df.index
+    )
+
+
+def key_errors(
+    keys: pd.DataFrame, seen: Dict[LedgerKey, int]
+) -> Dict[int, Dict[str, List[str]]]:
+    """The errors of the rows whose key can't be recorded in the ledger
+
+    That is, an order id that is too long, or that an earlier row of the
+    same file already used. `seen` maps the keys of the earlier rows to
+    their row index, and the keys of these rows are added to it.
+    """
+    errors = {}
+    keyed = keys.dropna()
+    for index, key in zip(keyed.index, zip(keyed["source"], keyed["ref"])):
+        if len(key[1]) > ORDER_ID_MAX_LENGTH:
+            errors[index] = {ORDER_ID_COLUMN: [MSG_ORDER_ID_TOO_LONG]}
+        elif key in seen:
+            errors[index] = {ORDER_ID_COLUMN: [duplicate_message(seen[key])]}
+        else:
+            seen[key] = index
+    return errors
+
+
+def is_applied(keys: pd.DataFrame) -> pd.Series:
+    """Whether the key of every row is already in the ledger
+
+    One query per chunk of references, using the (source, ref) index.
+    """
+    keyed = keys.dropna()
+    sources = keyed["source"].unique().tolist()
+    applied = set()
+    for refs_chunk in chunked(keyed["ref"].unique(), 5000):
+        applied.update(
+            IngestionLedgerEntry.objects.filter(
+                source__in=sources, ref__in=refs_chunk
+            ).values_list("source", "ref")
+        )
+    found = [key in applied for key in zip(keyed["source"], keyed["ref"])]
+    return pd.Series(found, index=keyed.index, dtype=bool).reindex(
+        keys.index, fill_value=False
+    )
+
+
+def record_keys(keys: pd.DataFrame) -> None:
+    """Add the keys of executed rows to the ledger
+
+    Must be called in the same transaction as the trades. A key that is
+    recorded concurrently violates the unique constraint and rolls it back.
+    """
+    keyed = keys.dropna()
+    IngestionLedgerEntry.objects.bulk_create(
+        [
+            IngestionLedgerEntry(source=source, ref=ref)
+            for source, ref in zip(keyed["source"], keyed["ref"])
+        ],
+        batch_size=1000,
+    )
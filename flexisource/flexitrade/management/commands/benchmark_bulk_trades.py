@@ -0,0 +1,143 @@
+"""Benchmark the set-based bulk trade execution against the row-by-row one"""
+
+import random
+import string
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from flexitrade.enums import TradeActionChoices
+from flexitrade.models import Stock, Trade
+from flexitrade.seeding import throwaway_database
+from flexitrade.views.trade import TradeExecutionMixin
+
+UserModel = get_user_model()
+
+
+class Command(BaseCommand, TradeExecutionMixin):
+    help = (
+        "Time bulk trade execution at several batch sizes against a throwaway "
+        "test database: the original row-by-row baseline, one execute_trade() "
+        "per row, and the set-based path. Every path gets its own user and "
+        "new symbols, so each one pays for creating its stocks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[1000, 10000, 100000],
+            help="Number of trades per batch.",
+        )
+        parser.add_argument(
+            "--symbols",
+            type=int,
+            default=500,
+            help="Number of distinct stock symbols in a batch.",
+        )
+
+    def _new_symbols(self, count):
+        """Symbols no earlier batch has used"""
+        symbols = []
+        while len(symbols) < count:
+            symbol = "".join(random.choices(string.ascii_uppercase, k=5))
+            if symbol not in self.used_symbols:
+                self.used_symbols.add(symbol)
+                symbols.append(symbol)
+        return symbols
+
+    def _make_trades(self, size, symbol_count):
+        """Only buys, so every batch is valid regardless of holdings
+
+        Returns a function that lays the same batch out for a user, on
+        symbols of its own.
+        """
+        rows = [
+            (random.randrange(symbol_count), random.randint(1, 100))
+            for _ in range(size)
+        ]
+
+        def make_for(owner):
+            symbols = self._new_symbols(symbol_count)
+            return [
+                {
+                    "owner": owner,
+                    "symbol": symbols[index],
+                    "quantity": quantity,
+                    "action": TradeActionChoices.BUY,
+                }
+                for index, quantity in rows
+            ]
+
+        return make_for
+
+    def _baseline(self, trades):
+        """The bulk execution as it was: a get_or_create() and a create()
+        per row, without holdings or a journal"""
+        with transaction.atomic():
+            for params in trades:
+                stock_obj, _ = Stock.objects.get_or_create(
+                    ticker_symbol=params["symbol"],
+                    defaults={"price": random.uniform(1, 1000)},
+                )
+                Trade.objects.create(
+                    actor=params["owner"],
+                    stock=stock_obj,
+                    action=params["action"],
+                    quantity=params["quantity"],
+                )
+
+    def _per_row(self, trades):
+        """Today's single trade path, once per row"""
+        with transaction.atomic():
+            for params in trades:
+                self.execute_trade(params)
+
+    def _measure(self, func, trades):
+        """Run func as the endpoint does, return (secs, queries)
+
+        No transaction is wrapped around it, so its own transactions commit
+        like they do in production.
+        """
+        query_count = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal query_count
+            query_count += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            start = perf_counter()
+            func(trades)
+            elapsed = perf_counter() - start
+        return elapsed, query_count
+
+    def handle(self, *args, **options):
+        self.used_symbols = set()
+        paths = {
+            "baseline": self._baseline,
+            "execute_trade": self._per_row,
+            "set-based": self.bulk_execute_trades,
+        }
+
+        with throwaway_database():
+            for size in options["sizes"]:
+                make_trades = self._make_trades(size, options["symbols"])
+                results = {}
+                for path, func in paths.items():
+                    owner = UserModel.objects.create(
+                        username=f"benchmark-{path}-{size}"
+                    )
+                    results[path] = self._measure(func, make_trades(owner))
+
+                for path, (elapsed, query_count) in results.items():
+                    self.stdout.write(
+                        f"{size:>8} rows  {path:<13} {elapsed:>9.3f}s "
+                        f"{query_count:>8} queries"
+                    )
+                speedup = results["baseline"][0] / results["set-based"][0]
+                self.stdout.write(
+                    f"{size:>8} rows  speedup over baseline x{speedup:.1f}"
+                )
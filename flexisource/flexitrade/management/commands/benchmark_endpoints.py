@@ -0,0 +1,237 @@
+"""Latency and query-count benchmark of every flexitrade endpoint"""
+
+import json
+import random
+from time import perf_counter
+from typing import Callable, Dict, List
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from flexitrade.models import Holding
+from flexitrade.seeding import seed_dataset, throwaway_database
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database, then measure the p50/p99 latency "
+        "and the SQL query count of every endpoint, and write a JSON report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--stocks", type=int, default=50)
+        parser.add_argument(
+            "--trades", type=int, default=1000, help="Trades per user."
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=100,
+            help="Requests per single-request scenario.",
+        )
+        parser.add_argument(
+            "--csv-sizes",
+            nargs="+",
+            type=int,
+            default=[10, 100, 1000],
+            help="Rows per file for the /bulk_trade/ scenarios.",
+        )
+        parser.add_argument(
+            "--bulk-requests",
+            type=int,
+            default=5,
+            help="Requests per /bulk_trade/ scenario.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Orders per /trades/batch/ request.",
+        )
+        parser.add_argument("--output", default="benchmark_report.json")
+        parser.add_argument(
+            "--max-queries",
+            type=int,
+            help="Fail if a request of any scenario runs more queries.",
+        )
+
+    def _measure(self, request: Callable, repeat: int) -> Dict:
+        """Send the request `repeat` times, summarize latency and queries"""
+        latencies: List[float] = []
+        query_counts: List[int] = []
+        query_count = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal query_count
+            query_count += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            for _ in range(repeat):
+                query_count = 0
+                start = perf_counter()
+                response = request()
+                latencies.append((perf_counter() - start) * 1000)
+                query_counts.append(query_count)
+                if response.status_code >= 400:
+                    raise RuntimeError(
+                        f"{response.status_code}: {response.content[:500]}"
+                    )
+
+        return {
+            "requests": repeat,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+            "queries_p50": int(np.percentile(query_counts, 50)),
+            "queries_max": max(query_counts),
+        }
+
+    def _scenarios(self, clients, stocks, options) -> Dict[str, tuple]:
+        """Each scenario is (request callable, number of requests)
+
+        `clients` are the API clients of the users, by user id.
+        """
+        all_clients = list(clients.values())
+        symbols = [stock.ticker_symbol for stock in stocks]
+        holdings = list(
+            Holding.objects.filter(quantity__gt=0).select_related(
+                "actor", "stock"
+            )
+        )
+        repeat = options["requests"]
+
+        def portfolio():
+            return random.choice(all_clients).get("/portfolio/")
+
+        def uncached_portfolio():
+            with override_settings(PORTFOLIO_CACHE_ENABLED=False):
+                return portfolio()
+
+        def market():
+            return random.choice(all_clients).get("/market/")
+
+        def top_holders():
+            symbol = random.choice(symbols)
+            return random.choice(all_clients).get(f"/market/{symbol}/holders/")
+
+        def buy():
+            data = {
+                "symbol": random.choice(symbols),
+                "quantity": 1,
+                "action": "buy",
+            }
+            return random.choice(all_clients).post("/trade/", data)
+
+        def sell():
+            holding = random.choice(holdings)
+            data = {
+                "symbol": holding.stock.ticker_symbol,
+                "quantity": 1,
+                "action": "sell",
+            }
+            return clients[holding.actor_id].post("/trade/", data)
+
+        def bulk_trade(size):
+            rows = "".join(
+                f"{random.choice(symbols)},1,buy\n" for _ in range(size)
+            )
+            body = ("symbol,quantity,action\n" + rows).encode()
+            return lambda: random.choice(all_clients).post(
+                "/bulk_trade/",
+                data=body,
+                content_type="text/csv",
+                HTTP_CONTENT_DISPOSITION='attachment; filename="bench.csv"',
+            )
+
+        def batch():
+            orders = [
+                {
+                    "symbol": random.choice(symbols),
+                    "quantity": 1,
+                    "action": "buy",
+                }
+                for _ in range(options["batch_size"])
+            ]
+            return random.choice(all_clients).post(
+                "/trades/batch/", orders, format="json"
+            )
+
+        scenarios = {
+            "GET /portfolio/": (portfolio, repeat),
+            "GET /portfolio/ (uncached)": (uncached_portfolio, repeat),
+            "GET /market/": (market, repeat),
+            "GET /market/<symbol>/holders/": (top_holders, repeat),
+            "POST /trade/ buy": (buy, repeat),
+            "POST /trade/ sell": (sell, min(repeat, len(holdings))),
+            f"POST /trades/batch/ {options['batch_size']} orders": (
+                batch,
+                repeat,
+            ),
+        }
+        for size in options["csv_sizes"]:
+            scenarios[f"POST /bulk_trade/ {size} rows"] = (
+                bulk_trade(size),
+                options["bulk_requests"],
+            )
+        return scenarios
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            report = self._run(options)
+
+        with open(options["output"], "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        self.stdout.write(f"Report written to {options['output']}")
+
+        if options["max_queries"] is not None:
+            over_budget = [
+                name
+                for name, result in report["scenarios"].items()
+                if result["queries_max"] > options["max_queries"]
+            ]
+            if over_budget:
+                raise CommandError(
+                    f"Over {options['max_queries']} queries: "
+                    + ", ".join(over_budget)
+                )
+        self.stdout.write(self.style.SUCCESS("Benchmark complete"))
+
+    def _run(self, options) -> Dict:
+        owners, stocks = seed_dataset(
+            options["users"],
+            options["stocks"],
+            options["trades"],
+            prefix="benchmark",
+        )
+        clients = {}
+        for owner in owners:
+            token = Token.objects.create(user=owner)
+            clients[owner.pk] = APIClient()
+            clients[owner.pk].credentials(
+                HTTP_AUTHORIZATION=f"Token {token.key}"
+            )
+
+        report = {
+            "dataset": {
+                "users": options["users"],
+                "stocks": options["stocks"],
+                "trades_per_user": options["trades"],
+            },
+            "database": connection.vendor,
+            "scenarios": {},
+        }
+        scenarios = self._scenarios(clients, stocks, options)
+        for name, (request, repeat) in scenarios.items():
+            result = self._measure(request, repeat)
+            report["scenarios"][name] = result
+            self.stdout.write(
+                f"{name:<32} p50 {result['p50_ms']:>9.2f}ms  "
+                f"p99 {result['p99_ms']:>9.2f}ms  "
+                f"queries {result['queries_p50']:>4} "
+                f"(max {result['queries_max']})"
+            )
+        return report
@@ -0,0 +1,75 @@
+"""Build the missing holding snapshots, and optionally compact old ones"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from flexitrade.models import HoldingSnapshot
+from flexitrade.snapshots import build_snapshots, compact_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot the holdings at the end of every interval that had trades "
+        "since the latest snapshot, for historical portfolios. Meant to run "
+        "periodically, e.g. from cron. With --compact-after, also thin out "
+        "the old snapshots."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=settings.PORTFOLIO_SNAPSHOT_INTERVAL,
+            help="Seconds between snapshots.",
+        )
+        parser.add_argument(
+            "--delay",
+            type=int,
+            default=settings.PORTFOLIO_SNAPSHOT_DELAY,
+            help="Leave the trades younger than this many seconds.",
+        )
+        parser.add_argument(
+            "--compact-after",
+            type=int,
+            help="Compact the snapshots older than this many days.",
+        )
+        parser.add_argument(
+            "--compact-interval",
+            type=int,
+            default=86400,
+            help="Seconds between the snapshots kept by compaction.",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Delete all snapshots first, e.g. after trades were deleted.",
+        )
+
+    def handle(self, *args, **options):
+        if options["interval"] <= 0:
+            raise CommandError("--interval must be positive")
+
+        now = timezone.now()
+        if options["rebuild"]:
+            deleted, _ = HoldingSnapshot.objects.all().delete()
+            self.stdout.write(f"Deleted {deleted} snapshot holding(s)")
+
+        built = build_snapshots(
+            timedelta(seconds=options["interval"]),
+            now - timedelta(seconds=options["delay"]),
+        )
+        for as_of in built:
+            self.stdout.write(f"Snapshot taken as of {as_of.isoformat()}")
+
+        if options["compact_after"] is not None:
+            compacted = compact_snapshots(
+                now - timedelta(days=options["compact_after"]),
+                timedelta(seconds=options["compact_interval"]),
+            )
+            self.stdout.write(f"Compacted {compacted} snapshot(s)")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(built)} snapshot(s) built")
+        )
@@ -0,0 +1,173 @@
+"""Query-plan regression suite for the hot queries of the app"""
+
+import re
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Dict, Iterator, List
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from flexitrade.models import Trade
+from flexitrade.queries import (
+    holdings_for_queryset,
+    market_queryset,
+    owned_shares_queryset,
+    portfolio_queryset,
+    queryset_to_sql,
+    replay_holdings,
+    stock_rollup_queryset,
+    top_holders_queryset,
+    trade_history_queryset,
+)
+from flexitrade.seeding import seed_dataset, throwaway_database
+from flexitrade.snapshots import (
+    snapshot_holdings_queryset,
+    snapshot_times_queryset,
+    trades_between,
+)
+
+# What a plan must not contain, per database vendor
+PLAN_REGRESSIONS = {
+    "sqlite": {
+        # A "SCAN <table>" without an index reads the whole table
+        "full table scan": re.compile(r"\bSCAN (TABLE )?\S+$", re.MULTILINE),
+        "temp B-tree sort": re.compile(r"USE TEMP B-TREE"),
+    },
+    "postgresql": {
+        "full table scan": re.compile(r"Seq Scan on"),
+        "sort": re.compile(r"(^|->)\s*Sort\b", re.MULTILINE),
+    },
+}
+
+# Regressions a query may have by design, by query name
+EXPECTED = {
+    # Only the trades of one snapshot interval are grouped, and reading them
+    # from the (actor, created) range is what bounds the query
+    "load_portfolio_as_of (trades since)": {"temp B-tree sort", "sort"},
+    # Lists every traded stock: the scan is of the stocks, one row each
+    "load_market": {"full table scan"},
+}
+
+
+def find_regressions(name: str, plan: str) -> List[str]:
+    """The regressions of a query plan, besides the expected ones"""
+    patterns = PLAN_REGRESSIONS[connection.vendor]
+    expected = EXPECTED.get(name, set())
+    return [
+        regression
+        for regression, regex in patterns.items()
+        if regex.search(plan) and regression not in expected
+    ]
+
+
+def explain_sql(sql: str) -> str:
+    """EXPLAIN a query captured with its parameters, formatted like
+    `QuerySet.explain()`
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+        return "\n".join(
+            " ".join(str(value) for value in row) for row in cursor.fetchall()
+        )
+
+
+@contextmanager
+def index_planning() -> Iterator[None]:
+    """A transaction in which a plan only scans or sorts a whole table when
+    no index can serve the query
+    """
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            # Tiny seeded tables would be sequentially scanned and sorted
+            # anyway. A Seq Scan or Sort that remains means no index can
+            # serve the query.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("SET LOCAL enable_sort = off")
+        yield
+
+
+def hot_queries(owner, stock) -> Dict[str, QuerySet]:
+    """The queries on the request and ingestion paths, by name"""
+    now = timezone.now()
+    return {
+        "load_portfolio": portfolio_queryset(owner),
+        "load_portfolio (priced at)": portfolio_queryset(owner, now),
+        "calculate_owned_shares": owned_shares_queryset(owner, stock.pk),
+        "load_holdings_for": holdings_for_queryset(
+            [owner.pk], [stock.ticker_symbol]
+        ),
+        "replay_holdings (one user)": replay_holdings(
+            Trade.objects.filter(actor=owner)
+        ),
+        "replay_holdings (all users)": replay_holdings(),
+        "trade_history (page after a cursor)": trade_history_queryset(
+            owner, after=(now, 0)
+        )[:100],
+        "trade_history (filtered)": trade_history_queryset(
+            owner, stock_id=stock.pk, since=now - timedelta(days=1)
+        )[:100],
+        "latest_snapshot_time": snapshot_times_queryset(now)[:1],
+        "load_portfolio_as_of (snapshot)": snapshot_holdings_queryset(
+            owner, now
+        ),
+        "load_portfolio_as_of (trades since)": replay_holdings(
+            trades_between(now - timedelta(hours=1), now).filter(actor=owner)
+        ),
+        "load_market": market_queryset(),
+        "top_holders (rollup)": stock_rollup_queryset(stock.pk),
+        "top_holders": top_holders_queryset(stock.pk, 10),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a dataset, EXPLAIN every hot query, and fail if a plan has a "
+        "full table scan or a temporary sort. Runs against a throwaway test "
+        "database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--stocks", type=int, default=50)
+        parser.add_argument(
+            "--trades", type=int, default=100, help="Trades per user."
+        )
+
+    def _check_plans(self, owner, stock) -> int:
+        """EXPLAIN every hot query, returns how many plans regressed"""
+        failures = 0
+        with index_planning():
+            for name, queryset in hot_queries(owner, stock).items():
+                plan = queryset.explain()
+                regressions = find_regressions(name, plan)
+                if not regressions:
+                    self.stdout.write(f"ok    {name}")
+                    continue
+
+                failures += 1
+                self.stdout.write(f"FAIL  {name}: {', '.join(regressions)}")
+                self.stdout.write(queryset_to_sql(queryset))
+                self.stdout.write(plan + "\n")
+        return failures
+
+    def handle(self, *args, **options):
+        if connection.vendor not in PLAN_REGRESSIONS:
+            raise CommandError(
+                f"No plan checks for the {connection.vendor} database"
+            )
+
+        with throwaway_database():
+            owners, stocks = seed_dataset(
+                options["users"],
+                options["stocks"],
+                options["trades"],
+                prefix="query-plan",
+            )
+            failures = self._check_plans(owners[0], stocks[0])
+
+        if failures:
+            raise CommandError(f"{failures} query plan(s) regressed")
+        self.stdout.write(self.style.SUCCESS("All query plans use indexes"))
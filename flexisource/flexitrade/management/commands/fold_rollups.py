@@ -0,0 +1,26 @@
+"""Fold the pending rollup deltas into the market-wide rollups"""
+
+from django.core.management.base import BaseCommand
+from flexitrade.rollups import FOLD_BATCH_SIZE, fold_rollup_deltas
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold the deltas the trades append to StockRollupDelta into the "
+        "StockRollup table, e.g. every minute from cron. The market reads "
+        "are exact either way; folding keeps the deltas few."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=FOLD_BATCH_SIZE,
+            help="Deltas folded per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        folded = fold_rollup_deltas(options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"{folded} rollup delta(s) folded")
+        )
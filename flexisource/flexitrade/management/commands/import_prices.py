@@ -0,0 +1,52 @@
+"""Bulk update the stock prices from a file of ticks"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from flexitrade.formats import read_bulk_file
+from flexitrade.prices import upsert_prices
+from flexitrade.validators import PriceTickValidator
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert the price ticks of a CSV, Parquet or Arrow file with a "
+        "symbol, price and optional as_of column. Nothing is written if any "
+        "tick is invalid."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The file of ticks.")
+        parser.add_argument(
+            "--max-errors",
+            type=int,
+            default=20,
+            help="How many invalid ticks to print.",
+        )
+
+    def handle(self, *args, **options):
+        written = 0
+        errors = {}
+        try:
+            with transaction.atomic(), open(
+                options["path"], "rb"
+            ) as ticks_file, read_bulk_file(ticks_file) as reader:
+                for df in reader:
+                    ticks_validator = PriceTickValidator(df)
+                    if not ticks_validator.is_valid():
+                        errors.update(ticks_validator.errors)
+                    elif not errors:
+                        written += upsert_prices(ticks_validator.valid_ticks)
+
+                if errors:
+                    transaction.set_rollback(True)
+        except (OSError, ValueError) as err:
+            raise CommandError(f"Could not read {options['path']}: {err}")
+
+        if errors:
+            for index, row_errors in list(errors.items())[
+                : options["max_errors"]
+            ]:
+                self.stderr.write(f"row {index}: {dict(row_errors)}")
+            raise CommandError(f"{len(errors)} invalid tick(s), none written")
+
+        self.stdout.write(self.style.SUCCESS(f"{written} tick(s) written"))
@@ -0,0 +1,261 @@
+"""WSGI versus ASGI throughput of the portfolio endpoint under load"""
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from flexitrade.seeding import seed_dataset, throwaway_database
+from rest_framework.authtoken.models import Token
+
+HOST = "127.0.0.1"
+REQUEST_TIMEOUT = 30
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+async def read_response(reader) -> Tuple[int, bool]:
+    """Read one HTTP/1.1 response, return its status and if it's kept alive"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("Connection closed by the server")
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin1").partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+
+    keep_alive = headers.get("connection") != "close"
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()
+        keep_alive = False
+    return status, keep_alive
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database, serve it with gunicorn (WSGI) and with "
+        "uvicorn (ASGI), and measure the throughput and latency of "
+        "concurrent clients polling an endpoint. Writes a JSON report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--clients",
+            nargs="+",
+            type=int,
+            default=[100, 500, 1000],
+            help="Numbers of concurrent clients to measure.",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=10,
+            help="Seconds of load per server and number of clients.",
+        )
+        parser.add_argument(
+            "--servers", nargs="+", choices=["wsgi", "asgi"], default=None
+        )
+        parser.add_argument(
+            "--workers", type=int, default=2, help="Processes per server."
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=8,
+            help="Threads per WSGI worker.",
+        )
+        parser.add_argument("--path", default="/portfolio/")
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--stocks", type=int, default=20)
+        parser.add_argument(
+            "--trades", type=int, default=20, help="Trades per user."
+        )
+        parser.add_argument("--output", default="load_test_report.json")
+
+    def _server_command(self, server, port, options) -> List[str]:
+        if server == "wsgi":
+            return [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                "flexisource.wsgi:application",
+                f"--bind={HOST}:{port}",
+                f"--workers={options['workers']}",
+                "--worker-class=gthread",
+                f"--threads={options['threads']}",
+                "--backlog=2048",
+                "--log-level=warning",
+            ]
+        return [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "flexisource.asgi:application",
+            f"--host={HOST}",
+            f"--port={port}",
+            f"--workers={options['workers']}",
+            "--backlog=2048",
+            "--log-level=warning",
+            "--no-access-log",
+        ]
+
+    def _server_env(self) -> Dict[str, str]:
+        """The environment of the servers: the throwaway database, no Redis"""
+        env = dict(os.environ, REDIS_CACHE_URL="")
+        if connection.vendor == "sqlite":
+            env["SQLITE_PATH"] = str(connection.settings_dict["NAME"])
+        else:
+            env["POSTGRES_DB"] = connection.settings_dict["NAME"]
+        return env
+
+    def _start_server(self, server, options) -> Tuple[subprocess.Popen, int]:
+        port = free_port()
+        process = subprocess.Popen(
+            self._server_command(server, port, options),
+            cwd=settings.BASE_DIR,
+            env=self._server_env(),
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"The {server} server exited")
+            try:
+                socket.create_connection((HOST, port), timeout=1).close()
+                return process, port
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f"The {server} server didn't start")
+
+    async def _client(self, port, path, token, deadline, results):
+        """Send requests on a kept-alive connection until the deadline"""
+        request = (
+            f"GET {path} HTTP/1.1\r\nHost: {HOST}\r\n"
+            f"Authorization: Token {token}\r\n\r\n"
+        ).encode()
+        writer = None
+        while time.monotonic() < deadline:
+            start = perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(HOST, port)
+                writer.write(request)
+                status, keep_alive = await asyncio.wait_for(
+                    read_response(reader), REQUEST_TIMEOUT
+                )
+            except (OSError, asyncio.IncompleteReadError, TimeoutError) as e:
+                results["errors"][type(e).__name__] += 1
+                writer = None
+                await asyncio.sleep(0.1)
+                continue
+
+            results["latencies"].append(perf_counter() - start)
+            if status != 200:
+                results["errors"][f"HTTP {status}"] += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+
+        if writer is not None:
+            writer.close()
+
+    async def _load(self, port, clients, tokens, options, duration) -> Dict:
+        results = {"latencies": [], "errors": Counter()}
+        start = time.monotonic()
+        deadline = start + duration
+        await asyncio.gather(
+            *(
+                self._client(
+                    port,
+                    options["path"],
+                    tokens[i % len(tokens)],
+                    deadline,
+                    results,
+                )
+                for i in range(clients)
+            )
+        )
+        elapsed = time.monotonic() - start
+
+        latencies = results["latencies"] or [0]
+        return {
+            "requests": len(results["latencies"]),
+            "requests_per_second": round(len(results["latencies"]) / elapsed),
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+            "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 1),
+            "errors": dict(results["errors"]),
+        }
+
+    def _run(self, options) -> Dict:
+        owners, _ = seed_dataset(
+            options["users"],
+            options["stocks"],
+            options["trades"],
+            prefix="load-test",
+        )
+        tokens = [Token.objects.create(user=owner).key for owner in owners]
+        connection.close()
+
+        report = {
+            "database": connection.vendor,
+            "workers": options["workers"],
+            "wsgi_threads_per_worker": options["threads"],
+            "path": options["path"],
+            "results": {},
+        }
+        for server in options["servers"] or ["wsgi", "asgi"]:
+            process, port = self._start_server(server, options)
+            try:
+                # Workers import the app on their first requests, which
+                # mustn't count
+                asyncio.run(
+                    self._load(
+                        port, options["workers"] * 4, tokens, options, 3
+                    )
+                )
+                for clients in options["clients"]:
+                    result = asyncio.run(
+                        self._load(
+                            port, clients, tokens, options, options["duration"]
+                        )
+                    )
+                    report["results"][f"{server} {clients} clients"] = result
+                    self.stdout.write(
+                        f"{server} {clients:>5} clients: "
+                        f"{result['requests_per_second']:>6} req/s  "
+                        f"p50 {result['p50_ms']:>8.1f}ms  "
+                        f"p99 {result['p99_ms']:>8.1f}ms  "
+                        f"errors {sum(result['errors'].values())}"
+                    )
+            finally:
+                process.terminate()
+                process.wait()
+        return report
+
+    def handle(self, *args, **options):
+        with throwaway_database(threaded=True):
+            report = self._run(options)
+
+        with open(options["output"], "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        self.stdout.write(
+            self.style.SUCCESS(f"Report written to {options['output']}")
+        )
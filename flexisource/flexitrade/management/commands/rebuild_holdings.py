@@ -0,0 +1,50 @@
+"""Rebuild or verify the materialized holdings against trade history"""
+
+from django.core.management.base import BaseCommand, CommandError
+from flexitrade.holdings import (
+    diff_holdings,
+    load_current_holdings,
+    load_expected_holdings,
+    rebuild_holdings,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the Holding table by replaying the Trade history. "
+        "With --verify, only report holdings that don't match the replay."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare holdings against the replay, don't write.",
+        )
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            mismatches = diff_holdings(
+                load_expected_holdings(), load_current_holdings()
+            )
+            for (actor_id, stock_id), expected, current in mismatches:
+                self.stderr.write(
+                    f"actor={actor_id} stock={stock_id}: "
+                    f"expected {expected}, found {current}"
+                )
+            if mismatches:
+                raise CommandError(
+                    f"{len(mismatches)} holding(s) don't match trade history"
+                )
+            self.stdout.write(self.style.SUCCESS("Holdings are consistent"))
+            return
+
+        counts = rebuild_holdings()
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Holdings rebuilt: {created} created, {updated} updated, "
+                "{deleted} deleted, {rollups} rollup(s) changed".format(
+                    **counts
+                )
+            )
+        )
@@ -0,0 +1,51 @@
+"""Reconcile the market-wide rollups against a replay of trade history"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from flexitrade.holdings import load_expected_holdings
+from flexitrade.rollups import (
+    diff_rollups,
+    expected_rollups,
+    load_current_rollups,
+    rebuild_rollups,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the StockRollup table with a full replay of the Trade "
+        "history and report every stock that doesn't match. With --fix, "
+        "rewrite the rollups that don't."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Rewrite the mismatched rollups from the replay.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            holdings = load_expected_holdings()
+            mismatches = diff_rollups(
+                expected_rollups(holdings), load_current_rollups()
+            )
+            for stock_id, expected, current in mismatches:
+                self.stderr.write(
+                    f"stock={stock_id}: expected {expected[0]} share(s) and "
+                    f"{expected[1]} holder(s), found {current[0]} and "
+                    f"{current[1]}"
+                )
+            if mismatches and options["fix"]:
+                changed = rebuild_rollups(holdings)
+                self.stdout.write(
+                    self.style.SUCCESS(f"{changed} rollup(s) rewritten")
+                )
+                return
+
+        if mismatches:
+            raise CommandError(
+                f"{len(mismatches)} rollup(s) don't match trade history"
+            )
+        self.stdout.write(self.style.SUCCESS("Rollups are consistent"))
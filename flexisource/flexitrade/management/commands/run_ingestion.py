@@ -0,0 +1,70 @@
+"""Run the single-leader ingestion of the trade files dropped in the inbox"""
+
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from flexitrade.formats import FORMATS_BY_EXTENSION
+from flexitrade.ingestion import InboxWatcher, LeaderLock, ingest_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Watch the inbox directory and execute every CSV, Parquet or Arrow "
+        f"file ({', '.join(FORMATS_BY_EXTENSION)}) dropped in it exactly "
+        "once. Only one runner is active at a time, the others wait as "
+        "standbys."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--inbox",
+            default=settings.BULK_TRADE_INBOX_DIR,
+            help="Directory to watch for trade files.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds between two scans of the inbox.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Ingest the files currently in the inbox, then exit.",
+        )
+
+    def handle(self, *args, **options):
+        inbox = Path(options["inbox"])
+        inbox.mkdir(parents=True, exist_ok=True)
+        interval = options["interval"]
+
+        lock = LeaderLock(inbox)
+        if not lock.acquire():
+            if options["once"]:
+                self.stdout.write("Another runner is the leader, exiting")
+                return
+            self.stdout.write("Another runner is the leader, standing by")
+            while not lock.acquire():
+                time.sleep(interval)
+
+        self.stdout.write(f"Leading the ingestion of {inbox}")
+        watcher = InboxWatcher(inbox)
+        try:
+            # The first scan only records the files, the second one finds
+            # them unchanged and ready.
+            watcher.ready_files()
+            while True:
+                time.sleep(interval)
+                for path in watcher.ready_files():
+                    # As at the start of a request: drop the connection if
+                    # it's past CONN_MAX_AGE or broken
+                    close_old_connections()
+                    outcome = ingest_file(path)
+                    self.stdout.write(f"{path.name}: {outcome}")
+                if options["once"]:
+                    break
+        finally:
+            lock.release()
@@ -0,0 +1,208 @@
+"""Concurrent buy and sell stress test of the single trade endpoint"""
+
+import logging
+import random
+import threading
+from collections import Counter
+from time import perf_counter
+from typing import List
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from flexitrade.enums import TradeActionChoices
+from flexitrade.holdings import (
+    diff_holdings,
+    load_current_holdings,
+    load_expected_holdings,
+    rebuild_holdings,
+)
+from flexitrade.models import Holding, Trade
+from flexitrade.rollups import (
+    diff_rollups,
+    expected_rollups,
+    fold_rollup_deltas,
+    load_current_rollups,
+)
+from flexitrade.seeding import seed_dataset, throwaway_database
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database, fire concurrent buys and sells at "
+        "/trade/ from many threads, and fail if a holding went negative, "
+        "a holding or rollup no longer matches the trade history, or a "
+        "request errored."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument(
+            "--trades", type=int, default=2000, help="Trades in total."
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=4,
+            help="Few users and stocks mean more contention per holding.",
+        )
+        parser.add_argument("--stocks", type=int, default=4)
+        parser.add_argument(
+            "--shares",
+            type=int,
+            default=20,
+            help="Shares every user starts with, in every stock.",
+        )
+        parser.add_argument(
+            "--sell-ratio",
+            type=float,
+            default=0.6,
+            help="Share of the trades that are sells.",
+        )
+        parser.add_argument(
+            "--min-throughput",
+            type=float,
+            help="Fail below this many trades per second.",
+        )
+
+    def _seed(self, options):
+        """Users that own `--shares` of every stock, with API tokens"""
+        owners, stocks = seed_dataset(
+            options["users"], options["stocks"], 0, prefix="stress"
+        )
+        Trade.objects.bulk_create(
+            Trade(
+                actor=owner,
+                stock=stock,
+                action=TradeActionChoices.BUY,
+                quantity=options["shares"],
+            )
+            for owner in owners
+            for stock in stocks
+        )
+        rebuild_holdings()
+        tokens = [Token.objects.create(user=owner).key for owner in owners]
+        return tokens, [stock.ticker_symbol for stock in stocks]
+
+    def _worker(self, trades, tokens, symbols, options, outcomes, lock):
+        """Place `trades` random trades, counting the outcome of each"""
+        clients = {}
+        for token in tokens:
+            clients[token] = APIClient()
+            clients[token].credentials(HTTP_AUTHORIZATION=f"Token {token}")
+
+        counts = Counter()
+        try:
+            for _ in range(trades):
+                is_sell = random.random() < options["sell_ratio"]
+                data = {
+                    "symbol": random.choice(symbols),
+                    "quantity": random.randint(1, 5),
+                    "action": "sell" if is_sell else "buy",
+                }
+                try:
+                    response = clients[random.choice(tokens)].post(
+                        "/trade/", data
+                    )
+                except Exception as exc:
+                    counts[f"error: {exc}"] += 1
+                    continue
+
+                if response.status_code == 201:
+                    counts["sold" if is_sell else "bought"] += 1
+                elif response.status_code == 400 and is_sell:
+                    counts["rejected oversell"] += 1
+                else:
+                    counts[f"HTTP {response.status_code}"] += 1
+        finally:
+            connections.close_all()
+            with lock:
+                outcomes.update(counts)
+
+    def _run(self, options) -> List[str]:
+        tokens, symbols = self._seed(options)
+        # The threads use their own connections, which must see the seed
+        connection.close()
+
+        outcomes = Counter()
+        lock = threading.Lock()
+        per_thread, remainder = divmod(options["trades"], options["threads"])
+        workers = [
+            threading.Thread(
+                target=self._worker,
+                args=(
+                    per_thread + (i < remainder),
+                    tokens,
+                    symbols,
+                    options,
+                    outcomes,
+                    lock,
+                ),
+            )
+            for i in range(options["threads"])
+        ]
+
+        start = perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = perf_counter() - start
+
+        for outcome, count in sorted(outcomes.items()):
+            self.stdout.write(f"{outcome:<24} {count}")
+        throughput = options["trades"] / elapsed
+        self.stdout.write(
+            f"{options['trades']} trades from {options['threads']} threads "
+            f"in {elapsed:.2f}s: {throughput:.0f} trades/s"
+        )
+
+        failures = [
+            f"{count} request(s) failed with {outcome}"
+            for outcome, count in outcomes.items()
+            if outcome.startswith(("error", "HTTP"))
+        ]
+        negative = Holding.objects.filter(quantity__lt=0).count()
+        if negative:
+            failures.append(f"{negative} holding(s) went negative")
+        expected = load_expected_holdings()
+        mismatches = diff_holdings(expected, load_current_holdings())
+        if mismatches:
+            failures.append(
+                f"{len(mismatches)} holding(s) don't match the trade history"
+            )
+        mismatches = diff_rollups(
+            expected_rollups(expected), load_current_rollups()
+        )
+        if mismatches:
+            failures.append(
+                f"{len(mismatches)} rollup(s) don't match the trade history"
+            )
+        fold_rollup_deltas()
+        mismatches = diff_rollups(
+            expected_rollups(expected), load_current_rollups()
+        )
+        if mismatches:
+            failures.append(
+                f"{len(mismatches)} rollup(s) don't match the trade history "
+                "once their deltas are folded"
+            )
+        min_throughput = options["min_throughput"]
+        if min_throughput is not None and throughput < min_throughput:
+            failures.append(f"Throughput under {min_throughput} trades/s")
+        return failures
+
+    def handle(self, *args, **options):
+        # Rejected oversells are expected, don't log every one of them
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        with throwaway_database(threaded=True):
+            failures = self._run(options)
+
+        if failures:
+            raise CommandError("\n".join(failures))
+        self.stdout.write(
+            self.style.SUCCESS(
+                "No oversells, and holdings and rollups are consistent"
+            )
+        )
@@ -0,0 +1,34 @@
+"""Refresh a SQLite read replica with a copy of the primary database"""
+
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from flexitrade.routers import replica_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite database to its replica (SQLITE_REPLICA_PATH), "
+        "e.g. from cron, to stand in for replication locally. Postgres "
+        "replicas are kept up to date by the server."
+    )
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("No read replica is configured")
+
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        replica = connections[alias].settings_dict
+        if primary["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("Only a SQLite replica can be synced")
+
+        # The online backup copies a consistent snapshot, page by page,
+        # while the primary keeps taking writes and the replica reads
+        with sqlite3.connect(primary["NAME"]) as source:
+            with sqlite3.connect(replica["NAME"]) as target:
+                source.backup(target)
+        self.stdout.write(
+            self.style.SUCCESS(f"Replica {replica['NAME']} is up to date")
+        )
@@ -0,0 +1,130 @@
+"""Cross-check the binary trade journal against the Trade table"""
+
+from datetime import timedelta
+from time import perf_counter
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from flexitrade.holdings import diff_holdings, load_current_holdings
+from flexitrade.journal import (
+    JournalError,
+    append_records,
+    diff_journal,
+    load_trade_records,
+    read_journal,
+    replay_journal,
+    rewrite_journal,
+    to_micros,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare every record of the trade journal with the Trade table and "
+        "report the trades that are missing, unknown, duplicated or "
+        "mismatched. With --repair, append the missing trades, or rewrite "
+        "the journal from the table if it has wrong records."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Fix the journal from the Trade table.",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=60,
+            help=(
+                "Seconds before a trade missing from the journal counts: "
+                "younger ones may not be appended yet."
+            ),
+        )
+        parser.add_argument(
+            "--holdings",
+            action="store_true",
+            help="Also replay the journal and compare it with the holdings.",
+        )
+
+    def _check_holdings(self, journal) -> int:
+        """Replay the journal against the holdings, return the mismatches"""
+        start = perf_counter()
+        expected = replay_journal(journal)
+        self.stdout.write(
+            f"Replayed {len(journal)} trade(s) into {len(expected)} "
+            f"holding(s) in {perf_counter() - start:.2f}s"
+        )
+
+        mismatches = diff_holdings(expected, load_current_holdings())
+        for (actor_id, stock_id), replayed, current in mismatches:
+            self.stderr.write(
+                f"actor={actor_id} stock={stock_id}: journal has {replayed}, "
+                f"holding has {current}"
+            )
+        return len(mismatches)
+
+    def handle(self, *args, **options):
+        try:
+            journal = read_journal()
+        except JournalError as exc:
+            raise CommandError(str(exc))
+
+        trades = load_trade_records()
+        discrepancies = diff_journal(journal, trades)
+        # Trades committed moments ago may still be on their way
+        cutoff = timezone.now() - timedelta(seconds=options["min_age"])
+        young = trades["trade_id"][trades["created"] > to_micros(cutoff)]
+        discrepancies["missing"] = np.setdiff1d(
+            discrepancies["missing"], young
+        )
+
+        for kind, trade_ids in discrepancies.items():
+            if len(trade_ids):
+                sample = ", ".join(str(i) for i in trade_ids[:10].tolist())
+                self.stderr.write(
+                    f"{len(trade_ids)} {kind} trade(s), e.g. {sample}"
+                )
+
+        wrong = sum(
+            len(discrepancies[kind])
+            for kind in ("unknown", "duplicated", "mismatched")
+        )
+        missing = len(discrepancies["missing"])
+        repaired = options["repair"] and bool(wrong or missing)
+        if repaired and wrong:
+            rewrite_journal(trades)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Journal rewritten with {len(trades)} trade(s)"
+                )
+            )
+        elif repaired:
+            is_missing = np.isin(trades["trade_id"], discrepancies["missing"])
+            append_records(trades[is_missing])
+            self.stdout.write(
+                self.style.SUCCESS(f"{missing} missing trade(s) appended")
+            )
+
+        holding_mismatches = 0
+        if options["holdings"]:
+            # The holdings are checked against the journal as repaired
+            holding_mismatches = self._check_holdings(
+                read_journal() if repaired else journal
+            )
+
+        if (wrong or missing) and not repaired:
+            raise CommandError(
+                f"{wrong + missing} trade(s) don't match the Trade table"
+            )
+        if holding_mismatches:
+            raise CommandError(
+                f"{holding_mismatches} holding(s) don't match the journal"
+            )
+        if not (wrong or missing):
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Journal matches the Trade table ({len(trades)} trades)"
+                )
+            )
@@ -0,0 +1,50 @@
+"""Middleware of the flexitrade app"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .instrumentation import RequestMetrics, current_metrics
+
+
+class InstrumentationMiddleware:
+    """Measure every request: its duration, SQL queries and SQL time
+
+    The results are sent back in a `Server-Timing` header and added to the
+    histograms exposed on `/metrics/`. Works under both WSGI and ASGI, so
+    async views aren't pushed back onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self._finish(request, response, metrics)
+
+    def _finish(self, request, response, metrics: RequestMetrics):
+        metrics.finish()
+        response["Server-Timing"] = metrics.server_timing()
+        match = request.resolver_match
+        metrics.observe(match.view_name if match else "unresolved")
+        return response
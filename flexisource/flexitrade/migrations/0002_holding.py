@@ -0,0 +1,80 @@
+# Generated by Django 5.1 on 2026-10-18 09:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_holdings(apps, schema_editor):
+    """Materialize the holdings of every existing trade"""
+    Holding = apps.get_model("flexitrade", "Holding")
+    Trade = apps.get_model("flexitrade", "Trade")
+
+    totals = {}
+    for actor_id, stock_id, action, quantity in Trade.objects.values_list(
+        "actor_id", "stock_id", "action", "quantity"
+    ).iterator():
+        delta = -quantity if action == "s" else quantity
+        key = (actor_id, stock_id)
+        totals[key] = totals.get(key, 0) + delta
+
+    Holding.objects.bulk_create(
+        [
+            Holding(actor_id=actor_id, stock_id=stock_id, quantity=quantity)
+            for (actor_id, stock_id), quantity in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flexitrade", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Holding",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("last_modified", models.DateTimeField(auto_now_add=True)),
+                ("quantity", models.IntegerField(default=0)),
+                (
+                    "actor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="holdings",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "stock",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="held_by",
+                        to="flexitrade.stock",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("actor", "stock"),
+                        name="unique_holding_per_stock",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_holdings, migrations.RunPython.noop),
+    ]
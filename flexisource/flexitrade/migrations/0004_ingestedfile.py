@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-18 09:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flexitrade", "0003_bulktradejob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngestedFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("last_modified", models.DateTimeField(auto_now_add=True)),
+                ("sha256", models.CharField(max_length=64, unique=True)),
+                ("name", models.CharField(max_length=256)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
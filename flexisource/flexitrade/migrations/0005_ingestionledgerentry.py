@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-18 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flexitrade", "0004_ingestedfile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngestionLedgerEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("last_modified", models.DateTimeField(auto_now_add=True)),
+                ("source", models.CharField(max_length=64)),
+                ("ref", models.CharField(max_length=128)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("source", "ref"), name="unique_ledger_entry"
+                    )
+                ],
+            },
+        ),
+    ]
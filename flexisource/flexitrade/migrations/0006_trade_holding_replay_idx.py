@@ -0,0 +1,22 @@
+# Generated by Django 5.1 on 2026-10-18 09:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flexitrade", "0005_ingestionledgerentry"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trade",
+            index=models.Index(
+                fields=["actor", "stock", "action", "quantity"],
+                name="trade_holding_replay_idx",
+            ),
+        ),
+    ]
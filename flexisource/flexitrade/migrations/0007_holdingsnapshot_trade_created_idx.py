@@ -0,0 +1,63 @@
+# Generated by Django 5.1 on 2026-10-18 10:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flexitrade", "0006_trade_holding_replay_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HoldingSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("last_modified", models.DateTimeField(auto_now_add=True)),
+                ("quantity", models.IntegerField(default=0)),
+                ("as_of", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="trade",
+            index=models.Index(fields=["created"], name="trade_created_idx"),
+        ),
+        migrations.AddField(
+            model_name="holdingsnapshot",
+            name="actor",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="holding_snapshots",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="holdingsnapshot",
+            name="stock",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="holding_snapshots",
+                to="flexitrade.stock",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="holdingsnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("as_of", "actor", "stock"),
+                name="unique_snapshot_holding",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1 on 2026-10-18 10:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flexitrade", "0007_holdingsnapshot_trade_created_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trade",
+            index=models.Index(
+                fields=["actor", "created", "id"], name="trade_history_idx"
+            ),
+        ),
+    ]
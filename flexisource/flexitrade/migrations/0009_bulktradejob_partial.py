@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flexitrade", "0008_trade_history_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bulktradejob",
+            name="partial",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.1 on 2026-10-18 10:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    """Roll the existing holdings up per stock"""
+    Holding = apps.get_model("flexitrade", "Holding")
+    StockRollup = apps.get_model("flexitrade", "StockRollup")
+
+    totals = Holding.objects.values("stock_id").annotate(
+        net_shares=Sum("quantity"),
+        holder_count=Count("pk", filter=Q(quantity__gt=0)),
+    )
+    StockRollup.objects.bulk_create(
+        [
+            StockRollup(
+                stock_id=row["stock_id"],
+                net_shares=row["net_shares"],
+                holder_count=row["holder_count"],
+            )
+            for row in totals.order_by("stock_id")
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flexitrade", "0010_stockprice"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockRollup",
+            fields=[
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("last_modified", models.DateTimeField(auto_now_add=True)),
+                (
+                    "stock",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        primary_key=True,
+                        related_name="rollup",
+                        serialize=False,
+                        to="flexitrade.stock",
+                    ),
+                ),
+                ("net_shares", models.BigIntegerField(default=0)),
+                ("holder_count", models.IntegerField(default=0)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name="holding",
+            index=models.Index(
+                fields=["stock", "-quantity", "actor"],
+                name="holding_top_holders_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1 on 2026-10-18 11:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flexitrade", "0011_stockrollup_holding_top_holders_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockRollupDelta",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("last_modified", models.DateTimeField(auto_now_add=True)),
+                ("net_shares", models.BigIntegerField(default=0)),
+                ("holder_count", models.IntegerField(default=0)),
+                (
+                    "stock",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="rollup_deltas",
+                        to="flexitrade.stock",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
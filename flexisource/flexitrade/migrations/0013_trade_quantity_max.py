@@ -0,0 +1,25 @@
+# Generated by Django 5.1 on 2026-10-18 12:03
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flexitrade", "0012_stockrollupdelta"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="trade",
+            name="quantity",
+            field=models.IntegerField(
+                default=1,
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(2147483647),
+                ],
+            ),
+        ),
+    ]
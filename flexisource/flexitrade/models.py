@@ -3,7 +3,7 @@ As echoed in the README file, these premises are esoteric only.
 
 1. Users have unlimited purchasing power.
 2. Stocks have an unlimited number for shares for trading.
-3. The value of the stocks remain constant.
+3. The value of the stocks only changes when their prices are updated.
 4. A user can unilaterally buy or sell a stock anytime i.e., no counterparty.
 5. Fractional shares cannot be bought or sold.
 6. The market is always open for trading.
@@ -12,9 +12,12 @@ As echoed in the README file, these premises are esoteric only.
 from decimal import Decimal
 
 from django.conf import settings
-from django.core.validators import MinValueValidator
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from flexitrade.enums import TradeActionChoices
+from flexitrade.enums import BulkTradeJobStatusChoices, TradeActionChoices
+
+# The largest value an IntegerField holds on every database
+MAX_QUANTITY = 2**31 - 1
 
 
 class TimeStampedModel(models.Model):
@@ -73,5 +76,251 @@ class Trade(TimeStampedModel):
         default=TradeActionChoices.BUY,
     )
     quantity = models.IntegerField(
-        validators=[MinValueValidator(1)], default=1
+        validators=[MinValueValidator(1), MaxValueValidator(MAX_QUANTITY)],
+        default=1,
+    )
+
+    class Meta:
+        """Meta info"""
+
+        indexes = [
+            # Covers the replay of holdings, grouped by (actor, stock): the
+            # whole aggregation is read from the index, in group order.
+            models.Index(
+                fields=["actor", "stock", "action", "quantity"],
+                name="trade_holding_replay_idx",
+            ),
+            # Bounds the replay of the trades since a holding snapshot
+            models.Index(fields=["created"], name="trade_created_idx"),
+            # Serves the keyset pagination of a user's trade history
+            models.Index(
+                fields=["actor", "created", "id"],
+                name="trade_history_idx",
+            ),
+        ]
+
+
+class Holding(TimeStampedModel):
+    """The model that represents the net shares a User owns of a given Stock.
+
+    This is a materialized view of the `Trade` history, updated in the same
+    transaction as every `Trade` insert, so reading a position is a single
+    indexed lookup instead of a replay. It can always be rebuilt from `Trade`
+    with the `rebuild_holdings` management command.
+    """
+
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="holdings",
+        on_delete=models.PROTECT,
     )
+    stock = models.ForeignKey(
+        Stock, related_name="held_by", on_delete=models.PROTECT
+    )
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        """Meta info"""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["actor", "stock"], name="unique_holding_per_stock"
+            ),
+        ]
+        indexes = [
+            # Serves the top holders of a stock, largest holding first
+            models.Index(
+                fields=["stock", "-quantity", "actor"],
+                name="holding_top_holders_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.actor} - {self.stock}: {self.quantity}"
+
+
+class HoldingSnapshot(TimeStampedModel):
+    """The model that represents the shares a User owned of a Stock at a
+    point in time.
+
+    Snapshots are taken of all the holdings at once, by the
+    `build_portfolio_snapshots` management command. A portfolio in the past
+    is the latest snapshot before it plus the trades since, so the replay is
+    bounded by the snapshot interval instead of the whole trade history.
+    Holdings absent from a snapshot were empty at `as_of`.
+    """
+
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="holding_snapshots",
+        on_delete=models.PROTECT,
+    )
+    stock = models.ForeignKey(
+        Stock, related_name="holding_snapshots", on_delete=models.PROTECT
+    )
+    quantity = models.IntegerField(default=0)
+    as_of = models.DateTimeField()
+
+    class Meta:
+        """Meta info"""
+
+        constraints = [
+            # Also the index to find the latest snapshot before a time
+            models.UniqueConstraint(
+                fields=["as_of", "actor", "stock"],
+                name="unique_snapshot_holding",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.actor} - {self.stock}: {self.quantity} ({self.as_of})"
+
+
+class StockPrice(TimeStampedModel):
+    """The model that represents the price of a Stock from a point in time.
+
+    A stock is worth the price of its latest tick at or before a time.
+    `Stock.price` is kept equal to the price of the latest tick, so current
+    valuations don't need the history. The price a stock was listed at is
+    recorded as a tick when its price is first updated.
+    """
+
+    stock = models.ForeignKey(
+        Stock, related_name="prices", on_delete=models.PROTECT
+    )
+    price = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        validators=[MinValueValidator(0.01)],
+    )
+    as_of = models.DateTimeField()
+
+    class Meta:
+        """Meta info"""
+
+        constraints = [
+            # Also the index to find the latest price of a stock before a time
+            models.UniqueConstraint(
+                fields=["stock", "as_of"], name="unique_stock_price"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.stock}: {self.price} ({self.as_of})"
+
+
+class StockRollup(TimeStampedModel):
+    """The model that represents the market-wide position in a Stock.
+
+    The net shares all users hold of the stock, and how many users hold any,
+    as of the last `StockRollupDelta` folded into it. The market overview
+    reads one row per stock, plus the deltas not folded yet, instead of every
+    holding. The notional value is the net shares at the current price. It
+    can always be checked against, and rebuilt from, the `Trade` history with
+    the `reconcile_rollups` management command.
+    """
+
+    stock = models.OneToOneField(
+        Stock,
+        primary_key=True,
+        related_name="rollup",
+        on_delete=models.PROTECT,
+    )
+    net_shares = models.BigIntegerField(default=0)
+    holder_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return (
+            f"{self.stock}: {self.net_shares} share(s), "
+            f"{self.holder_count} holder(s)"
+        )
+
+
+class StockRollupDelta(TimeStampedModel):
+    """The model that represents a change to a StockRollup not folded yet.
+
+    Every trade appends its change in net shares and holders of a stock in
+    the same transaction as its `Holding` update, instead of updating the
+    rollup row, which every trade of a popular stock would wait on. The
+    deltas are folded into the rollups later, by the `fold_rollups`
+    management command.
+    """
+
+    stock = models.ForeignKey(
+        Stock, related_name="rollup_deltas", on_delete=models.PROTECT
+    )
+    net_shares = models.BigIntegerField(default=0)
+    holder_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return (
+            f"{self.stock}: {self.net_shares:+} share(s), "
+            f"{self.holder_count:+} holder(s)"
+        )
+
+
+class BulkTradeJob(TimeStampedModel):
+    """The model that represents a bulk trade file processed in the background
+
+    The uploaded file is stored and a worker validates and executes it. The
+    counters are final once the job is done; while it runs, the live progress
+    is kept in the cache (see `flexitrade.jobs`).
+    """
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="bulk_trade_jobs",
+        on_delete=models.PROTECT,
+    )
+    file = models.FileField(upload_to="bulk_trades/")
+    status = models.CharField(
+        max_length=10,
+        choices=BulkTradeJobStatusChoices,
+        default=BulkTradeJobStatusChoices.PENDING,
+    )
+    # Commit the valid rows and only report the invalid ones
+    partial = models.BooleanField(default=False)
+    rows_validated = models.IntegerField(default=0)
+    rows_committed = models.IntegerField(default=0)
+    errors = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"Bulk trade job {self.pk} ({self.status})"
+
+
+class IngestedFile(TimeStampedModel):
+    """The model that represents a local trade file that has been executed
+
+    Files are identified by the SHA-256 of their content, so the ingestion
+    runner never executes the same file twice, whatever its name.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=256)
+
+    def __str__(self):
+        return f"{self.name} ({self.sha256[:12]})"
+
+
+class IngestionLedgerEntry(TimeStampedModel):
+    """The model that represents a bulk trade row that has been executed
+
+    `source` is either the hash of the row's file or "order_id:<user id>",
+    and `ref` is the row number or the client-supplied order id respectively.
+    Order ids are scoped to the user, so users never skip each other's.
+    """
+
+    source = models.CharField(max_length=64)
+    ref = models.CharField(max_length=128)
+
+    class Meta:
+        """Meta info"""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source", "ref"], name="unique_ledger_entry"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.source}:{self.ref}"
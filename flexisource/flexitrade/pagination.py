@@ -0,0 +1,29 @@
+"""Opaque cursors for the keyset pagination of the trade history
+
+A cursor is the (created, id) of the last trade of a page. The next page is
+read from an index on that position, so reading page N costs the same as
+reading the first one, unlike OFFSET pagination.
+"""
+
+import base64
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(created: datetime, trade_id: int) -> str:
+    position = f"{created.isoformat()},{trade_id}"
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """The (created, id) of a cursor. Raises ValueError if it's malformed"""
+    try:
+        position = base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (ValueError, UnicodeError):
+        raise ValueError("malformed cursor")
+
+    created, _, trade_id = position.partition(",")
+    created = datetime.fromisoformat(created)
+    if created.tzinfo is None:
+        raise ValueError("malformed cursor")
+    return created, int(trade_id)
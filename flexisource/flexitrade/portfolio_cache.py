@@ -0,0 +1,149 @@
+"""Per-user cache of the portfolios, invalidated whenever the user trades
+
+Only the holdings of a user, i.e. the quantity of every stock, are cached.
+They are valued at the current prices of the stock registry on every read,
+so a price update doesn't invalidate any portfolio.
+
+The holdings are cached under a key that includes a version token of their
+user (and a global one, for rebuilds of all holdings). Invalidating means
+setting a new token once the trades are committed: a reader that raced the
+write can only have filled a key that will never be read again. Holdings
+read from a replica are never cached: the replica may not have the trades
+of the current token yet, and the entry would outlive the user's pin to
+the primary.
+"""
+
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .queries import (
+    aload_portfolio,
+    holdings_queryset,
+    load_portfolio,
+    portfolio_by_symbol,
+)
+from .routers import reading_from_replica
+from .stock_registry import StockEntry, aget_stocks, get_stocks
+
+GLOBAL_VERSION_KEY = "portfolio:version"
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _version_key(owner_id) -> str:
+    return f"portfolio:{owner_id}:version"
+
+
+def _count(event: str) -> None:
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def portfolio_cache_stats() -> Dict[str, int]:
+    """Hits and misses of the portfolio cache in this process"""
+    with _stats_lock:
+        return {"hits": _stats["hits"], "misses": _stats["misses"]}
+
+
+def _version_tokens(owner_id) -> str:
+    """The current version tokens of a user's portfolio, created if missing
+
+    A token that got evicted is replaced by a new one, so a stale entry is
+    never read again.
+    """
+    keys = [GLOBAL_VERSION_KEY, _version_key(owner_id)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return ":".join(versions[key] for key in keys)
+
+
+def _valued(
+    holdings: List[Tuple[str, int]], stocks: Dict[str, StockEntry]
+) -> Dict[str, Dict]:
+    """The portfolio of the (symbol, quantity) holdings at the stock prices
+
+    A stock deleted since the holdings were cached is left out.
+    """
+    return portfolio_by_symbol(
+        [
+            (symbol, quantity, stocks[symbol].price)
+            for symbol, quantity in holdings
+            if symbol in stocks
+        ]
+    )
+
+
+def get_portfolio(owner):
+    """Load the portfolio of a user, from the cached holdings if they're up
+    to date, valued at the current prices
+    """
+    if not settings.PORTFOLIO_CACHE_ENABLED:
+        return load_portfolio(owner)
+
+    key = f"portfolio:{owner.pk}:{_version_tokens(owner.pk)}"
+    holdings = cache.get(key)
+    if holdings is not None:
+        _count("hits")
+    else:
+        _count("misses")
+        holdings = list(holdings_queryset(owner))
+        if not reading_from_replica():
+            cache.set(key, holdings, settings.PORTFOLIO_CACHE_TIMEOUT)
+    return _valued(holdings, get_stocks(symbol for symbol, _ in holdings))
+
+
+async def _aversion_tokens(owner_id) -> str:
+    """Async version of `_version_tokens`"""
+    keys = [GLOBAL_VERSION_KEY, _version_key(owner_id)]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, uuid4().hex, None)
+            versions[key] = await cache.aget(key)
+    return ":".join(versions[key] for key in keys)
+
+
+async def aget_portfolio(owner):
+    """Async version of `get_portfolio`"""
+    if not settings.PORTFOLIO_CACHE_ENABLED:
+        return await aload_portfolio(owner)
+
+    key = f"portfolio:{owner.pk}:{await _aversion_tokens(owner.pk)}"
+    holdings = await cache.aget(key)
+    if holdings is not None:
+        _count("hits")
+    else:
+        _count("misses")
+        holdings = [holding async for holding in holdings_queryset(owner)]
+        if not reading_from_replica():
+            await cache.aset(key, holdings, settings.PORTFOLIO_CACHE_TIMEOUT)
+    stocks = await aget_stocks(symbol for symbol, _ in holdings)
+    return _valued(holdings, stocks)
+
+
+def invalidate_portfolios(owner_ids: Iterable[int]) -> None:
+    """Invalidate the portfolios of the users once the transaction commits
+
+    Nothing happens if the transaction is rolled back.
+    """
+    keys = {_version_key(owner_id) for owner_id in owner_ids}
+    transaction.on_commit(
+        lambda: cache.set_many(dict.fromkeys(keys, uuid4().hex), None)
+    )
+
+
+def invalidate_all_portfolios() -> None:
+    """Invalidate every cached portfolio once the transaction commits"""
+    transaction.on_commit(
+        lambda: cache.set(GLOBAL_VERSION_KEY, uuid4().hex, None)
+    )
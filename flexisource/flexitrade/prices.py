@@ -0,0 +1,89 @@
+"""Bulk updates of the stock prices
+
+Price ticks are upserted in as few statements as the database allows, then
+`Stock.price` is set to the latest tick up to now of every updated stock in
+a single UPDATE. A tick dated in the future is stored for the valuations at
+its time, but doesn't become the price before it. The first time a stock's
+price is updated, the price it was listed at is recorded as a tick at its
+creation, so past valuations still see it.
+"""
+
+from typing import List
+
+import pandas as pd
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Stock, StockPrice
+from .queries import chunked
+from .stock_registry import invalidate_stock_registry
+
+UPSERT_BATCH_SIZE = 10000
+
+
+def listing_prices(stock_ids: List[int]) -> List[StockPrice]:
+    """The ticks of the listing prices of the stocks without any tick yet"""
+    listings = []
+    for ids_chunk in chunked(stock_ids):
+        stocks = (
+            Stock.objects.filter(id__in=ids_chunk)
+            .exclude(Exists(StockPrice.objects.filter(stock=OuterRef("pk"))))
+            .values_list("id", "price", "created")
+        )
+        listings.extend(
+            StockPrice(stock_id=stock_id, price=price, as_of=created)
+            for stock_id, price, created in stocks
+        )
+    return listings
+
+
+def upsert_prices(ticks: pd.DataFrame) -> int:
+    """Write price ticks, replacing any of a stock at the same time
+
+    `ticks` has a `stock_id`, `price` and `as_of` column, and the latest of
+    its duplicate rows wins. Returns the number of ticks written.
+    """
+    ticks = ticks.drop_duplicates(["stock_id", "as_of"], keep="last")
+    stock_ids = ticks["stock_id"].unique().tolist()
+
+    with transaction.atomic():
+        keys = set(zip(ticks["stock_id"].tolist(), ticks["as_of"].tolist()))
+        prices = [
+            listing
+            for listing in listing_prices(stock_ids)
+            if (listing.stock_id, listing.as_of) not in keys
+        ]
+        prices.extend(
+            StockPrice(stock_id=stock_id, price=price, as_of=as_of)
+            for stock_id, price, as_of in zip(
+                ticks["stock_id"].tolist(),
+                ticks["price"].tolist(),
+                ticks["as_of"].tolist(),
+            )
+        )
+        StockPrice.objects.bulk_create(
+            prices,
+            batch_size=UPSERT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["stock", "as_of"],
+            update_fields=["price", "last_modified"],
+        )
+
+        now = timezone.now()
+        latest = (
+            StockPrice.objects.filter(stock=OuterRef("pk"), as_of__lte=now)
+            .order_by("-as_of")
+            .values("price")[:1]
+        )
+        for ids_chunk in chunked(stock_ids):
+            Stock.objects.filter(id__in=ids_chunk).update(
+                price=Subquery(latest), last_modified=now
+            )
+
+        # Neither signals nor saves cover a bulk update. The cached
+        # portfolios are valued at the prices of the registry, so they
+        # don't need invalidating.
+        invalidate_stock_registry()
+
+    return len(ticks)
@@ -1,79 +1,344 @@
 import re
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterator, List, Tuple
 
+import numpy as np
 from django.db import connection
-from django.db.models import F, IntegerField, QuerySet, Sum
+from django.db.models import (
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Sum,
+)
 from django.db.models.expressions import Case, Value, When
+from django.db.models.functions import Coalesce
 
 from .enums import TradeActionChoices
-from .models import Trade
+from .models import Holding, Stock, StockPrice, StockRollupDelta, Trade
+from .stock_registry import aget_stock, get_stock
 
 
-@staticmethod
-def load_portfolio(owner):
-    """Load the portfolio values of a user by replaying trade history
+def effective_quantity():
+    """Expression for the signed quantity of a trade: +buys and -sells"""
+    return Case(
+        When(action=TradeActionChoices.BUY, then=F("quantity")),
+        When(
+            action=TradeActionChoices.SELL,
+            then=(F("quantity") * Value(-1)),
+        ),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
 
-    This will get the total number of shares remaining and value per stock.
-    References: https://stackoverflow.com/a/44915227
+def replay_holdings(trades: QuerySet = None) -> QuerySet:
+    """Calculate the holdings per (actor, stock) by replaying trade history
+
+    This is the source of truth the `Holding` table is rebuilt and verified
+    against. References: https://stackoverflow.com/a/44915227
     """
+    if trades is None:
+        trades = Trade.objects.all()
+
+    return (
+        trades.values("actor_id", "stock_id")
+        .annotate(total_quantity=Sum(effective_quantity()))
+        .order_by("actor_id", "stock_id")
+    )
+
+
+def price_at(as_of: datetime, stock: str = "pk"):
+    """Expression for the price of a stock at a point in time
+
+    The price of the latest tick at or before `as_of`, read from the
+    (stock, as_of) index. A stock without one has always had its `price`.
+    """
+    tick = (
+        StockPrice.objects.filter(stock=OuterRef(stock), as_of__lte=as_of)
+        .order_by("-as_of")
+        .values("price")[:1]
+    )
+    price = "price" if stock == "pk" else f"{stock}__price"
+    return Coalesce(Subquery(tick), F(price))
 
-    queryset = (
-        Trade.objects.filter(
+
+def portfolio_queryset(owner, priced_at: datetime = None) -> QuerySet:
+    """The (symbol, quantity, price) of every holding of a user
+
+    The price is the current one, or the one at `priced_at`. Not ordered, so
+    the query is a plain index lookup without a sort step.
+    """
+    price = (
+        F("stock__price")
+        if priced_at is None
+        else price_at(priced_at, stock="stock")
+    )
+    return (
+        Holding.objects.filter(
             actor=owner,
         )
         .annotate(
-            effective_quantity=Case(
-                When(action=TradeActionChoices.BUY, then=F("quantity")),
-                When(
-                    action=TradeActionChoices.SELL,
-                    then=(F("quantity") * Value(-1)),
-                ),
-                default=Value(0),
-                output_field=IntegerField(),
-            )
-        )
-        .annotate(total_quantity=Sum("effective_quantity"))
-        .values("stock__ticker_symbol", "total_quantity")
-        .annotate(
-            total_value=F("total_quantity") * F("stock__price"),
             ticker_symbol=F("stock__ticker_symbol"),
-            price=F("stock__price"),
+            price_at=price,
+        )
+        .values_list("ticker_symbol", "quantity", "price_at")
+    )
+
+
+def holdings_queryset(owner) -> QuerySet:
+    """The (symbol, quantity) of every holding of a user, without prices"""
+    return (
+        Holding.objects.filter(actor=owner)
+        .annotate(ticker_symbol=F("stock__ticker_symbol"))
+        .values_list("ticker_symbol", "quantity")
+    )
+
+
+def values_of(quantities, prices) -> List[Decimal]:
+    """The value of every quantity of shares at its price
+
+    The values are computed all at once, as arrays of integer cents, so they
+    are exact and don't cost a multiplication per row.
+    """
+    cents = np.rint(np.array(prices, dtype=float) * 100).astype(np.int64)
+    values = np.array(quantities, dtype=np.int64) * cents
+    return [Decimal(int(value)).scaleb(-2) for value in values]
+
+
+def portfolio_by_symbol(rows) -> Dict[str, Dict]:
+    """Value the (symbol, quantity, price) rows, keyed by symbol in order"""
+    rows = sorted(rows)
+    if not rows:
+        return {}
+
+    symbols, quantities, prices = zip(*rows)
+    return {
+        symbol: {
+            "total_value": value,
+            "total_quantity": quantity,
+            "price": price,
+        }
+        for symbol, quantity, price, value in zip(
+            symbols, quantities, prices, values_of(quantities, prices)
         )
-        .values("ticker_symbol", "total_value", "total_quantity", "price")
-        .order_by("ticker_symbol")
+    }
+
+
+@staticmethod
+def load_portfolio(owner, priced_at: datetime = None):
+    """Load the portfolio values of a user from the materialized holdings
+
+    This will get the total number of shares remaining and value per stock,
+    at the current prices or at the prices of `priced_at`.
+    """
+
+    return portfolio_by_symbol(portfolio_queryset(owner, priced_at))
+
+
+async def aload_portfolio(owner):
+    """Async version of `load_portfolio`"""
+    return portfolio_by_symbol(
+        [stock async for stock in portfolio_queryset(owner)]
     )
 
-    results = {}
-    for stock in queryset:
-        ticker_symbol = stock.pop("ticker_symbol")
-        results[ticker_symbol] = stock
 
-    return results
+def owned_shares_queryset(owner, stock_id) -> QuerySet:
+    """The quantity of a user's holding of a stock, as a one-value queryset"""
+    return Holding.objects.filter(
+        stock_id=stock_id,
+        actor=owner,
+    ).values_list("quantity", flat=True)
 
 
 @staticmethod
 def calculate_owned_shares(owner, symbol):
-    """Calculate the shares user owns of a stock by replaying trade history"""
+    """Get the shares user owns of a stock from the materialized holdings
 
-    total_sum = (
-        Trade.objects.filter(
-            stock__ticker_symbol=symbol,
-            actor=owner,
+    The stock is resolved by the stock registry, so the holding is read
+    without joining the stocks. A user owns no shares of an unknown symbol.
+    """
+    stock = get_stock(symbol)
+    if stock is None:
+        return 0
+
+    owned_shares = next(iter(owned_shares_queryset(owner, stock.id)), None)
+
+    return owned_shares or 0
+
+
+async def acalculate_owned_shares(owner, symbol):
+    """Async version of `calculate_owned_shares`"""
+    stock = await aget_stock(symbol)
+    if stock is None:
+        return 0
+
+    async for owned_shares in owned_shares_queryset(owner, stock.id):
+        return owned_shares
+    return 0
+
+
+def pending_rollup_delta(field: str):
+    """Expression for the sum of a field of the deltas of a stock that
+    aren't folded into its rollup yet, read from the deltas' stock index
+    """
+    total = (
+        StockRollupDelta.objects.filter(stock=OuterRef("pk"))
+        .values("stock")
+        .annotate(total=Sum(field))
+        .values("total")
+    )
+    return Coalesce(F(f"rollup__{field}"), 0) + Coalesce(Subquery(total), 0)
+
+
+def rollups_queryset() -> QuerySet:
+    """Every traded stock, with its `market_net_shares` and
+    `market_holder_count`: its rollup plus the deltas not folded yet
+
+    It's a single query, so a concurrent fold is seen whole or not at all.
+    """
+    return Stock.objects.filter(
+        Q(rollup__isnull=False)
+        | Exists(StockRollupDelta.objects.filter(stock=OuterRef("pk")))
+    ).annotate(
+        market_net_shares=pending_rollup_delta("net_shares"),
+        market_holder_count=pending_rollup_delta("holder_count"),
+    )
+
+
+def stock_rollup_queryset(stock_id) -> QuerySet:
+    """The (net shares, holder count) of a stock, no row if never traded
+
+    Sliced rather than `first()`, which would sort the row by its id.
+    """
+    return (
+        rollups_queryset()
+        .filter(pk=stock_id)
+        .values_list("market_net_shares", "market_holder_count")[:1]
+    )
+
+
+def market_queryset() -> QuerySet:
+    """The (symbol, net shares, holder count, price) of every traded stock"""
+    return rollups_queryset().values_list(
+        "ticker_symbol", "market_net_shares", "market_holder_count", "price"
+    )
+
+
+def load_market():
+    """Load the market-wide position in every stock, keyed by symbol
+
+    Read from the rollups and their pending deltas, so it's one row per stock
+    whatever the number of users and trades. The notional value is at the
+    current price.
+    """
+    rows = sorted(market_queryset())
+    if not rows:
+        return {}
+
+    symbols, net_shares, holder_counts, prices = zip(*rows)
+    return {
+        symbol: {
+            "net_shares": shares,
+            "holder_count": holders,
+            "price": price,
+            "notional_value": value,
+        }
+        for symbol, shares, holders, price, value in zip(
+            symbols,
+            net_shares,
+            holder_counts,
+            prices,
+            values_of(net_shares, prices),
         )
-        .annotate(
-            effective_quantity=Case(
-                When(action=TradeActionChoices.BUY, then=F("quantity")),
-                When(
-                    action=TradeActionChoices.SELL,
-                    then=(F("quantity") * Value(-1)),
-                ),
-                default=Value(0),
-                output_field=IntegerField(),
-            )
+    }
+
+
+def top_holders_queryset(stock_id, limit: int) -> QuerySet:
+    """The (username, quantity) of the largest holders of a stock
+
+    Read from the (stock, -quantity, actor) index in order, so only `limit`
+    holdings are read however many users hold the stock.
+    """
+    return (
+        Holding.objects.filter(stock_id=stock_id, quantity__gt=0)
+        .order_by("-quantity", "actor_id")
+        .values_list("actor__username", "quantity")[:limit]
+    )
+
+
+def chunked(items, size: int = 500) -> Iterator[list]:
+    """Split items into lists of at most `size`, e.g. to bound IN clauses"""
+    items = list(items)
+    for start in range(0, len(items), size):
+        end = start + size
+        yield items[start:end]
+
+
+def trade_history_queryset(
+    owner,
+    stock_id: int = None,
+    action: str = None,
+    since: datetime = None,
+    until: datetime = None,
+    after: Tuple[datetime, int] = None,
+) -> QuerySet:
+    """The trades of a user, newest first, as rows for the trade history
+
+    `since` is inclusive and `until` exclusive. `after` is the (created, id)
+    of the last trade of the previous page: the trades older than it are
+    read from the (actor, created, id) index, however deep the page is. The
+    position is a range condition plus a filter for the trades created at
+    the same time, so the index scan starts right at it.
+    """
+    trades = Trade.objects.filter(actor=owner)
+    if stock_id is not None:
+        trades = trades.filter(stock_id=stock_id)
+    if action is not None:
+        trades = trades.filter(action=action)
+    if since is not None:
+        trades = trades.filter(created__gte=since)
+    if until is not None:
+        trades = trades.filter(created__lt=until)
+    if after is not None:
+        created, trade_id = after
+        trades = trades.filter(created__lte=created).filter(
+            Q(created__lt=created) | Q(id__lt=trade_id)
         )
-        .aggregate(total_sum=Sum("effective_quantity"))["total_sum"]
+
+    return trades.order_by("-created", "-id").values_list(
+        "id", "created", "stock__ticker_symbol", "action", "quantity"
     )
 
-    return total_sum or 0
+
+def holdings_for_queryset(owner_ids, symbols) -> QuerySet:
+    """The holdings of many users in many stocks, in one query"""
+    return Holding.objects.filter(
+        actor_id__in=owner_ids,
+        stock__ticker_symbol__in=symbols,
+    ).values_list("actor_id", "stock__ticker_symbol", "quantity")
+
+
+def load_holdings_for(owner_ids, symbols) -> Dict[Tuple[int, str], int]:
+    """Load the holdings of many users in many stocks in one grouped query
+
+    Returns {(actor_id, ticker_symbol): quantity}. Pairs the users don't hold
+    are simply absent. The lookup is only split into several queries when the
+    users or symbols would overflow the database's limit on query parameters.
+    """
+    holdings = {}
+    symbols = set(symbols)
+    for owners_chunk in chunked(set(owner_ids)):
+        for symbols_chunk in chunked(symbols):
+            queryset = holdings_for_queryset(owners_chunk, symbols_chunk)
+            for actor_id, symbol, quantity in queryset:
+                holdings[(actor_id, symbol)] = quantity
+
+    return holdings
 
 
 def queryset_to_sql(queryset_to_explain: QuerySet) -> str:
@@ -93,6 +358,11 @@ def queryset_to_sql(queryset_to_explain: QuerySet) -> str:
 
     translated_sql = translated_sql.replace("EXPLAIN ", "")
 
+    return format_sql(translated_sql)
+
+
+def format_sql(translated_sql: str) -> str:
+    """Break a query sent to the database into lines, for readability"""
     joins_regex = r"(([A-Z]+\s)*JOIN)"
     translated_sql = re.sub(joins_regex, r"\n\1", translated_sql)
 
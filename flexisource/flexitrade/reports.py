@@ -0,0 +1,81 @@
+"""Reports of the bulk trades executed in partial mode
+
+Only the counts and the rejected rows are reported, not a message per
+executed row. The rejected rows can also be exported as a CSV file of the
+original rows plus their errors, to be fixed and uploaded again: the extra
+`row` and `errors` columns are ignored by the bulk trade endpoint.
+"""
+
+import csv
+from typing import Dict, Iterator
+
+from .formats import read_bulk_file
+from .ledger import MSG_SKIPPED
+
+
+class Echo:
+    """A file-like object that returns what's written to it, for streaming
+    the lines of a `csv.writer`
+
+    Reference:
+    https://docs.djangoproject.com/en/5.1/howto/outputting-csv/#streaming-large-csv-files
+    """
+
+    def write(self, value):
+        return value
+
+
+def row_errors(errors: Dict) -> Dict[int, Dict]:
+    """The errors of the rows, without the errors of the whole file"""
+    return {
+        index: row_error
+        for index, row_error in errors.items()
+        if not isinstance(index, str)
+    }
+
+
+def partial_report(errors: Dict, executed_trades: Dict[int, str]) -> Dict:
+    """Count the executed, skipped and failed rows, and list the failures"""
+    skipped = sum(msg == MSG_SKIPPED for msg in executed_trades.values())
+    failures = row_errors(errors)
+    report = {
+        "executed": len(executed_trades) - skipped,
+        "skipped": skipped,
+        "failed": len(failures),
+        "errors": failures,
+    }
+    if "error" in errors:
+        report["error"] = errors["error"]
+    return report
+
+
+def describe_errors(row_error: Dict) -> str:
+    return "; ".join(
+        f"{key}: {msg}" for key, msgs in row_error.items() for msg in msgs
+    )
+
+
+def error_rows_csv(csv_file, errors: Dict) -> Iterator[str]:
+    """Stream the failed rows of a file, with a `row` and `errors` column
+
+    The file is read again from the start, one chunk at a time, so the
+    original values are kept exactly as they were.
+    """
+    failures = row_errors(errors)
+    writer = csv.writer(Echo())
+    header_written = False
+
+    csv_file.seek(0)
+    with read_bulk_file(csv_file, keep_default_na=False) as reader:
+        for df in reader:
+            if not header_written:
+                yield writer.writerow([*df.columns, "row", "errors"])
+                header_written = True
+
+            failed = df[df.index.isin(list(failures))]
+            # Typed files have missing values instead of blanks
+            failed = failed.astype(object).where(failed.notna(), "")
+            for index, values in zip(failed.index, failed.to_numpy()):
+                yield writer.writerow(
+                    [*values, index, describe_errors(failures[index])]
+                )
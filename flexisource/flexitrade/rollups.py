@@ -0,0 +1,203 @@
+"""Maintenance of the market-wide `StockRollup` table
+
+The trades don't update the rollups. Every transaction that changes
+holdings appends its net change in shares and holders per stock to
+`StockRollupDelta`, which takes no lock another trade waits on. The deltas
+are folded into the rollups later, in batches, by `fold_rollup_deltas`, and
+the rollups are read together with the deltas not folded yet (see
+`flexitrade.queries.rollups_queryset`). A holder is gained when a holding
+goes from 0 to positive, and lost when it goes back to 0.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from django.db import transaction
+
+from .models import StockRollup, StockRollupDelta
+from .queries import chunked, rollups_queryset
+
+HoldingKey = Tuple[int, int]  # (actor_id, stock_id)
+RollupChange = Tuple[int, int]  # (net shares delta, holder count delta)
+
+FOLD_BATCH_SIZE = 10000
+
+
+def holder_change(owned_shares: int, delta: int) -> int:
+    """The change in holders of a stock when a holding changes by `delta`"""
+    return int(owned_shares + delta > 0) - int(owned_shares > 0)
+
+
+def apply_rollup_change(stock_id: int, shares: int, holders: int) -> None:
+    """Record the change of a single trade to the rollup of its stock
+
+    Must be called in the transaction that changed the holding, after it.
+    The change is appended as a delta, so concurrent trades of the stock
+    don't wait on each other.
+    """
+    apply_rollup_changes({stock_id: (shares, holders)})
+
+
+def lock_rollups(stock_ids) -> Dict[int, StockRollup]:
+    """Lock and read the rollups of the stocks, by stock id"""
+    rollups = {}
+    for ids_chunk in chunked(sorted(stock_ids)):
+        # Locked in primary key order, so that concurrent bulk trades don't
+        # deadlock on each other's rollups
+        queryset = (
+            StockRollup.objects.select_for_update()
+            .filter(stock_id__in=ids_chunk)
+            .order_by("pk")
+        )
+        for rollup in queryset:
+            rollups[rollup.stock_id] = rollup
+    return rollups
+
+
+def apply_rollup_changes(changes: Dict[int, RollupChange]) -> None:
+    """Record the net change of many trades to the rollups at once
+
+    Must be called in the transaction that changed the holdings, after them.
+    One delta is appended per stock, in one bulk insert.
+    """
+    StockRollupDelta.objects.bulk_create(
+        [
+            StockRollupDelta(
+                stock_id=stock_id, net_shares=shares, holder_count=holders
+            )
+            for stock_id, (shares, holders) in changes.items()
+            if (shares, holders) != (0, 0)
+        ],
+        batch_size=1000,
+    )
+
+
+def add_to_rollups(changes: Dict[int, RollupChange]) -> None:
+    """Add the net changes to the rollups of their stocks
+
+    The rollups are locked and read in a few queries and written back with
+    one bulk update. Missing rollups are created first, ignoring the ones a
+    concurrent writer created, and locked like the others.
+    """
+    rollups = lock_rollups(changes)
+    missing = changes.keys() - rollups.keys()
+    if missing:
+        StockRollup.objects.bulk_create(
+            [StockRollup(stock_id=stock_id) for stock_id in missing],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        rollups.update(lock_rollups(missing))
+
+    for stock_id, (shares, holders) in changes.items():
+        rollups[stock_id].net_shares += shares
+        rollups[stock_id].holder_count += holders
+    StockRollup.objects.bulk_update(
+        rollups.values(), ["net_shares", "holder_count"], batch_size=1000
+    )
+
+
+def fold_rollup_deltas(batch_size: int = FOLD_BATCH_SIZE) -> int:
+    """Fold the pending deltas into the rollups, returns how many were folded
+
+    Each batch of deltas is summed per stock, added to the rollups and
+    deleted in one transaction, so a reader sees it either pending or
+    folded. Deltas being folded by a concurrent call are skipped.
+    """
+    folded = 0
+    while True:
+        with transaction.atomic():
+            deltas = list(
+                StockRollupDelta.objects.select_for_update(skip_locked=True)
+                .order_by("pk")
+                .values_list("pk", "stock_id", "net_shares", "holder_count")[
+                    :batch_size
+                ]
+            )
+            changes = defaultdict(lambda: (0, 0))
+            for _, stock_id, shares, holders in deltas:
+                total_shares, total_holders = changes[stock_id]
+                changes[stock_id] = (
+                    total_shares + shares,
+                    total_holders + holders,
+                )
+            add_to_rollups(changes)
+            for pks in chunked([pk for pk, *_ in deltas]):
+                StockRollupDelta.objects.filter(pk__in=pks).delete()
+
+        folded += len(deltas)
+        if len(deltas) < batch_size:
+            return folded
+
+
+def expected_rollups(
+    holdings: Dict[HoldingKey, int],
+) -> Dict[int, RollupChange]:
+    """Roll the holdings up to {stock_id: (net shares, holder count)}"""
+    rollups = defaultdict(lambda: (0, 0))
+    for (_, stock_id), quantity in holdings.items():
+        shares, holders = rollups[stock_id]
+        rollups[stock_id] = (shares + quantity, holders + int(quantity > 0))
+    return dict(rollups)
+
+
+def load_current_rollups() -> Dict[int, RollupChange]:
+    """Read the rollups, with their pending deltas, into
+    {stock_id: (net shares, holder count)}
+    """
+    rollups = rollups_queryset().values_list(
+        "pk", "market_net_shares", "market_holder_count"
+    )
+    return {
+        stock_id: (net_shares, holder_count)
+        for stock_id, net_shares, holder_count in rollups
+    }
+
+
+def diff_rollups(
+    expected: Dict[int, RollupChange], current: Dict[int, RollupChange]
+) -> List[Tuple[int, RollupChange, RollupChange]]:
+    """List (stock_id, expected, current) for every rollup that doesn't match
+
+    A stock without a rollup has no shares and no holders, so a missing
+    rollup only mismatches if the stock is held.
+    """
+    mismatches = []
+    for stock_id in sorted(expected.keys() | current.keys()):
+        expected_rollup = expected.get(stock_id, (0, 0))
+        current_rollup = current.get(stock_id, (0, 0))
+        if expected_rollup != current_rollup:
+            mismatches.append((stock_id, expected_rollup, current_rollup))
+    return mismatches
+
+
+def rebuild_rollups(holdings: Dict[HoldingKey, int]) -> int:
+    """Set the rollups to the ones of the holdings, returns how many changed
+
+    Must be called in a transaction. The pending deltas are folded first,
+    then only rollups that differ are written.
+    """
+    fold_rollup_deltas()
+    expected = expected_rollups(holdings)
+    existing = {
+        rollup.stock_id: rollup
+        for rollup in StockRollup.objects.select_for_update()
+    }
+
+    to_create = [
+        StockRollup(stock_id=stock_id, net_shares=shares, holder_count=count)
+        for stock_id, (shares, count) in expected.items()
+        if stock_id not in existing
+    ]
+    to_update = []
+    for stock_id, rollup in existing.items():
+        shares, count = expected.get(stock_id, (0, 0))
+        if (rollup.net_shares, rollup.holder_count) != (shares, count):
+            rollup.net_shares, rollup.holder_count = shares, count
+            to_update.append(rollup)
+
+    StockRollup.objects.bulk_create(to_create, batch_size=1000)
+    StockRollup.objects.bulk_update(
+        to_update, ["net_shares", "holder_count"], batch_size=1000
+    )
+    return len(to_create) + len(to_update)
@@ -0,0 +1,131 @@
+"""Routing of the read-only endpoints to a read replica of the database
+
+The replica is the `DATABASE_REPLICA_ALIAS` database, if configured. Reads
+only go to it inside `replica_reads()`, which the read-only views enter once
+the user is authenticated. Everything else, and every read in a
+transaction, stays on the primary.
+
+A replica lags behind the primary. After a user trades, the user is pinned
+to the primary for `REPLICA_READ_YOUR_WRITES` seconds, so their next reads
+see their trades. The pins are kept in the cache, which must be shared
+(e.g. Redis) for the pin to hold across processes.
+"""
+
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ALL_USERS_PIN_KEY = "replica:pin:all"
+
+_replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+
+
+def replica_alias() -> Optional[str]:
+    """The alias of the replica, None if there is none"""
+    alias = settings.DATABASE_REPLICA_ALIAS
+    if alias and alias in settings.DATABASES:
+        return alias
+    return None
+
+
+def _pin_key(user_id) -> str:
+    return f"replica:pin:{user_id}"
+
+
+def pin_to_primary(user_ids: Iterable[int] = None) -> None:
+    """Read from the primary for a while, for the users or for everyone
+
+    Call when the users' data is written, e.g. in the transaction of their
+    trades. Without `user_ids`, e.g. after a rebuild of all holdings,
+    everyone is pinned. Prices don't pin anyone: they may lag a little on
+    the replica.
+    """
+    if replica_alias() is None:
+        return
+
+    timeout = settings.REPLICA_READ_YOUR_WRITES
+    if user_ids is None:
+        cache.set(ALL_USERS_PIN_KEY, True, timeout)
+        return
+    keys = {_pin_key(user_id) for user_id in user_ids}
+    cache.set_many(dict.fromkeys(keys, True), timeout)
+
+
+@contextmanager
+def replica_reads(user):
+    """Send the reads of the block to the replica, unless the user is pinned"""
+    use_replica = False
+    if replica_alias() is not None:
+        pins = cache.get_many([ALL_USERS_PIN_KEY, _pin_key(user.pk)])
+        use_replica = not any(pins.values())
+    token = _replica_reads.set(use_replica)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@asynccontextmanager
+async def areplica_reads(user):
+    """Async version of `replica_reads`"""
+    use_replica = False
+    if replica_alias() is not None:
+        pins = await cache.aget_many([ALL_USERS_PIN_KEY, _pin_key(user.pk)])
+        use_replica = not any(pins.values())
+    token = _replica_reads.set(use_replica)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def reading_from_replica() -> bool:
+    """Whether the reads outside a transaction go to the replica here"""
+    return replica_alias() is not None and _replica_reads.get()
+
+
+@contextmanager
+def primary_reads():
+    """Send the reads of the block to the primary, even in `replica_reads`
+
+    For reads a write is decided on, e.g. the shares a sell is checked
+    against, which must not be stale.
+    """
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReadReplicaRouter:
+    """Route the reads in `replica_reads()` to the replica
+
+    Returning None defers to the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias is None or not _replica_reads.get():
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # What a transaction reads must be what it will write against
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary, like its data
+        if db == replica_alias():
+            return False
+        return None
@@ -0,0 +1,92 @@
+"""Synthetic datasets and throwaway databases for the benchmark commands"""
+
+import os
+import random
+from contextlib import contextmanager
+from tempfile import TemporaryDirectory
+from typing import Iterator, List, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Model
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from .enums import TradeActionChoices
+from .holdings import rebuild_holdings
+from .models import Stock, Trade
+
+UserModel = get_user_model()
+
+# Benchmarks must never read or write a shared (e.g. Redis) cache
+ISOLATED_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmark",
+    }
+}
+
+
+@contextmanager
+def throwaway_database(threaded: bool = False) -> Iterator[None]:
+    """Run the block against a new test database, with a local cache and
+    a temporary trade journal
+
+    The test database is destroyed afterwards. The SQLite test database is
+    in memory, which threads can't share: with `threaded` it is a temporary
+    file instead.
+    """
+    with TemporaryDirectory() as tmp_dir:
+        if threaded and connection.vendor == "sqlite":
+            test_settings = connection.settings_dict["TEST"]
+            test_settings["NAME"] = os.path.join(tmp_dir, "test.sqlite3")
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(
+                CACHES=ISOLATED_CACHES,
+                TRADE_JOURNAL_PATH=os.path.join(tmp_dir, "trades.journal"),
+            ):
+                yield
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+
+def seed_dataset(
+    users: int, stocks: int, trades_per_user: int, prefix: str = "seed"
+) -> Tuple[List[Model], List[Stock]]:
+    """Create users, stocks and buy trades, and materialize their holdings
+
+    Only buys are created so every holding is positive and can be sold from.
+    """
+    owners = UserModel.objects.bulk_create(
+        [UserModel(username=f"{prefix}-{i}") for i in range(users)]
+    )
+    stocks = Stock.objects.bulk_create(
+        [
+            Stock(ticker_symbol=f"Q{i}", price=random.uniform(1, 1000))
+            for i in range(stocks)
+        ]
+    )
+    Trade.objects.bulk_create(
+        [
+            Trade(
+                actor=owner,
+                stock=random.choice(stocks),
+                action=TradeActionChoices.BUY,
+                quantity=random.randint(1, 100),
+            )
+            for owner in owners
+            for _ in range(trades_per_user)
+        ],
+        batch_size=1000,
+    )
+    rebuild_holdings()
+    return owners, stocks
@@ -3,6 +3,8 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from .models import BulkTradeJob
+
 UserModel = get_user_model()
 
 
@@ -17,3 +19,19 @@ class UserSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         return UserModel.objects.create_user(**validated_data)
+
+
+class BulkTradeJobSerializer(serializers.ModelSerializer):
+    """Serializer used for reporting on bulk trade jobs"""
+
+    class Meta:
+        model = BulkTradeJob
+        fields = (
+            "id",
+            "status",
+            "partial",
+            "rows_validated",
+            "rows_committed",
+            "errors",
+            "created",
+        )
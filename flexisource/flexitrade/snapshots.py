@@ -0,0 +1,177 @@
+"""Point-in-time snapshots of the holdings, for historical portfolios
+
+Snapshots are taken on a grid of `interval` aligned to the Unix epoch, and
+only at the end of intervals that had trades. Each one is the previous
+snapshot plus the trades since, so building them never replays the whole
+history either.
+
+A trade's `created` is set before its transaction commits, so a snapshot is
+only taken once it's `delay` old; a trade still uncommitted at snapshot time
+would otherwise be missed by the snapshot and by every replay after it.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.db.models import QuerySet
+
+from .models import HoldingSnapshot, Stock, Trade
+from .queries import portfolio_by_symbol, price_at, replay_holdings
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def snapshot_times_queryset(at_or_before: datetime = None) -> QuerySet:
+    """The times of the snapshots, latest first"""
+    snapshots = HoldingSnapshot.objects.all()
+    if at_or_before is not None:
+        snapshots = snapshots.filter(as_of__lte=at_or_before)
+    return snapshots.order_by("-as_of").values_list("as_of", flat=True)
+
+
+def latest_snapshot_time(at_or_before: datetime = None) -> Optional[datetime]:
+    """The time of the latest snapshot, optionally no later than a time"""
+    return snapshot_times_queryset(at_or_before).first()
+
+
+def snapshot_holdings_queryset(owner, as_of: datetime) -> QuerySet:
+    """The holdings of a user in the snapshot at `as_of`"""
+    return HoldingSnapshot.objects.filter(
+        as_of=as_of, actor=owner
+    ).values_list("stock_id", "quantity")
+
+
+def trades_between(since: Optional[datetime], until: datetime) -> QuerySet:
+    """The trades created after `since`, if given, and up to `until`"""
+    trades = Trade.objects.filter(created__lte=until)
+    if since is not None:
+        trades = trades.filter(created__gt=since)
+    return trades
+
+
+def end_of_interval(moment: datetime, interval: timedelta) -> datetime:
+    """The first point of the snapshot grid at or after a moment"""
+    intervals = -((EPOCH - moment) // interval)
+    return EPOCH + intervals * interval
+
+
+def take_snapshot(previous: Optional[datetime], as_of: datetime) -> int:
+    """Snapshot the holdings at `as_of` from the previous snapshot, if any,
+    and the trades since. Returns the number of holdings in the snapshot.
+    """
+    quantities = defaultdict(int)
+    if previous is not None:
+        rows = HoldingSnapshot.objects.filter(as_of=previous).values_list(
+            "actor_id", "stock_id", "quantity"
+        )
+        for actor_id, stock_id, quantity in rows.iterator():
+            quantities[(actor_id, stock_id)] = quantity
+
+    for row in replay_holdings(trades_between(previous, as_of)).iterator():
+        quantities[(row["actor_id"], row["stock_id"])] += (
+            row["total_quantity"] or 0
+        )
+
+    HoldingSnapshot.objects.bulk_create(
+        [
+            HoldingSnapshot(
+                actor_id=actor_id,
+                stock_id=stock_id,
+                quantity=quantity,
+                as_of=as_of,
+            )
+            for (actor_id, stock_id), quantity in quantities.items()
+        ],
+        batch_size=1000,
+    )
+    return len(quantities)
+
+
+def build_snapshots(interval: timedelta, until: datetime) -> List[datetime]:
+    """Take the missing snapshots since the latest one, up to `until`
+
+    Each snapshot is written in its own transaction, so an interrupted build
+    resumes where it stopped. Returns the times of the new snapshots.
+    """
+    built = []
+    previous = latest_snapshot_time()
+    while True:
+        first_trade = (
+            trades_between(previous, until)
+            .order_by("created")
+            .values_list("created", flat=True)
+            .first()
+        )
+        if first_trade is None:
+            break
+        as_of = end_of_interval(first_trade, interval)
+        if as_of > until:
+            break
+
+        with transaction.atomic():
+            take_snapshot(previous, as_of)
+        built.append(as_of)
+        previous = as_of
+
+    return built
+
+
+def compact_snapshots(before: datetime, interval: timedelta) -> int:
+    """Keep only the first snapshot of every `interval` before a time
+
+    The latest snapshot is always kept, since the next build starts from
+    it. Returns the number of snapshots deleted.
+    """
+    latest = latest_snapshot_time()
+    times = (
+        HoldingSnapshot.objects.filter(as_of__lt=before)
+        .values_list("as_of", flat=True)
+        .distinct()
+        .order_by("as_of")
+    )
+
+    to_delete = []
+    kept_interval = None
+    for as_of in times:
+        snapshot_interval = (as_of - EPOCH) // interval
+        if snapshot_interval == kept_interval and as_of != latest:
+            to_delete.append(as_of)
+        else:
+            kept_interval = snapshot_interval
+
+    with transaction.atomic():
+        HoldingSnapshot.objects.filter(as_of__in=to_delete).delete()
+    return len(to_delete)
+
+
+def load_portfolio_as_of(
+    owner, as_of: datetime, priced_at: datetime = None
+) -> Dict[str, Dict]:
+    """The portfolio of a user at a point in time, valued at its prices
+
+    Starts from the latest snapshot at or before `as_of` and replays only
+    the user's trades since, so it's bounded by the snapshot interval. The
+    prices are those at `priced_at`, by default `as_of`.
+    """
+    quantities = defaultdict(int)
+    previous = latest_snapshot_time(as_of)
+    if previous is not None:
+        rows = snapshot_holdings_queryset(owner, previous)
+        for stock_id, quantity in rows:
+            quantities[stock_id] = quantity
+
+    trades = trades_between(previous, as_of).filter(actor=owner)
+    for row in replay_holdings(trades):
+        quantities[row["stock_id"]] += row["total_quantity"] or 0
+
+    stocks = (
+        Stock.objects.filter(id__in=list(quantities))
+        .annotate(price_at=price_at(priced_at or as_of))
+        .values_list("id", "ticker_symbol", "price_at")
+    )
+    return portfolio_by_symbol(
+        (ticker_symbol, quantities[stock_id], price)
+        for stock_id, ticker_symbol, price in stocks
+    )
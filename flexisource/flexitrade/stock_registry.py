@@ -0,0 +1,167 @@
+"""In-process registry of the stocks, by ticker symbol
+
+The trade path only needs the id (and sometimes the price) of a stock, and
+stocks are almost never changed once created. The registry keeps every
+symbol -> (id, price) in memory, loaded on first use and filled lazily as
+stocks are created, so a trade doesn't have to look its stock up.
+
+Coherence across processes uses a version token in the shared cache, as the
+portfolio cache does. Changing or deleting a stock sets a new token once the
+transaction commits (see `flexitrade.apps`), and every process reloads its
+registry when it sees the token change. Creating a stock needs no new token:
+another process that doesn't know the symbol reads it from the database.
+Bulk updates bypass the model signals, so they must call
+`invalidate_stock_registry` themselves. The registry is shared by all the
+requests of a process, so it's always read from the primary database, never
+from a read replica that may lag behind the token.
+"""
+
+import threading
+from decimal import Decimal
+from typing import Dict, Iterable, NamedTuple, Optional
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Stock
+from .routers import primary_reads
+
+VERSION_KEY = "stock_registry:version"
+
+
+class StockEntry(NamedTuple):
+    id: int
+    price: Decimal
+
+
+_registry: Dict[str, StockEntry] = {}
+_loaded_version: Optional[str] = None
+_lock = threading.Lock()
+
+
+def _current_version() -> str:
+    """The version token of the registry, created if missing"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _load(version) -> None:
+    """Replace the registry with every stock of the database"""
+    global _registry, _loaded_version
+
+    with primary_reads():
+        registry = {
+            symbol: StockEntry(stock_id, price)
+            for symbol, stock_id, price in Stock.objects.values_list(
+                "ticker_symbol", "id", "price"
+            ).iterator()
+        }
+    with _lock:
+        _registry = registry
+        _loaded_version = version
+
+
+def _register(stocks: Dict[str, StockEntry]) -> None:
+    """Add stocks to the registry, once the transaction that wrote or read
+    them commits, so a rolled back stock is never registered
+    """
+
+    def register():
+        with _lock:
+            _registry.update(stocks)
+
+    transaction.on_commit(register)
+
+
+def _registered(symbols: Iterable[str]) -> Dict[str, StockEntry]:
+    """The stocks of the symbols the registry knows, reloaded if outdated"""
+    version = _current_version()
+    if version != _loaded_version:
+        _load(version)
+
+    registry = _registry
+    return {
+        symbol: registry[symbol] for symbol in symbols if symbol in registry
+    }
+
+
+def get_stocks(symbols: Iterable[str]) -> Dict[str, StockEntry]:
+    """The registered stocks of the symbols, reading unknown ones from the
+    database. Symbols without a stock are absent from the result.
+    """
+    symbols = set(symbols)
+    stocks = _registered(symbols)
+    missing = symbols - stocks.keys()
+    if missing:
+        with primary_reads():
+            found = {
+                symbol: StockEntry(stock_id, price)
+                for symbol, stock_id, price in Stock.objects.filter(
+                    ticker_symbol__in=missing
+                ).values_list("ticker_symbol", "id", "price")
+            }
+        _register(found)
+        stocks.update(found)
+    return stocks
+
+
+def get_stock(symbol: str) -> Optional[StockEntry]:
+    """The stock of a symbol, None if there is none"""
+    return get_stocks([symbol]).get(symbol)
+
+
+async def aget_stock(symbol: str) -> Optional[StockEntry]:
+    """Async version of `get_stock`, that only leaves the event loop when
+    the registry has to be read from the database
+    """
+    version = await cache.aget(VERSION_KEY)
+    entry = _registry.get(symbol)
+    if version is not None and version == _loaded_version and entry:
+        return entry
+    return await sync_to_async(get_stock)(symbol)
+
+
+async def aget_stocks(symbols: Iterable[str]) -> Dict[str, StockEntry]:
+    """Async version of `get_stocks`, that only leaves the event loop when
+    the registry has to be read from the database
+    """
+    symbols = set(symbols)
+    version = await cache.aget(VERSION_KEY)
+    registry = _registry
+    if version is not None and version == _loaded_version:
+        if symbols.issubset(registry.keys()):
+            return {symbol: registry[symbol] for symbol in symbols}
+    return await sync_to_async(get_stocks)(symbols)
+
+
+def get_or_create_stock(symbol: str, defaults: Dict) -> StockEntry:
+    """The stock of a symbol, created with `defaults` if there is none"""
+    entry = _registered([symbol]).get(symbol)
+    if entry is None:
+        stock, _ = Stock.objects.get_or_create(
+            ticker_symbol=symbol, defaults=defaults
+        )
+        # The price as saved, not as given in the defaults
+        price_field = Stock._meta.get_field("price")
+        price = price_field.to_python(stock.price).quantize(
+            Decimal(1).scaleb(-price_field.decimal_places)
+        )
+        entry = StockEntry(stock.pk, price)
+        _register({symbol: entry})
+    return entry
+
+
+def invalidate_stock_registry(**kwargs) -> None:
+    """Make every process reload its registry once the transaction commits
+
+    Also a receiver of the `post_save` and `post_delete` signals of `Stock`.
+    Creating a stock doesn't invalidate anything.
+    """
+    if kwargs.get("created"):
+        return
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid4().hex, None))
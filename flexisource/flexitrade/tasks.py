@@ -1,6 +1,2 @@
-"""File for cron tasks"""
-from .views.trade import PlaceBulkTrade
-
-
-def local_csv_import_task():
-    PlaceBulkTrade().process_from_local_file()
+"""File for Celery tasks"""
+from .jobs import run_bulk_trade_job  # noqa: F401 (Celery autodiscovery)
@@ -0,0 +1,52 @@
+"""Helpers shared by the tests of the app"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+UserModel = get_user_model()
+
+
+class FlexitradeTestCase(TestCase):
+    """Base class with an authenticated API client per user"""
+
+    def setUp(self):
+        # The caches must not see the rows of the previous tests, which were
+        # rolled back
+        cache.clear()
+
+    def client_for(self, username: str) -> APIClient:
+        """A client authenticated as the user, created if needed"""
+        user, _ = UserModel.objects.get_or_create(username=username)
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        client.user = user
+        client.token = token
+        return client
+
+    def trade(self, client, symbol, quantity, action):
+        return client.post(
+            "/trade/",
+            {"symbol": symbol, "quantity": quantity, "action": action},
+        )
+
+    def upload(
+        self,
+        client,
+        content,
+        query: str = "",
+        filename: str = "trades.csv",
+        content_type: str = "text/csv",
+    ):
+        """Upload a bulk trade file, given as text or bytes"""
+        if isinstance(content, str):
+            content = content.encode()
+        return client.post(
+            f"/bulk_trade/{query}",
+            data=content,
+            content_type=content_type,
+            HTTP_CONTENT_DISPOSITION=f'attachment; filename="{filename}"',
+        )
@@ -0,0 +1,49 @@
+"""Tests of the views served natively under ASGI"""
+
+from django.test import AsyncClient
+from flexitrade.models import Holding
+
+from .base import FlexitradeTestCase
+
+
+class AsyncViewTests(FlexitradeTestCase):
+    """The async views behave like their sync versions did"""
+
+    def setUp(self):
+        super().setUp()
+        token = self.client_for("alice").token
+        # The headers given to an AsyncClient itself don't reach the scope
+        self.headers = {"authorization": f"Token {token.key}"}
+        self.async_client = AsyncClient()
+
+    async def test_trade_then_portfolio(self):
+        response = await self.async_client.post(
+            "/trade/",
+            {"symbol": "GOOG", "quantity": 3, "action": "buy"},
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.json(),
+            {"message": "3 share(s) of GOOG bought for alice"},
+        )
+        self.assertEqual((await Holding.objects.aget()).quantity, 3)
+
+        response = await self.async_client.get(
+            "/portfolio/", headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["GOOG"]["total_quantity"], 3)
+
+    async def test_invalid_trade(self):
+        response = await self.async_client.post(
+            "/trade/",
+            {"symbol": "GOOG", "quantity": 3, "action": "sell"},
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(await Holding.objects.aexists())
+
+    async def test_authentication_is_required(self):
+        response = await self.async_client.get("/portfolio/")
+        self.assertEqual(response.status_code, 401)
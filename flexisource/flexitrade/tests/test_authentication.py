@@ -0,0 +1,53 @@
+"""Tests of the cached token authentication"""
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from flexitrade.authentication import (
+    _cached,
+    _revoked_key,
+    _store,
+    clear_token_cache,
+)
+
+from .base import FlexitradeTestCase
+
+
+class TokenCacheTests(FlexitradeTestCase):
+    """A token's user is cached, and a deleted token is refused at once"""
+
+    def setUp(self):
+        super().setUp()
+        clear_token_cache()
+        self.client = self.client_for("alice")
+        self.assertEqual(self.client.get("/portfolio/").status_code, 200)
+
+    def test_cached_token_is_not_queried(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get("/portfolio/").status_code, 200)
+        self.assertFalse(
+            any("authtoken_token" in query["sql"] for query in queries)
+        )
+
+    def test_logout_revokes_the_cached_token(self):
+        self.assertEqual(self.client.delete("/auth/logout/").status_code, 200)
+
+        self.assertEqual(self.client.get("/portfolio/").status_code, 401)
+        self.assertIsNone(_cached(self.client.token.key))
+
+    def test_revocation_reaches_other_processes(self):
+        key = self.client.token.key
+        user_auth = _cached(key)
+        self.client.token.delete()
+        self.assertTrue(cache.get(_revoked_key(key)))
+
+        # Another process still has the token in its own cache
+        _store(key, user_auth)
+        self.assertEqual(self.client.get("/portfolio/").status_code, 401)
+
+    @override_settings(TOKEN_CACHE_TIMEOUT=0)
+    def test_cache_can_be_disabled(self):
+        self.client.user.is_active = False
+        self.client.user.save()
+        self.assertEqual(self.client.get("/portfolio/").status_code, 401)
@@ -0,0 +1,53 @@
+"""Tests of the chunked reading of bulk trade files"""
+
+from django.test import override_settings
+from flexitrade.models import Holding, Trade
+
+from .base import FlexitradeTestCase
+
+ORDERS = [
+    "symbol,quantity,action",
+    "GOOG,5,buy",
+    "MSFT,3,buy",
+    "GOOG,4,sell",
+    "MSFT,3,sell",
+    "GOOG,1,sell",
+]
+
+
+@override_settings(BULK_TRADE_CHUNK_SIZE=2)
+class ChunkedUploadTests(FlexitradeTestCase):
+    """A CSV file is read a few rows at a time, but executed as a whole"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for("alice")
+
+    def upload_rows(self, rows):
+        return self.upload(self.client, "\n".join(rows) + "\n")
+
+    def test_sells_are_checked_against_earlier_chunks(self):
+        response = self.upload_rows(ORDERS)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(response.json()), 5)
+        self.assertEqual(
+            dict(
+                Holding.objects.values_list("stock__ticker_symbol", "quantity")
+            ),
+            {"GOOG": 0, "MSFT": 0},
+        )
+
+    def test_invalid_row_of_a_later_chunk_writes_nothing(self):
+        response = self.upload_rows(ORDERS + ["GOOG,1,sell"])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()), ["5"])
+        self.assertFalse(Trade.objects.exists())
+
+    @override_settings(BULK_TRADE_MAX_ROWS=4)
+    def test_row_count_is_capped(self):
+        response = self.upload_rows(ORDERS)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"error": "File exceeds the maximum of 4 rows"}
+        )
+        self.assertFalse(Trade.objects.exists())
@@ -0,0 +1,120 @@
+"""Tests of the bulk trade file formats"""
+
+import io
+
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet
+from django.test import override_settings
+from flexitrade.models import Holding
+
+from .base import FlexitradeTestCase
+
+ORDERS = {
+    "symbol": ["GOOG", "MSFT", "GOOG", "AAPL", "GOOG"],
+    "quantity": pa.array([5, 3, 1, 2, 4], pa.int64()),
+    "action": ["buy", "buy", "sell", "buy", "buy"],
+}
+
+
+def to_parquet(table: pa.Table) -> bytes:
+    sink = io.BytesIO()
+    pyarrow.parquet.write_table(table, sink, row_group_size=2)
+    return sink.getvalue()
+
+
+def to_arrow_file(table: pa.Table) -> bytes:
+    sink = io.BytesIO()
+    with pyarrow.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=2)
+    return sink.getvalue()
+
+
+def to_arrow_stream(table: pa.Table) -> bytes:
+    sink = io.BytesIO()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=2)
+    return sink.getvalue()
+
+
+WRITERS = {
+    "trades.parquet": to_parquet,
+    "trades.arrow": to_arrow_file,
+    "trades.feather": to_arrow_file,
+    "trades.arrows": to_arrow_stream,
+}
+
+
+@override_settings(BULK_TRADE_CHUNK_SIZE=3)
+class ColumnarFormatTests(FlexitradeTestCase):
+    """Parquet and Arrow files are executed like CSV files, read in chunks
+    that don't line up with their record batches"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for("alice")
+
+    def upload_table(self, table: pa.Table, filename: str):
+        return self.upload(
+            self.client,
+            WRITERS[filename](table),
+            filename=filename,
+            content_type="application/octet-stream",
+        )
+
+    def test_every_format_is_executed(self):
+        for filename in WRITERS:
+            with self.subTest(filename=filename):
+                Holding.objects.all().delete()
+                response = self.upload_table(pa.table(ORDERS), filename)
+                self.assertEqual(response.status_code, 201, response.content)
+                self.assertEqual(len(response.json()), 5)
+                self.assertEqual(
+                    dict(
+                        Holding.objects.values_list(
+                            "stock__ticker_symbol", "quantity"
+                        )
+                    ),
+                    {"GOOG": 8, "MSFT": 3, "AAPL": 2},
+                )
+
+    def test_errors_are_numbered_across_chunks(self):
+        orders = {**ORDERS, "action": ["buy"] * 4 + ["hold"]}
+        for filename in WRITERS:
+            with self.subTest(filename=filename):
+                response = self.upload_table(pa.table(orders), filename)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(list(response.json()), ["4"])
+
+    def test_identifier_columns_are_read_as_strings(self):
+        orders = {
+            **ORDERS,
+            "order_id": pa.array([1, 2, 3, 4, 5], pa.int32()),
+        }
+        response = self.upload_table(pa.table(orders), "trades.parquet")
+        self.assertEqual(response.status_code, 201)
+
+        response = self.upload_table(pa.table(orders), "trades.parquet")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            Holding.objects.get(stock__ticker_symbol="GOOG").quantity, 8
+        )
+
+    def test_unreadable_file(self):
+        response = self.upload(
+            self.client,
+            b"not parquet",
+            filename="trades.parquet",
+            content_type="application/octet-stream",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()["error"].startswith("Read failure"))
+
+    def test_unknown_extension(self):
+        response = self.upload(self.client, b"x", filename="trades.xlsx")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(
+            response.json()["error"].startswith(
+                "File is not CSV, Parquet or Arrow type"
+            )
+        )
@@ -0,0 +1,78 @@
+"""Tests of the trade history and its export"""
+
+import csv
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.test import override_settings
+from flexitrade.models import Trade
+
+from .base import FlexitradeTestCase
+
+
+class TradeHistoryTests(FlexitradeTestCase):
+    """The history is keyset paginated, newest first, and the export has
+    every trade of it"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for("alice")
+        for symbol in ["GOOG", "MSFT", "GOOG", "AAPL", "GOOG", "MSFT", "GOOG"]:
+            self.trade(self.client, symbol, 1, "buy")
+        self.trade(self.client_for("bob"), "GOOG", 1, "buy")
+
+        # Trades created at the same time are ordered by id
+        same_time = datetime(2026, 1, 5, 12, tzinfo=timezone.utc)
+        trades = Trade.objects.filter(actor=self.client.user)
+        first_ids = list(trades.order_by("id").values_list("id", flat=True))
+        trades.filter(pk__in=first_ids[:4]).update(created=same_time)
+        self.trade_ids = list(
+            trades.order_by("-created", "-id").values_list("id", flat=True)
+        )
+
+    def walk(self, query: str):
+        """The ids of every page of the history, following `next`"""
+        pages = []
+        url = f"/trades/?{query}"
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([trade["id"] for trade in response.json()["results"]])
+            url = response.json()["next"]
+        return pages
+
+    def test_pages_have_no_gaps_or_overlaps(self):
+        pages = self.walk("limit=3")
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.trade_ids)
+
+    def test_filters_apply_to_every_page(self):
+        pages = self.walk("limit=2&symbol=GOOG")
+        goog_ids = set(
+            Trade.objects.filter(
+                actor=self.client.user, stock__ticker_symbol="GOOG"
+            ).values_list("id", flat=True)
+        )
+        self.assertEqual([len(page) for page in pages], [2, 2])
+        self.assertEqual(set(sum(pages, [])), goog_ids)
+
+    def test_unknown_symbol_has_no_trades(self):
+        self.assertEqual(self.walk("symbol=NOPE"), [[]])
+
+    def test_malformed_cursor(self):
+        for cursor in ["abc", "bm90LWEtZGF0ZSwx"]:  # "not-a-date,1"
+            with self.subTest(cursor=cursor):
+                response = self.client.get("/trades/", {"cursor": cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("cursor", response.json())
+
+    @override_settings(TRADE_EXPORT_CHUNK_SIZE=2)
+    def test_export_streams_every_trade(self):
+        response = self.client.get("/trades/export.csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual([int(row["id"]) for row in rows], self.trade_ids)
+        self.assertEqual(rows[-1]["action"], "buy")
@@ -0,0 +1,76 @@
+"""Tests of the materialized holdings"""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from flexitrade.holdings import (
+    diff_holdings,
+    load_current_holdings,
+    load_expected_holdings,
+    rebuild_holdings,
+)
+from flexitrade.models import Holding
+
+from .base import FlexitradeTestCase
+
+
+class HoldingsTests(FlexitradeTestCase):
+    """Every trade path keeps the holdings equal to a replay of the trade
+    history"""
+
+    def setUp(self):
+        super().setUp()
+        alice = self.client_for("alice")
+        bob = self.client_for("bob")
+        self.trade(alice, "GOOG", 10, "buy")
+        self.trade(bob, "GOOG", 5, "buy")
+        self.trade(alice, "GOOG", 10, "sell")
+        bob.post(
+            "/trades/batch/",
+            [
+                {"symbol": "GOOG", "quantity": 5, "action": "sell"},
+                {"symbol": "MSFT", "quantity": 7, "action": "buy"},
+            ],
+            format="json",
+        )
+        self.upload(alice, "symbol,quantity,action\nMSFT,4,buy\nAAPL,2,buy\n")
+
+    def test_trades_keep_holdings_consistent(self):
+        self.assertEqual(
+            diff_holdings(load_expected_holdings(), load_current_holdings()),
+            [],
+        )
+        self.assertEqual(
+            dict(
+                Holding.objects.filter(actor__username="alice").values_list(
+                    "stock__ticker_symbol", "quantity"
+                )
+            ),
+            {"GOOG": 0, "MSFT": 4, "AAPL": 2},
+        )
+
+    def test_portfolio_reads_the_holdings(self):
+        portfolio = self.client_for("bob").get("/portfolio/").json()
+        self.assertEqual(portfolio["GOOG"]["total_quantity"], 0)
+        self.assertEqual(portfolio["MSFT"]["total_quantity"], 7)
+
+    def test_rebuild_changes_nothing(self):
+        self.assertEqual(
+            rebuild_holdings(),
+            {"created": 0, "updated": 0, "deleted": 0, "rollups": 0},
+        )
+
+    def test_verify_finds_and_rebuild_fixes_drift(self):
+        Holding.objects.filter(stock__ticker_symbol="AAPL").update(quantity=9)
+        Holding.objects.filter(stock__ticker_symbol="MSFT").delete()
+        mismatches = diff_holdings(
+            load_expected_holdings(), load_current_holdings()
+        )
+        self.assertEqual(len(mismatches), 3)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_holdings", "--verify", stderr=StringIO())
+        counts = rebuild_holdings()
+        self.assertEqual((counts["created"], counts["updated"]), (2, 1))
+        call_command("rebuild_holdings", "--verify", stdout=StringIO())
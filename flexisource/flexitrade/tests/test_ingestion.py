@@ -0,0 +1,125 @@
+"""Tests of the ingestion of the trade files dropped in the inbox"""
+
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet
+from django.core.management import call_command
+from flexitrade.ingestion import (
+    FAILED_DIR_NAME,
+    PROCESSED_DIR_NAME,
+    InboxWatcher,
+    LeaderLock,
+    ingest_file,
+)
+from flexitrade.models import Holding, IngestedFile, Trade
+
+from .base import FlexitradeTestCase, UserModel
+
+
+class IngestionTests(FlexitradeTestCase):
+    """Every trade file of the inbox is executed once, then moved out"""
+
+    def setUp(self):
+        super().setUp()
+        tmp_dir = TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.inbox = Path(tmp_dir.name)
+        UserModel.objects.create(username="alice")
+
+        # As the test client does: the connection of a test case is in a
+        # transaction, which close_old_connections() would close
+        keep_connection = mock.patch(
+            "flexitrade.management.commands.run_ingestion"
+            ".close_old_connections"
+        )
+        keep_connection.start()
+        self.addCleanup(keep_connection.stop)
+
+    def drop(self, name, content: bytes) -> Path:
+        path = self.inbox / name
+        path.write_bytes(content)
+        return path
+
+    def moved(self, dir_name):
+        return sorted(path.name for path in (self.inbox / dir_name).iterdir())
+
+    def test_runner_ingests_every_format(self):
+        table = pa.table(
+            {
+                "username": ["alice"],
+                "symbol": ["MSFT"],
+                "quantity": pa.array([3], pa.int64()),
+                "action": ["buy"],
+            }
+        )
+        pyarrow.parquet.write_table(table, self.inbox / "trades.parquet")
+        with pa.OSFile(str(self.inbox / "trades.arrow"), "wb") as sink:
+            with pyarrow.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        self.drop(
+            "trades.csv",
+            b"username,symbol,quantity,action\nalice,GOOG,5,buy\n",
+        )
+        self.drop("notes.txt", b"not a trade file")
+
+        out = StringIO()
+        call_command(
+            "run_ingestion",
+            f"--inbox={self.inbox}",
+            "--once",
+            "--interval=0",
+            stdout=out,
+        )
+
+        self.assertIn("trades.parquet: processed", out.getvalue())
+        self.assertEqual(len(self.moved(PROCESSED_DIR_NAME)), 3)
+        self.assertTrue((self.inbox / "notes.txt").exists())
+        self.assertEqual(
+            dict(
+                Holding.objects.values_list("stock__ticker_symbol", "quantity")
+            ),
+            {"GOOG": 5, "MSFT": 6},
+        )
+
+    def test_invalid_file_is_moved_to_failed(self):
+        path = self.drop(
+            "trades.csv", b"username,symbol,quantity,action\nalice,GOOG,5,x\n"
+        )
+        with self.assertLogs("flexitrade.ingestion", "WARNING"):
+            self.assertEqual(ingest_file(path), "failed")
+
+        self.assertFalse(path.exists())
+        self.assertEqual(len(self.moved(FAILED_DIR_NAME)), 1)
+        self.assertFalse(Trade.objects.exists())
+        self.assertFalse(IngestedFile.objects.exists())
+
+    def test_same_content_is_skipped(self):
+        content = b"username,symbol,quantity,action\nalice,GOOG,5,buy\n"
+        self.assertEqual(ingest_file(self.drop("a.csv", content)), "processed")
+        self.assertEqual(ingest_file(self.drop("b.csv", content)), "skipped")
+
+        self.assertEqual(len(self.moved(PROCESSED_DIR_NAME)), 2)
+        self.assertEqual(Trade.objects.count(), 1)
+
+    def test_watcher_waits_for_files_to_settle(self):
+        watcher = InboxWatcher(self.inbox)
+        path = self.drop("trades.csv", b"username,symbol")
+        self.assertEqual(watcher.ready_files(), [])
+
+        path.write_bytes(b"username,symbol,quantity,action\n")
+        self.assertEqual(watcher.ready_files(), [])
+        self.assertEqual(watcher.ready_files(), [path])
+
+    def test_only_one_runner_leads(self):
+        leader, standby = LeaderLock(self.inbox), LeaderLock(self.inbox)
+        self.assertTrue(leader.acquire())
+        self.assertFalse(standby.acquire())
+
+        leader.release()
+        self.assertTrue(standby.acquire())
+        standby.release()
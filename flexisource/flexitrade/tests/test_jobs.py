@@ -0,0 +1,134 @@
+"""Tests of the bulk trade jobs run in the background"""
+
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from flexitrade.enums import BulkTradeJobStatusChoices
+from flexitrade.jobs import progress_cache_key, run_bulk_trade_job
+from flexitrade.models import BulkTradeJob, Trade
+from flexitrade.views.trade import PlaceBulkTrade
+
+from .base import FlexitradeTestCase
+
+
+class BulkTradeJobTests(FlexitradeTestCase):
+    """An `?async=1` upload is stored, run by a worker once the request
+    commits, and polled on `/bulk_trade/<job_id>/`"""
+
+    def setUp(self):
+        super().setUp()
+        media_dir = TemporaryDirectory()
+        self.addCleanup(media_dir.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_dir.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        # Run the worker's task in the process, as soon as it's queued
+        delay = mock.patch.object(
+            run_bulk_trade_job, "delay", side_effect=run_bulk_trade_job
+        )
+        self.delay = delay.start()
+        self.addCleanup(delay.stop)
+
+        self.client = self.client_for("alice")
+
+    def start_job(self, content, query="?async=1"):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload(self.client, content, query)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "pending")
+        return response.json()["id"]
+
+    def poll(self, job_id):
+        response = self.client.get(f"/bulk_trade/{job_id}/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_job_executes_the_file(self):
+        job_id = self.start_job(
+            "symbol,quantity,action\nGOOG,10,buy\nGOOG,4,sell\n"
+        )
+        self.delay.assert_called_once_with(job_id)
+
+        job = self.poll(job_id)
+        self.assertEqual(job["status"], "succeeded")
+        self.assertEqual(
+            (job["rows_validated"], job["rows_committed"]), (2, 2)
+        )
+        self.assertEqual(job["errors"], {})
+        self.assertEqual(
+            Trade.objects.filter(actor__username="alice").count(), 2
+        )
+
+    def test_invalid_file_fails_the_job(self):
+        job_id = self.start_job("symbol,quantity,action\nGOOG,10,hold\n")
+
+        job = self.poll(job_id)
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["rows_committed"], 0)
+        self.assertEqual(list(job["errors"]), ["0"])
+        self.assertFalse(Trade.objects.exists())
+
+    def test_skipped_rows_are_not_committed(self):
+        content = "order_id,symbol,quantity,action\nA1,GOOG,10,buy\n"
+        self.start_job(content)
+        job_id = self.start_job(content + "A2,MSFT,3,buy\n")
+
+        job = self.poll(job_id)
+        self.assertEqual(job["status"], "succeeded")
+        self.assertEqual(
+            (job["rows_validated"], job["rows_committed"]), (2, 1)
+        )
+        self.assertEqual(Trade.objects.count(), 2)
+
+    def test_crashed_job_is_marked_failed(self):
+        crash = mock.patch.object(
+            PlaceBulkTrade, "ingest_file", side_effect=RuntimeError("boom")
+        )
+        with crash, self.assertLogs("flexitrade.jobs", "ERROR"):
+            with self.assertRaises(RuntimeError):
+                self.start_job("symbol,quantity,action\nGOOG,10,buy\n")
+
+        job = BulkTradeJob.objects.get()
+        self.assertEqual(job.status, BulkTradeJobStatusChoices.FAILED)
+        self.assertEqual(job.errors, {"error": "Job failure boom"})
+
+    def test_running_job_reports_live_progress(self):
+        job = BulkTradeJob.objects.create(
+            owner=self.client.user,
+            file="bulk_trades/trades.csv",
+            status=BulkTradeJobStatusChoices.RUNNING,
+        )
+        progress = {"rows_validated": 500, "rows_staged": 200}
+        cache.set(progress_cache_key(job.pk), progress)
+
+        self.assertEqual(self.poll(job.pk)["rows_staged"], 200)
+
+    def test_jobs_of_other_users_are_not_found(self):
+        job_id = self.start_job("symbol,quantity,action\nGOOG,10,buy\n")
+        response = self.client_for("bob").get(f"/bulk_trade/{job_id}/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_rejected_rows_as_csv(self):
+        job_id = self.start_job(
+            "symbol,quantity,action\nGOOG,5,buy\nGOOG,x,buy\nAAPL,2,hold\n",
+            query="?async=1&mode=partial",
+        )
+        self.assertEqual(self.poll(job_id)["rows_committed"], 1)
+
+        response = self.client.get(f"/bulk_trade/{job_id}/errors.csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "symbol,quantity,action,row,errors")
+        self.assertEqual(
+            [line.split(",")[:4] for line in lines[1:]],
+            [["GOOG", "x", "buy", "1"], ["AAPL", "2", "hold", "2"]],
+        )
+
+        response = self.client_for("bob").get(
+            f"/bulk_trade/{job_id}/errors.csv"
+        )
+        self.assertEqual(response.status_code, 404)
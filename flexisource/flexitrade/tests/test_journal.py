@@ -0,0 +1,103 @@
+"""Tests of the binary trade journal"""
+
+import os
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import override_settings
+from flexitrade.journal import read_journal, rewrite_journal
+from flexitrade.models import Trade
+from flexitrade.validators import MSG_QUANTITY_TOO_LARGE
+
+from .base import FlexitradeTestCase
+
+
+class JournalTests(FlexitradeTestCase):
+    """The journal is checked against, and repaired from, the Trade table"""
+
+    def setUp(self):
+        super().setUp()
+        tmp_dir = TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, "trades.journal")
+        journal_settings = override_settings(TRADE_JOURNAL_PATH=self.path)
+        journal_settings.enable()
+        self.addCleanup(journal_settings.disable)
+
+        self.client = self.client_for("alice")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trade(self.client, "GOOG", 10, "buy")
+            self.trade(self.client, "GOOG", 3, "sell")
+            self.upload(self.client, "symbol,quantity,action\nAAPL,2,buy\n")
+
+    def verify(self, *args):
+        call_command(
+            "verify_journal",
+            "--holdings",
+            "--min-age=0",
+            *args,
+            stdout=StringIO(),
+            stderr=StringIO(),
+        )
+
+    def test_journal_matches(self):
+        self.assertEqual(len(read_journal()), 3)
+        self.verify()
+
+    def test_missing_trades_are_appended(self):
+        rewrite_journal(np.array(read_journal()[:1]))
+        with self.assertRaises(CommandError):
+            self.verify()
+
+        self.verify("--repair")
+        self.assertEqual(len(read_journal()), 3)
+        self.verify()
+
+    def test_wrong_records_are_rewritten(self):
+        records = np.array(read_journal())
+        records["quantity"][0] = 99
+        rewrite_journal(records)
+        with self.assertRaises(CommandError):
+            self.verify()
+
+        self.verify("--repair")
+        self.verify()
+
+    def test_torn_record_is_ignored(self):
+        with open(self.path, "ab") as journal:
+            journal.write(b"torn")
+        self.assertEqual(len(read_journal()), 3)
+        self.verify()
+
+    def test_quantity_beyond_the_record_is_invalid(self):
+        # The journal stores quantities as 32-bit integers
+        for quantity in [2**31, 99999999999]:
+            with self.subTest(quantity=quantity):
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.trade(self.client, "GOOG", quantity, "buy")
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    response.json(), {"quantity": [MSG_QUANTITY_TOO_LARGE]}
+                )
+        self.assertEqual(Trade.objects.count(), 3)
+        self.assertEqual(len(read_journal()), 3)
+
+    def test_failed_append_does_not_fail_the_trade(self):
+        with mock.patch(
+            "flexitrade.journal.append_records", side_effect=OSError("full")
+        ):
+            with self.assertLogs("django", "ERROR"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.trade(self.client, "GOOG", 1, "buy")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Trade.objects.count(), 4)
+
+        # The lost record is found, and appended, by the verification
+        with self.assertRaises(CommandError):
+            self.verify()
+        self.verify("--repair")
+        self.assertEqual(len(read_journal()), 4)
@@ -0,0 +1,85 @@
+"""Tests of the ingestion ledger"""
+
+import hashlib
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from flexitrade.ingestion import execute_file
+from flexitrade.ledger import MSG_ORDER_ID_TOO_LONG, ORDER_ID_MAX_LENGTH
+from flexitrade.models import Holding, Trade
+
+from .base import FlexitradeTestCase, UserModel
+
+
+class LedgerTests(FlexitradeTestCase):
+    """Rows of bulk trade files are executed at most once"""
+
+    ORDERS = "symbol,quantity,action,order_id\nGOOG,5,buy,o1\nGOOG,2,sell,o2\n"
+
+    def test_same_inbox_file_is_skipped(self):
+        UserModel.objects.create(username="alice")
+        content = b"username,symbol,quantity,action\nalice,GOOG,5,buy\n"
+        with TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "trades.csv"
+            path.write_bytes(content)
+            sha256 = hashlib.sha256(content).hexdigest()
+
+            self.assertTrue(execute_file(path, sha256))
+            self.assertTrue(execute_file(path, sha256))
+        self.assertEqual(Trade.objects.count(), 1)
+        self.assertEqual(Holding.objects.get().quantity, 5)
+
+    def test_order_ids_are_skipped_in_another_file(self):
+        client = self.client_for("alice")
+        self.assertEqual(self.upload(client, self.ORDERS).status_code, 201)
+
+        orders = self.ORDERS + "AAPL,1,buy,o3\n"
+        response = self.upload(client, orders, "?mode=partial")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["executed"], 1)
+        self.assertEqual(response.json()["skipped"], 2)
+        self.assertEqual(Trade.objects.count(), 3)
+        self.assertEqual(
+            Holding.objects.get(stock__ticker_symbol="GOOG").quantity, 3
+        )
+
+    def test_order_ids_are_scoped_to_the_user(self):
+        alice = self.client_for("alice")
+        bob = self.client_for("bob")
+        self.assertEqual(self.upload(alice, self.ORDERS).status_code, 201)
+        self.assertEqual(self.upload(bob, self.ORDERS).status_code, 201)
+        self.assertEqual(Trade.objects.filter(actor=bob.user).count(), 2)
+
+    def test_duplicate_order_id_in_a_file_is_a_row_error(self):
+        client = self.client_for("alice")
+        orders = (
+            "symbol,quantity,action,order_id\nGOOG,5,buy,o1\nGOOG,1,buy,o1\n"
+        )
+
+        response = self.upload(client, orders)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(),
+            {
+                "1": {
+                    "order_id": ["order_id already used by row 0 of the file"]
+                }
+            },
+        )
+        self.assertFalse(Trade.objects.exists())
+
+        response = self.upload(client, orders, "?mode=partial")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["executed"], 1)
+        self.assertEqual(list(response.json()["errors"]), ["1"])
+
+    def test_too_long_order_id_is_a_row_error(self):
+        client = self.client_for("alice")
+        order_id = "o" * (ORDER_ID_MAX_LENGTH + 1)
+        response = self.upload(
+            client, f"symbol,quantity,action,order_id\nGOOG,5,buy,{order_id}\n"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"0": {"order_id": [MSG_ORDER_ID_TOO_LONG]}}
+        )
@@ -0,0 +1,39 @@
+"""Tests of the monitoring endpoints"""
+
+from django.test import override_settings
+from flexitrade.views.metrics import PROMETHEUS_CONTENT_TYPE
+from rest_framework.test import APIClient
+
+from .base import FlexitradeTestCase
+
+
+class MetricsTests(FlexitradeTestCase):
+    """/metrics/ is only served to staff users and allowed addresses"""
+
+    def test_anonymous_request_is_refused(self):
+        self.assertEqual(APIClient().get("/metrics/").status_code, 401)
+
+    def test_user_request_is_refused(self):
+        client = self.client_for("alice")
+        self.assertEqual(client.get("/metrics/").status_code, 403)
+
+    def test_staff_request_is_served(self):
+        client = self.client_for("admin")
+        client.user.is_staff = True
+        client.user.save()
+        client.get("/portfolio/")
+
+        response = client.get("/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], PROMETHEUS_CONTENT_TYPE)
+        self.assertIn(
+            'flexitrade_request_duration_seconds_count{view="portfolio"}',
+            response.content.decode(),
+        )
+
+    def test_allowed_address_needs_no_authentication(self):
+        client = APIClient(REMOTE_ADDR="10.0.0.5")
+        with override_settings(METRICS_ALLOWED_IPS=["10.0.0.5"]):
+            self.assertEqual(client.get("/metrics/").status_code, 200)
+        with override_settings(METRICS_ALLOWED_IPS=["10.0.0.6"]):
+            self.assertEqual(client.get("/metrics/").status_code, 401)
@@ -0,0 +1,73 @@
+"""Tests of the sell checks made under lock"""
+
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from flexitrade.enums import TradeActionChoices
+from flexitrade.models import Holding, Trade
+from flexitrade.validators import TradeValidator, oversell_message
+from flexitrade.views.trade import PlaceTradeBatchView
+
+from .base import FlexitradeTestCase
+
+
+class OversellTests(FlexitradeTestCase):
+    """A sell never takes a holding below zero, even when a concurrent sell
+    took the shares after it was validated"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for("alice")
+        self.trade(self.client, "GOOG", 5, "buy")
+
+    def assert_unchanged(self):
+        self.assertEqual(Trade.objects.count(), 1)
+        self.assertEqual(Holding.objects.get().quantity, 5)
+
+    def test_sell_of_more_than_owned_is_invalid(self):
+        response = self.trade(self.client, "GOOG", 6, "sell")
+        self.assertEqual(response.status_code, 400)
+        self.assert_unchanged()
+
+    def test_sell_raced_after_validation_is_rejected(self):
+        validate = TradeValidator.ais_valid
+
+        async def validate_then_race(validator):
+            is_valid = await validate(validator)
+            # A concurrent sell commits between validation and execution
+            await sync_to_async(Holding.objects.update)(quantity=2)
+            return is_valid
+
+        with mock.patch.object(
+            TradeValidator, "ais_valid", validate_then_race
+        ):
+            response = self.trade(self.client, "GOOG", 5, "sell")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"sell": [oversell_message(5, "GOOG", 2)]}
+        )
+        self.assertEqual(Trade.objects.count(), 1)
+        self.assertEqual(Holding.objects.get().quantity, 2)
+
+    def test_raced_batch_writes_nothing(self):
+        # As if validated before a concurrent sell took one of the shares
+        orders = [
+            {
+                "symbol": "MSFT",
+                "quantity": 1,
+                "action": TradeActionChoices.BUY,
+            },
+            {
+                "symbol": "GOOG",
+                "quantity": 6,
+                "action": TradeActionChoices.SELL,
+            },
+        ]
+        for order in orders:
+            order["owner"] = self.client.user
+
+        is_ok, payload = PlaceTradeBatchView().bulk_execute_trades(orders)
+        self.assertFalse(is_ok)
+        self.assertTrue(payload["error"].startswith("Write failure"))
+        self.assert_unchanged()
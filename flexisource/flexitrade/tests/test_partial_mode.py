@@ -0,0 +1,63 @@
+"""Tests of the partial-success bulk mode"""
+
+from flexitrade.models import Holding, Trade
+
+from .base import FlexitradeTestCase
+
+
+class PartialModeTests(FlexitradeTestCase):
+    """The valid rows of a file are executed, the others are reported"""
+
+    FILE = (
+        "symbol,quantity,action\n"
+        "GOOG,5,buy\n"
+        "GOOG,x,buy\n"
+        "GOOG,500,sell\n"
+        "AAPL,2,buy\n"
+    )
+
+    def test_valid_rows_are_executed(self):
+        client = self.client_for("alice")
+        response = self.upload(client, self.FILE, "?mode=partial")
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual(report["executed"], 2)
+        self.assertEqual(report["failed"], 2)
+        self.assertEqual(sorted(report["errors"]), ["1", "2"])
+        self.assertEqual(
+            dict(
+                Holding.objects.values_list("stock__ticker_symbol", "quantity")
+            ),
+            {"GOOG": 5, "AAPL": 2},
+        )
+
+    def test_all_or_nothing_executes_nothing(self):
+        client = self.client_for("alice")
+        response = self.upload(client, self.FILE)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.json()), ["1", "2"])
+        self.assertFalse(Trade.objects.exists())
+
+    def test_error_rows_as_csv(self):
+        client = self.client_for("alice")
+        response = self.upload(client, self.FILE, "?mode=partial&report=csv")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "symbol,quantity,action,row,errors")
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith("GOOG,x,buy,1,"))
+
+    def test_no_valid_row_is_a_failure(self):
+        client = self.client_for("alice")
+        content = "symbol,quantity,action\nGOOG,x,buy\nGOOG,1,sell\n"
+        response = self.upload(client, content, "?mode=partial")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["executed"], 0)
+        self.assertEqual(response.json()["failed"], 2)
+
+    def test_every_row_valid_is_created(self):
+        client = self.client_for("alice")
+        content = "symbol,quantity,action\nGOOG,1,buy\n"
+        response = self.upload(client, content, "?mode=partial")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["errors"], {})
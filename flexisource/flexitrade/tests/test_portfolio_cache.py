@@ -0,0 +1,67 @@
+"""Tests of the per-user portfolio cache"""
+
+from django.db import transaction
+from django.test import override_settings
+from flexitrade.portfolio_cache import (
+    invalidate_all_portfolios,
+    invalidate_portfolios,
+    portfolio_cache_stats,
+)
+
+from .base import FlexitradeTestCase
+
+
+class PortfolioCacheTests(FlexitradeTestCase):
+    """A user's holdings are cached until one of their trades commits"""
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.client_for("alice")
+        self.bob = self.client_for("bob")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trade(self.alice, "GOOG", 4, "buy")
+            self.trade(self.bob, "GOOG", 1, "buy")
+        self.alice.get("/portfolio/")
+        self.bob.get("/portfolio/")
+
+    def assert_read(self, client, event, quantity):
+        """The portfolio is read with a cache hit or miss"""
+        before = portfolio_cache_stats()
+        portfolio = client.get("/portfolio/").json()
+        after = portfolio_cache_stats()
+        self.assertEqual(after[event], before[event] + 1)
+        self.assertEqual(portfolio["GOOG"]["total_quantity"], quantity)
+
+    def test_portfolio_is_cached(self):
+        self.assert_read(self.alice, "hits", 4)
+
+    def test_trade_invalidates_only_its_user(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trade(self.alice, "GOOG", 3, "sell")
+        self.assert_read(self.alice, "misses", 1)
+        self.assert_read(self.alice, "hits", 1)
+        self.assert_read(self.bob, "hits", 1)
+
+    def test_rolled_back_write_does_not_invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    invalidate_portfolios([self.alice.user.pk])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assert_read(self.alice, "hits", 4)
+
+    def test_invalidate_all_portfolios(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_all_portfolios()
+        self.assert_read(self.alice, "misses", 4)
+        self.assert_read(self.bob, "misses", 1)
+
+    @override_settings(PORTFOLIO_CACHE_ENABLED=False)
+    def test_cache_can_be_disabled(self):
+        before = portfolio_cache_stats()
+        self.assertEqual(
+            self.alice.get("/portfolio/").json()["GOOG"]["total_quantity"], 4
+        )
+        self.assertEqual(portfolio_cache_stats(), before)
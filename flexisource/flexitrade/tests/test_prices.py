@@ -0,0 +1,77 @@
+"""Tests of the stock price updates"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+import pandas as pd
+from django.utils import timezone
+from flexitrade.models import Stock, StockPrice
+from flexitrade.portfolio_cache import portfolio_cache_stats
+from flexitrade.prices import upsert_prices
+
+from .base import FlexitradeTestCase
+
+
+class PriceUpdateTests(FlexitradeTestCase):
+    """The current price of a stock is its latest tick up to now"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for("alice")
+        self.trade(self.client, "GOOG", 4, "buy")
+        self.stock = Stock.objects.get(ticker_symbol="GOOG")
+
+    def upsert(self, *ticks):
+        """Upsert (price, as_of) ticks of the stock, committed"""
+        prices, times = zip(*ticks)
+        df = pd.DataFrame(
+            {"stock_id": self.stock.pk, "price": prices, "as_of": times}
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_prices(df)
+        self.stock.refresh_from_db()
+
+    def test_latest_tick_becomes_the_price(self):
+        listed_at = self.stock.price
+        now = timezone.now()
+        self.upsert((3, now - timedelta(hours=1)), (2.5, now))
+
+        self.assertEqual(self.stock.price, Decimal("2.50"))
+        self.assertGreaterEqual(self.stock.last_modified, now)
+        # The listing price is kept as a tick at the stock's creation
+        self.assertEqual(
+            StockPrice.objects.get(as_of=self.stock.created).price, listed_at
+        )
+
+    def test_future_tick_is_not_the_price_yet(self):
+        now = timezone.now()
+        tomorrow = now + timedelta(days=1)
+        self.upsert((2.5, now), (9, tomorrow))
+        self.assertEqual(self.stock.price, Decimal("2.50"))
+
+        portfolio = self.client.get(
+            "/portfolio/", {"priced_at": tomorrow.isoformat()}
+        ).json()
+        self.assertEqual(portfolio["GOOG"]["total_value"], 36.0)
+
+    def test_cached_portfolio_is_valued_at_current_prices(self):
+        self.client.get("/portfolio/")
+        hits = portfolio_cache_stats()["hits"]
+
+        self.upsert((2.5, timezone.now()))
+        portfolio = self.client.get("/portfolio/").json()
+        self.assertEqual(portfolio["GOOG"]["total_value"], 10.0)
+        self.assertEqual(portfolio_cache_stats()["hits"], hits + 1)
+
+    def test_only_staff_can_update_prices(self):
+        tick = [{"symbol": "GOOG", "price": "2.50"}]
+        response = self.client.post("/prices/", tick, format="json")
+        self.assertEqual(response.status_code, 403)
+
+        staff = self.client_for("admin")
+        staff.user.is_staff = True
+        staff.user.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = staff.post("/prices/", tick, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"written": 1})
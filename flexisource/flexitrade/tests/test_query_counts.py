@@ -0,0 +1,101 @@
+"""Tests of the queries run by the hot endpoints"""
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from flexitrade.management.commands.check_query_plans import (
+    explain_sql,
+    find_regressions,
+    index_planning,
+)
+
+from .base import FlexitradeTestCase
+
+
+class EndpointQueryTests(FlexitradeTestCase):
+    """The hot endpoints run a fixed number of queries, whatever the amount
+    of data, and every query is served by an index"""
+
+    # Queries of a request once the token, stock and portfolio caches are
+    # warm
+    READ_QUERIES = {
+        "/portfolio/": 0,
+        "/market/": 1,
+        "/market/GOOG/holders/": 2,
+        "/trades/": 1,
+        "/trades/?symbol=GOOG": 1,
+        "/trades/export.csv": 1,
+    }
+    # A savepoint, the trade, the holding (read and update), the rollup
+    # delta and the release of the savepoint. The stock is in the registry.
+    TRADE_QUERIES = 6
+
+    # Regressions a query has by design (see check_query_plans.EXPECTED)
+    EXPECTED_REGRESSIONS = {
+        # Lists every traded stock
+        "/market/": {"full table scan"},
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for("alice")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trade(self.client, "GOOG", 1, "buy")
+        self.warm_up()
+
+    def warm_up(self):
+        for url in self.READ_QUERIES:
+            self.get(url)
+
+    def get(self, url):
+        response = self.client.get(url)
+        if response.streaming:
+            b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def add_data(self):
+        """More stocks, holders and trades, committed like in production"""
+        with self.captureOnCommitCallbacks(execute=True):
+            for symbol in ["AAPL", "MSFT", "TSLA", "NVDA", "AMZN"]:
+                self.trade(self.client, symbol, 2, "buy")
+                self.trade(self.client, "GOOG", 1, "buy")
+                holder = self.client_for(f"holder-{symbol}")
+                self.trade(holder, "GOOG", 1, "buy")
+        self.warm_up()
+
+    def assert_read_queries(self):
+        for url, count in self.READ_QUERIES.items():
+            with self.subTest(url=url), self.assertNumQueries(count):
+                self.get(url)
+
+    def assert_trade_queries(self):
+        with self.assertNumQueries(self.TRADE_QUERIES):
+            response = self.trade(self.client, "GOOG", 1, "buy")
+        self.assertEqual(response.status_code, 201)
+
+    def test_query_counts(self):
+        self.assert_read_queries()
+        self.assert_trade_queries()
+
+    def test_query_counts_do_not_grow_with_the_data(self):
+        self.add_data()
+        self.assert_read_queries()
+        self.assert_trade_queries()
+
+    def test_endpoint_queries_use_indexes(self):
+        self.add_data()
+        for url in self.READ_QUERIES:
+            with CaptureQueriesContext(connection) as queries:
+                self.get(url)
+
+            expected = self.EXPECTED_REGRESSIONS.get(url, set())
+            with index_planning():
+                for query in queries.captured_queries:
+                    if not query["sql"].startswith("SELECT"):
+                        continue
+                    plan = explain_sql(query["sql"])
+                    with self.subTest(url=url, sql=query["sql"]):
+                        regressions = find_regressions(url, plan)
+                        self.assertEqual(
+                            set(regressions) - expected, set(), plan
+                        )
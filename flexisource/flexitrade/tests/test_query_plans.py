@@ -0,0 +1,22 @@
+"""Tests of the query plans of the hot queries"""
+
+from flexitrade.management.commands.check_query_plans import (
+    find_regressions,
+    hot_queries,
+    index_planning,
+)
+from flexitrade.seeding import seed_dataset
+
+from .base import FlexitradeTestCase
+
+
+class QueryPlanTests(FlexitradeTestCase):
+    """Every hot query is served by an index"""
+
+    def test_hot_queries_use_indexes(self):
+        owners, stocks = seed_dataset(5, 5, 5)
+        with index_planning():
+            for name, queryset in hot_queries(owners[0], stocks[0]).items():
+                with self.subTest(query=name):
+                    plan = queryset.explain()
+                    self.assertEqual(find_regressions(name, plan), [], plan)
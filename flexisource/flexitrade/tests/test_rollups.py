@@ -0,0 +1,101 @@
+"""Tests of the market-wide rollups"""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from flexitrade.holdings import load_expected_holdings
+from flexitrade.models import StockRollup, StockRollupDelta
+from flexitrade.rollups import (
+    diff_rollups,
+    expected_rollups,
+    fold_rollup_deltas,
+    load_current_rollups,
+)
+
+from .base import FlexitradeTestCase
+
+
+class RollupTests(FlexitradeTestCase):
+    """Every trade path keeps the rollups equal to a replay of the trade
+    history"""
+
+    def assertConsistent(self):
+        self.assertEqual(
+            diff_rollups(
+                expected_rollups(load_expected_holdings()),
+                load_current_rollups(),
+            ),
+            [],
+        )
+
+    def setUp(self):
+        super().setUp()
+        alice = self.client_for("alice")
+        bob = self.client_for("bob")
+        self.trade(alice, "GOOG", 10, "buy")
+        self.trade(bob, "GOOG", 5, "buy")
+        self.trade(alice, "GOOG", 10, "sell")
+        bob.post(
+            "/trades/batch/",
+            [
+                {"symbol": "GOOG", "quantity": 5, "action": "sell"},
+                {"symbol": "MSFT", "quantity": 7, "action": "buy"},
+            ],
+            format="json",
+        )
+        self.upload(alice, "symbol,quantity,action\nMSFT,4,buy\nAAPL,2,buy\n")
+
+    def test_trades_keep_rollups_consistent(self):
+        self.assertConsistent()
+        market = self.client_for("alice").get("/market/").json()
+        self.assertEqual(market["GOOG"]["net_shares"], 0)
+        self.assertEqual(market["GOOG"]["holder_count"], 0)
+        self.assertEqual(market["MSFT"]["net_shares"], 11)
+        self.assertEqual(market["MSFT"]["holder_count"], 2)
+
+    def test_folding_deltas_keeps_rollups(self):
+        before = load_current_rollups()
+        self.assertFalse(StockRollup.objects.exists())
+
+        self.assertGreater(fold_rollup_deltas(batch_size=2), 0)
+        self.assertFalse(StockRollupDelta.objects.exists())
+        self.assertEqual(load_current_rollups(), before)
+        self.assertConsistent()
+
+    def test_reconcile_finds_and_fixes_drift(self):
+        fold_rollup_deltas()
+        StockRollup.objects.filter(stock__ticker_symbol="MSFT").update(
+            net_shares=1
+        )
+        with self.assertRaises(CommandError):
+            call_command("reconcile_rollups", stderr=StringIO())
+
+        call_command(
+            "reconcile_rollups", "--fix", stdout=StringIO(), stderr=StringIO()
+        )
+
+    def test_top_holders(self):
+        client = self.client_for("carol")
+        self.trade(client, "MSFT", 9, "buy")
+
+        response = client.get("/market/MSFT/holders/", {"limit": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["net_shares"], 20)
+        self.assertEqual(response.json()["holder_count"], 3)
+        self.assertEqual(
+            response.json()["holders"],
+            [
+                {"username": "carol", "quantity": 9},
+                {"username": "bob", "quantity": 7},
+            ],
+        )
+
+    def test_top_holders_errors(self):
+        client = self.client_for("alice")
+        response = client.get("/market/GOOG/holders/", {"limit": 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("limit", response.json())
+
+        response = client.get("/market/NOPE/holders/")
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,113 @@
+"""Tests of the read replica routing"""
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import SimpleTestCase
+from flexitrade.models import Trade
+from flexitrade.routers import (
+    ReadReplicaRouter,
+    areplica_reads,
+    pin_to_primary,
+    primary_reads,
+    reading_from_replica,
+    replica_reads,
+)
+
+from .base import FlexitradeTestCase, UserModel
+
+
+# Routing needs no database, and a test case's transaction would keep every
+# read on the primary
+class ReadReplicaRouterTests(SimpleTestCase):
+    """Reads go to the replica in `replica_reads()`, unless the user wrote
+    recently or the read is part of a transaction"""
+
+    def setUp(self):
+        cache.clear()
+        replica = mock.patch(
+            "flexitrade.routers.replica_alias", return_value="replica"
+        )
+        replica.start()
+        self.addCleanup(replica.stop)
+
+        self.router = ReadReplicaRouter()
+        self.alice = UserModel(pk=1, username="alice")
+        self.bob = UserModel(pk=2, username="bob")
+
+    def db_for_read(self):
+        return self.router.db_for_read(Trade)
+
+    def test_reads_of_the_block_go_to_the_replica(self):
+        self.assertIsNone(self.db_for_read())
+        with replica_reads(self.alice):
+            self.assertEqual(self.db_for_read(), "replica")
+            self.assertTrue(reading_from_replica())
+            with primary_reads():
+                self.assertIsNone(self.db_for_read())
+        self.assertFalse(reading_from_replica())
+
+    def test_pinned_user_reads_from_the_primary(self):
+        pin_to_primary([self.alice.pk])
+        with replica_reads(self.alice):
+            self.assertIsNone(self.db_for_read())
+        with replica_reads(self.bob):
+            self.assertEqual(self.db_for_read(), "replica")
+
+    def test_everyone_can_be_pinned(self):
+        pin_to_primary()
+        for user in (self.alice, self.bob):
+            with replica_reads(user):
+                self.assertIsNone(self.db_for_read())
+
+    def test_transaction_reads_from_the_primary(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        with mock.patch.object(connection, "in_atomic_block", True):
+            with replica_reads(self.alice):
+                self.assertIsNone(self.db_for_read())
+
+    async def test_async_reads(self):
+        async with areplica_reads(self.alice):
+            self.assertEqual(self.db_for_read(), "replica")
+        pin_to_primary([self.alice.pk])
+        async with areplica_reads(self.alice):
+            self.assertIsNone(self.db_for_read())
+
+    def test_writes_and_migrations_stay_on_the_primary(self):
+        with replica_reads(self.alice):
+            self.assertEqual(self.router.db_for_write(Trade), DEFAULT_DB_ALIAS)
+        self.assertFalse(self.router.allow_migrate("replica", "flexitrade"))
+        self.assertIsNone(
+            self.router.allow_migrate(DEFAULT_DB_ALIAS, "flexitrade")
+        )
+
+    def test_no_replica(self):
+        with mock.patch("flexitrade.routers.replica_alias", return_value=None):
+            pin_to_primary([self.alice.pk])
+            with replica_reads(self.bob):
+                self.assertIsNone(self.db_for_read())
+        self.assertEqual(cache.get_many(["replica:pin:1"]), {})
+
+
+class PinOnWriteTests(FlexitradeTestCase):
+    """Every trade path pins its users to the primary"""
+
+    def test_trades_pin_their_users(self):
+        alice = self.client_for("alice")
+        bob = self.client_for("bob")
+        carol = self.client_for("carol")
+        with mock.patch(
+            "flexitrade.routers.replica_alias", return_value="replica"
+        ):
+            self.trade(alice, "GOOG", 1, "buy")
+            bob.post(
+                "/trades/batch/",
+                [{"symbol": "GOOG", "quantity": 1, "action": "buy"}],
+                format="json",
+            )
+            with replica_reads(carol.user):
+                self.assertTrue(reading_from_replica())
+            for client in (alice, bob):
+                with replica_reads(client.user):
+                    self.assertFalse(reading_from_replica())
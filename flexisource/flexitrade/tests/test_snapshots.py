@@ -0,0 +1,90 @@
+"""Tests of the holding snapshots and the historical portfolios"""
+
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from flexitrade.models import HoldingSnapshot, Trade
+
+from .base import FlexitradeTestCase
+
+
+def at(hour, minute=0) -> datetime:
+    return datetime(2026, 1, 5, hour, minute, tzinfo=timezone.utc)
+
+
+class SnapshotTests(FlexitradeTestCase):
+    """A past portfolio is the latest snapshot before it plus the trades
+    since, and equals a replay of the whole history"""
+
+    # The portfolio of alice at these times, as {symbol: quantity}
+    HISTORY = {
+        at(9): {},
+        at(10): {"GOOG": 10},
+        at(12): {"GOOG": 10},
+        at(12, 45): {"GOOG": 6},
+        at(13): {"GOOG": 6},
+        at(16): {"GOOG": 6, "MSFT": 2},
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for("alice")
+        bob = self.client_for("bob")
+        trades = [
+            (self.client, "GOOG", 10, "buy", at(10)),
+            (bob, "GOOG", 7, "buy", at(11, 15)),
+            (self.client, "GOOG", 4, "sell", at(12, 30)),
+            (self.client, "MSFT", 2, "buy", at(15)),
+        ]
+        for client, symbol, quantity, action, created in trades:
+            self.trade(client, symbol, quantity, action)
+            Trade.objects.filter(pk=Trade.objects.latest("pk").pk).update(
+                created=created
+            )
+
+    def portfolio_as_of(self, as_of: datetime):
+        response = self.client.get("/portfolio/", {"as_of": as_of.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        return {
+            symbol: position["total_quantity"]
+            for symbol, position in response.json().items()
+        }
+
+    def assert_history(self):
+        for as_of, portfolio in self.HISTORY.items():
+            with self.subTest(as_of=as_of):
+                self.assertEqual(self.portfolio_as_of(as_of), portfolio)
+
+    def test_history_without_snapshots(self):
+        self.assert_history()
+
+    def test_history_from_snapshots(self):
+        call_command(
+            "build_portfolio_snapshots",
+            "--interval=3600",
+            "--delay=0",
+            stdout=StringIO(),
+        )
+        self.assertEqual(
+            sorted(HoldingSnapshot.objects.values_list("as_of", flat=True)),
+            # The end of every hour that had trades, with both users
+            [at(10)] + [at(12)] * 2 + [at(13)] * 2 + [at(15)] * 3,
+        )
+        self.assert_history()
+
+        # A second build has nothing to add
+        call_command(
+            "build_portfolio_snapshots",
+            "--interval=3600",
+            "--delay=0",
+            stdout=StringIO(),
+        )
+        self.assertEqual(HoldingSnapshot.objects.count(), 8)
+
+    def test_invalid_as_of(self):
+        response = self.client.get("/portfolio/", {"as_of": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"as_of": ["as_of must be an ISO 8601 datetime"]}
+        )
@@ -0,0 +1,57 @@
+"""Tests of the stock registry"""
+
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from flexitrade.models import Stock
+from flexitrade.stock_registry import (
+    VERSION_KEY,
+    get_or_create_stock,
+    get_stock,
+)
+
+from .base import FlexitradeTestCase
+
+
+class StockRegistryTests(FlexitradeTestCase):
+    """Stocks are served from memory until a change commits"""
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stock = Stock.objects.create(ticker_symbol="GOOG", price=10)
+        # Loads the registry
+        get_stock("GOOG")
+
+    def test_registered_stock_is_not_queried(self):
+        with self.assertNumQueries(0):
+            entry = get_stock("GOOG")
+        self.assertEqual(entry, (self.stock.pk, Decimal("10.00")))
+
+    def test_change_sets_a_new_version_once_committed(self):
+        version = cache.get(VERSION_KEY)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.stock.price = 12
+            self.stock.save()
+            self.assertEqual(cache.get(VERSION_KEY), version)
+        for callback in callbacks:
+            callback()
+
+        self.assertNotEqual(cache.get(VERSION_KEY), version)
+        self.assertEqual(get_stock("GOOG").price, Decimal("12.00"))
+
+    def test_deleted_stock_is_forgotten(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stock.delete()
+        self.assertIsNone(get_stock("GOOG"))
+
+    def test_rolled_back_stock_is_not_registered(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    get_or_create_stock("MSFT", defaults={"price": 5})
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertIsNone(get_stock("MSFT"))
@@ -0,0 +1,70 @@
+"""Tests of the JSON trade batch endpoint"""
+
+from django.test import override_settings
+from flexitrade.models import Holding, Trade
+
+from .base import FlexitradeTestCase
+
+
+class TradeBatchTests(FlexitradeTestCase):
+    """A batch of orders is validated and placed together, or not at all"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for("alice")
+
+    def post(self, orders):
+        return self.client.post("/trades/batch/", orders, format="json")
+
+    def test_batch_is_placed(self):
+        response = self.post(
+            [
+                {"symbol": "GOOG", "quantity": 5, "action": "buy"},
+                {"symbol": "GOOG", "quantity": "2", "action": "sell"},
+                {"symbol": "MSFT", "quantity": 1, "action": "buy"},
+            ]
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.json()["1"], "2 share(s) of GOOG sold for alice"
+        )
+        self.assertEqual(
+            dict(
+                Holding.objects.values_list("stock__ticker_symbol", "quantity")
+            ),
+            {"GOOG": 3, "MSFT": 1},
+        )
+
+    def test_invalid_order_places_nothing(self):
+        response = self.post(
+            [
+                {"symbol": "GOOG", "quantity": 5, "action": "buy"},
+                {"symbol": "GOOG", "quantity": 6, "action": "sell"},
+                {"symbol": "MSFT", "action": "buy"},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.json()), ["1", "2"])
+        self.assertFalse(Trade.objects.exists())
+
+    def test_payload_shape(self):
+        cases = {
+            "empty": [],
+            "not an array": {"symbol": "GOOG", "quantity": 1, "action": "buy"},
+            "not objects": [["GOOG", 1, "buy"]],
+        }
+        for name, orders in cases.items():
+            with self.subTest(name):
+                response = self.post(orders)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+
+    @override_settings(TRADE_BATCH_MAX_ORDERS=2)
+    def test_batch_size_is_capped(self):
+        order = {"symbol": "GOOG", "quantity": 1, "action": "buy"}
+        response = self.post([order] * 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"error": "Batch exceeds the maximum of 2 orders"}
+        )
+        self.assertEqual(self.post([order] * 2).status_code, 201)
@@ -0,0 +1,149 @@
+"""Tests of the trade validators"""
+
+import pandas as pd
+from flexitrade.models import MAX_QUANTITY
+from flexitrade.validators import (
+    MSG_QUANTITY_NOT_NUMBER,
+    MSG_QUANTITY_TOO_LARGE,
+    MSG_QUANTITY_TOO_SMALL,
+    BulkTradeValidator,
+    TradeValidator,
+)
+
+from .base import FlexitradeTestCase, UserModel
+
+
+class ValidatorParityTests(FlexitradeTestCase):
+    """The batch validator gives the same errors and quantities as the
+    single trade one"""
+
+    VALID_QUANTITIES = [
+        5,
+        "5",
+        " 5 ",
+        "+5",
+        5.5,
+        MAX_QUANTITY,
+        str(MAX_QUANTITY),
+    ]
+    INVALID_QUANTITIES = [
+        "-5",
+        "5.5",
+        "0",
+        0,
+        None,
+        "",
+        "  ",
+        0.5,
+        "٥",  # An Arabic-Indic 5
+        "1_000",
+        "abc",
+        True,
+        float("inf"),
+        MAX_QUANTITY + 1,
+        2**40,
+        "99999999999",
+        1e20,
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.owner = UserModel.objects.create(username="parity")
+
+    def validate_single(self, quantity) -> TradeValidator:
+        validator = TradeValidator(
+            {"symbol": "GOOG", "quantity": quantity, "action": "buy"},
+            owner=self.owner,
+        )
+        validator.validate_raw_values()
+        return validator
+
+    def validate_batch(self, quantities) -> BulkTradeValidator:
+        df = pd.DataFrame(
+            [{"symbol": "GOOG", "quantity": value} for value in quantities]
+        ).assign(action="buy")
+        validator = BulkTradeValidator(df, owner=self.owner)
+        validator.is_valid()
+        return validator
+
+    def test_quantities_match(self):
+        for value in self.VALID_QUANTITIES + self.INVALID_QUANTITIES:
+            single = self.validate_single(value)
+            self.assertEqual(
+                not single.errors, value in self.VALID_QUANTITIES, value
+            )
+
+            # Alone, and next to the types that change the column's dtype
+            for others in ([], ["5"], [5], [5.5]):
+                batch = self.validate_batch([value, *others])
+                with self.subTest(value=value, others=others):
+                    self.assertEqual(
+                        batch.errors.get(0, {}), dict(single.errors)
+                    )
+                    if not single.errors:
+                        self.assertEqual(
+                            batch.valid_trades[0]["quantity"],
+                            single.quantity,
+                        )
+
+    def test_quantity_bounds(self):
+        cases = {
+            0: MSG_QUANTITY_TOO_SMALL,
+            MAX_QUANTITY + 1: MSG_QUANTITY_TOO_LARGE,
+            "99999999999": MSG_QUANTITY_TOO_LARGE,
+            "abc": MSG_QUANTITY_NOT_NUMBER,
+        }
+        for value, message in cases.items():
+            with self.subTest(value=value):
+                self.assertEqual(
+                    dict(self.validate_single(value).errors),
+                    {"quantity": [message]},
+                )
+
+    def test_nan_is_not_a_number(self):
+        # A missing cell of a file is NaN too, so the batch validator can
+        # only treat it like an empty quantity
+        single = self.validate_single(float("nan"))
+        self.assertEqual(
+            dict(single.errors), {"quantity": [MSG_QUANTITY_NOT_NUMBER]}
+        )
+
+    def test_symbol_and_action_match(self):
+        rows = [
+            {"symbol": "", "quantity": 1, "action": "buy"},
+            {"symbol": "TOOLONG", "quantity": 1, "action": "buy"},
+            {"symbol": "GOOG", "quantity": 1, "action": "hold"},
+            {"symbol": "GOOG", "quantity": 1, "action": " sell "},
+        ]
+        batch = BulkTradeValidator(pd.DataFrame(rows), owner=self.owner)
+        batch.is_valid()
+        for index, row in enumerate(rows):
+            single = TradeValidator(row, owner=self.owner)
+            single.is_valid()
+            with self.subTest(row=row):
+                self.assertEqual(
+                    batch.errors.get(index, {}), dict(single.errors)
+                )
+
+
+class QuantityBoundTests(FlexitradeTestCase):
+    """A quantity the database can't hold is a validation error on every
+    trade endpoint, never a server error"""
+
+    def test_single_trade(self):
+        client = self.client_for("alice")
+        response = self.trade(client, "GOOG", "99999999999", "buy")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"quantity": [MSG_QUANTITY_TOO_LARGE]}
+        )
+
+    def test_bulk_file(self):
+        client = self.client_for("alice")
+        response = self.upload(
+            client, "symbol,quantity,action\nGOOG,1,buy\nGOOG,2147483648,buy\n"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"1": {"quantity": [MSG_QUANTITY_TOO_LARGE]}}
+        )
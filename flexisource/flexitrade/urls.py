@@ -1,7 +1,18 @@
 from django.urls import path
 
 from .views.auth import UserLoginView, UserLogoutView, UserRegistrationView
-from .views.trade import PlaceBulkTrade, PlaceSingleTradeView, PortfolioView
+from .views.history import TradeHistoryExportView, TradeHistoryView
+from .views.market import MarketView, TopHoldersView
+from .views.metrics import MetricsView
+from .views.prices import PriceUpdateView
+from .views.trade import (
+    BulkTradeJobErrorsView,
+    BulkTradeJobView,
+    PlaceBulkTrade,
+    PlaceSingleTradeView,
+    PlaceTradeBatchView,
+    PortfolioView,
+)
 
 urlpatterns = [
     path("auth/signup/", UserRegistrationView.as_view(), name="signup"),
@@ -9,5 +20,30 @@ urlpatterns = [
     path("auth/logout/", UserLogoutView.as_view(), name="logout"),
     path("portfolio/", PortfolioView.as_view(), name="portfolio"),
     path("bulk_trade/", PlaceBulkTrade.as_view(), name="bulk_trade"),
+    path(
+        "bulk_trade/<int:job_id>/",
+        BulkTradeJobView.as_view(),
+        name="bulk_trade_job",
+    ),
+    path(
+        "bulk_trade/<int:job_id>/errors.csv",
+        BulkTradeJobErrorsView.as_view(),
+        name="bulk_trade_job_errors",
+    ),
     path("trade/", PlaceSingleTradeView.as_view(), name="single_trade"),
+    path("trades/", TradeHistoryView.as_view(), name="trade_history"),
+    path("trades/batch/", PlaceTradeBatchView.as_view(), name="trade_batch"),
+    path(
+        "trades/export.csv",
+        TradeHistoryExportView.as_view(),
+        name="trade_history_export",
+    ),
+    path("prices/", PriceUpdateView.as_view(), name="price_update"),
+    path("market/", MarketView.as_view(), name="market"),
+    path(
+        "market/<str:symbol>/holders/",
+        TopHoldersView.as_view(),
+        name="top_holders",
+    ),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
@@ -1,24 +1,93 @@
 """Class for validating trades"""
+
+import math
+import re
 from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Tuple
 
+import numpy as np
+import pandas as pd
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db.models import Model
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from pandas.api.types import (
+    infer_dtype,
+    is_bool_dtype,
+    is_integer_dtype,
+    is_numeric_dtype,
+)
 
 from .enums import TradeActionChoices
-from .queries import calculate_owned_shares
+from .models import MAX_QUANTITY
+from .pagination import decode_cursor
+from .queries import (
+    acalculate_owned_shares,
+    calculate_owned_shares,
+    chunked,
+    load_holdings_for,
+)
+from .routers import primary_reads
+from .stock_registry import get_stocks
 
 UserModel = get_user_model()
 
+MSG_NO_SYMBOL = "no symbol provided"
+MSG_SYMBOL_TOO_LONG = "symbol should be max 5 characters"
+MSG_QUANTITY_NOT_NUMBER = "quantity must be a number"
+MSG_QUANTITY_TOO_SMALL = "quantity must be minimum 1 share"
+MSG_QUANTITY_TOO_LARGE = f"quantity must be maximum {MAX_QUANTITY} shares"
+MSG_BAD_ACTION = "action should be only one of ['buy', 'sell']"
+MSG_BAD_CURSOR = "invalid cursor"
+MSG_LIMIT_NOT_NUMBER = "limit must be a number"
+MSG_PRICE_NOT_NUMBER = "price must be a number with at most 2 decimals"
+MSG_PRICE_TOO_SMALL = "price must be minimum 0.01"
+MSG_BAD_AS_OF = "as_of must be an ISO 8601 datetime"
+
+# ASCII digits only, with the whitespace `int()` strips spelled out, since
+# `\d` and `\s` match other characters in Python and in Arrow's regexes
+QUANTITY_PATTERN = r"[ \t\n\r\f\v]*[+-]?[0-9]+[ \t\n\r\f\v]*"
+
+
+def as_text(value) -> str:
+    """A raw input as a string, missing ones being blank"""
+    return "" if value is None else str(value)
+
+
+def clean_quantity(value) -> int:
+    """The raw value of a quantity as an int, missing ones being 0
+
+    Only numbers and strings of ASCII digits are quantities: numbers are
+    truncated like `int()` does. Raises ValueError for anything else. Both
+    trade validators follow these rules, so every trade endpoint accepts
+    the same quantities.
+    """
+    if value is None or value == "":
+        return 0
+    if isinstance(value, str):
+        if not re.fullmatch(QUANTITY_PATTERN, value):
+            raise ValueError(value)
+        return int(value)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(value)
+    if not math.isfinite(value):
+        raise ValueError(value)
+    return int(value)
+
 
 class TradeValidator:
     """Validator class for Trades"""
 
-    def __init__(self, params):
+    def __init__(self, params, owner: Model = None):
+        """`owner` skips looking up the user by the `username` param"""
         self.username: str = params.get("username") or ""
-        self.symbol: str = params.get("symbol") or ""
-        self.quantity: int = params.get("quantity") or 0
-        self.action: str = params.get("action") or ""
-        self.owner: Model = None
+        self.symbol: str = as_text(params.get("symbol"))
+        self.quantity: int = params.get("quantity")
+        self.action: str = as_text(params.get("action"))
+        self.owner: Model = owner
 
         self.errors = defaultdict(list)
 
@@ -40,6 +109,11 @@ class TradeValidator:
         """Validate inputs based on given values alone"""
 
         self.validate_owner()
+        self.validate_raw_values()
+
+    def validate_raw_values(self):
+        """Validate the inputs that don't need the database"""
+
         self.validate_symbol()
         self.validate_quantity()
         self.validate_action()
@@ -62,9 +136,25 @@ class TradeValidator:
 
         return True
 
+    async def ais_valid(self) -> bool:
+        """Async version of `is_valid`, for the async views"""
+        await self.avalidate_owner()
+        self.validate_raw_values()
+        if self.errors:
+            return False
+
+        if self.action == TradeActionChoices.SELL:
+            await self.avalidate_sell_order()
+            if self.errors:
+                return False
+
+        return True
+
     def validate_owner(self) -> None:
         """Validate the username and get the owner"""
         key = "user"
+        if self.owner is not None:
+            return
 
         try:
             self.owner = UserModel.objects.get(username=self.username)
@@ -72,17 +162,28 @@ class TradeValidator:
             msg = f"Nonexistent user '{self.username}'"
             self.errors[key].append(msg)
 
+    async def avalidate_owner(self) -> None:
+        """Async version of `validate_owner`"""
+        if self.owner is not None:
+            return
+
+        try:
+            self.owner = await UserModel.objects.aget(username=self.username)
+        except UserModel.DoesNotExist:
+            msg = f"Nonexistent user '{self.username}'"
+            self.errors["user"].append(msg)
+
     def validate_symbol(self) -> None:
         """Validate the raw value of symbol"""
         key = "symbol"
 
         if not self.symbol:
-            msg = "no symbol provided"
+            msg = MSG_NO_SYMBOL
             self.errors[key].append(msg)
 
         self.symbol = self.symbol.strip()
         if len(self.symbol) > 5:
-            msg = "symbol should be max 5 characters"
+            msg = MSG_SYMBOL_TOO_LONG
             self.errors[key].append(msg)
 
     def validate_quantity(self) -> None:
@@ -90,14 +191,17 @@ class TradeValidator:
         key = "quantity"
 
         try:
-            self.quantity = int(self.quantity)
-        except (TypeError, ValueError):
-            msg = "quantity must be a number"
+            self.quantity = clean_quantity(self.quantity)
+        except ValueError:
+            msg = MSG_QUANTITY_NOT_NUMBER
             self.errors[key].append(msg)
             return
 
         if self.quantity < 1:
-            msg = "quantity must be minimum 1 share"
+            msg = MSG_QUANTITY_TOO_SMALL
+            self.errors[key].append(msg)
+        elif self.quantity > MAX_QUANTITY:
+            msg = MSG_QUANTITY_TOO_LARGE
             self.errors[key].append(msg)
 
     def validate_action(self) -> None:
@@ -106,7 +210,7 @@ class TradeValidator:
 
         self.action = self.action.strip()
         if not self.action or self.action not in ["buy", "sell"]:
-            msg = "action should be only one of ['buy', 'sell']"
+            msg = MSG_BAD_ACTION
             self.errors[key].append(msg)
 
         if len(self.action) > 1:
@@ -116,12 +220,437 @@ class TradeValidator:
         """Verify a sell order is valid with respect to shares owned by user
 
         This part of the validation needs to hit the database if
-        `self.owned_shares` was not given
+        `self.owned_shares` was not given. It's always read from the primary,
+        since a replica may not have the user's latest trades yet.
         """
-        owned_shares = calculate_owned_shares(self.owner, self.symbol)
+        with primary_reads():
+            owned_shares = calculate_owned_shares(self.owner, self.symbol)
         if self.quantity > owned_shares:
-            msg = (
-                f"Trying to sell {self.quantity} shares of {self.symbol}, "
-                f"but user only owns {owned_shares} shares"
+            msg = oversell_message(self.quantity, self.symbol, owned_shares)
+            self.errors["sell"].append(msg)
+
+    async def avalidate_sell_order(self):
+        """Async version of `validate_sell_order`"""
+        with primary_reads():
+            owned_shares = await acalculate_owned_shares(
+                self.owner, self.symbol
             )
+        if self.quantity > owned_shares:
+            msg = oversell_message(self.quantity, self.symbol, owned_shares)
             self.errors["sell"].append(msg)
+
+
+def oversell_message(quantity, symbol, owned_shares) -> str:
+    """Error message for selling more shares than the user owns"""
+    return (
+        f"Trying to sell {quantity} shares of {symbol}, "
+        f"but user only owns {owned_shares} shares"
+    )
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO 8601 datetime, naive ones being in the current time zone
+
+    Raises ValueError if it isn't one.
+    """
+    timestamp = parse_datetime(value)
+    if timestamp is None:
+        raise ValueError(value)
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp
+
+
+class TradeHistoryValidator:
+    """Validator for the filters and the page of the trade history"""
+
+    def __init__(self, params):
+        self.symbol: str = params.get("symbol") or ""
+        self.action: str = params.get("action") or ""
+        self.since: str = params.get("since") or ""
+        self.until: str = params.get("until") or ""
+        self.cursor: str = params.get("cursor") or ""
+        self.limit = params.get("limit") or settings.TRADE_HISTORY_PAGE_SIZE
+        self.cleaned: Dict = {}
+
+        self.errors = defaultdict(list)
+
+    @property
+    def error_dict(self):
+        """Return all listed errors"""
+        return self.errors
+
+    def cleaned_params(self):
+        """Return the parameters cleaned, without the ones not given"""
+        return self.cleaned
+
+    def is_valid(self) -> bool:
+        """Validate the given filters, cursor and page size"""
+        self.validate_symbol()
+        self.validate_action()
+        for key in ["since", "until"]:
+            self.validate_timestamp(key)
+        self.validate_cursor()
+        self.validate_limit()
+
+        return not self.errors
+
+    def validate_symbol(self) -> None:
+        """Validate the symbol, if given"""
+        self.symbol = self.symbol.strip()
+        if not self.symbol:
+            return
+        if len(self.symbol) > 5:
+            self.errors["symbol"].append(MSG_SYMBOL_TOO_LONG)
+            return
+
+        self.cleaned["symbol"] = self.symbol
+
+    def validate_action(self) -> None:
+        """Validate the action, if given"""
+        self.action = self.action.strip()
+        if not self.action:
+            return
+        if self.action not in ["buy", "sell"]:
+            self.errors["action"].append(MSG_BAD_ACTION)
+            return
+
+        self.cleaned["action"] = self.action[:1]
+
+    def validate_timestamp(self, key) -> None:
+        """Validate the `since` or `until` timestamp, if given"""
+        value = getattr(self, key).strip()
+        if not value:
+            return
+        try:
+            self.cleaned[key] = parse_timestamp(value)
+        except ValueError:
+            self.errors[key].append(f"{key} must be an ISO 8601 datetime")
+
+    def validate_cursor(self) -> None:
+        """Validate the cursor of the page, if given"""
+        if not self.cursor:
+            return
+        try:
+            self.cleaned["after"] = decode_cursor(self.cursor)
+        except ValueError:
+            self.errors["cursor"].append(MSG_BAD_CURSOR)
+
+    def validate_limit(self) -> None:
+        """Validate the number of trades per page"""
+        try:
+            self.limit = int(self.limit)
+        except (TypeError, ValueError):
+            self.errors["limit"].append(MSG_LIMIT_NOT_NUMBER)
+            return
+
+        max_limit = settings.TRADE_HISTORY_MAX_PAGE_SIZE
+        if not 1 <= self.limit <= max_limit:
+            msg = f"limit must be between 1 and {max_limit}"
+            self.errors["limit"].append(msg)
+            return
+
+        self.cleaned["limit"] = self.limit
+
+
+class DataFrameValidator:
+    """Base of the validators of a whole DataFrame of rows at once
+
+    The checks are column masks, and only the failing rows get error dicts.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.errors: Dict[int, Dict[str, List[str]]] = {}
+
+    def _column(self, key) -> pd.Series:
+        """The column as strings, with blanks for missing or absent values"""
+        if key not in self.df:
+            return pd.Series("", index=self.df.index, dtype=object)
+        if isinstance(self.df[key].dtype, pd.StringDtype):
+            return self.df[key].fillna("")
+        return self.df[key].fillna("").astype(str)
+
+    def _collect_raw_errors(self, checks) -> None:
+        """Turn the failed checks into error dicts, only for failing rows
+
+        `checks` maps each key to its (mask, message) pairs. A message can
+        be a function of the row index.
+        """
+        failed_any = np.zeros(len(self.df), dtype=bool)
+        for key_checks in checks.values():
+            for mask, _ in key_checks:
+                failed_any |= mask.to_numpy()
+
+        failing = self.df.index[failed_any]
+        for index in failing:
+            errors = defaultdict(list)
+            for key, key_checks in checks.items():
+                for mask, msg in key_checks:
+                    if mask.at[index]:
+                        if callable(msg):
+                            msg = msg(index)
+                        errors[key].append(msg)
+            self.errors[index] = errors
+
+
+class BulkTradeValidator(DataFrameValidator):
+    """Validator for a whole DataFrame of trades at once
+
+    Gives the same per-row errors as running a `TradeValidator` on each row,
+    but the raw input checks are column operations, and the database is hit
+    a fixed number of times instead of once or twice per row. Sells are
+    checked against the holdings plus the earlier rows of the same batch.
+    """
+
+    def __init__(
+        self, df: pd.DataFrame, username: str = None, owner: Model = None
+    ):
+        """`owner` places every trade, without looking up any username"""
+        super().__init__(df)
+        self.owner = owner
+        self.username = owner.username if owner is not None else username
+        self.valid_trades: List[Dict] = []
+
+    def _quantities(self) -> Tuple[pd.Series, pd.Series]:
+        """The quantities as whole numbers, and whether each one is a number
+
+        The rules are the ones of `clean_quantity`. A numeric column, as read
+        from a typed file, is checked as it is, and text is parsed, both
+        with column operations. Only a column of mixed types, e.g. from a
+        JSON batch, is cleaned value by value. Missing quantities count as 0.
+        """
+        index = self.df.index
+        column = self.df.get("quantity")
+        if column is None:
+            return (pd.Series(0, index=index), pd.Series(True, index=index))
+
+        if is_bool_dtype(column):
+            return (
+                pd.Series(np.nan, index=index),
+                pd.Series(False, index=index),
+            )
+
+        if is_numeric_dtype(column):
+            quantities = column.fillna(0)
+            if is_integer_dtype(quantities):
+                return (quantities, pd.Series(True, index=index))
+            is_number = pd.Series(np.isfinite(quantities), index=index)
+            return (np.trunc(quantities.where(is_number)), is_number)
+
+        if infer_dtype(column, skipna=True) not in ("string", "empty"):
+            quantities, is_number = [], []
+            for value in column.where(column.notna(), None).tolist():
+                try:
+                    quantities.append(clean_quantity(value))
+                    is_number.append(True)
+                except ValueError:
+                    quantities.append(np.nan)
+                    is_number.append(False)
+            return (
+                pd.Series(quantities, index=index, dtype=float),
+                pd.Series(is_number, index=index),
+            )
+
+        quantities = self._column("quantity").replace("", "0")
+        is_number = quantities.str.fullmatch(QUANTITY_PATTERN)
+        quantities = pd.to_numeric(
+            quantities.where(is_number), errors="coerce"
+        )
+        is_number = (is_number & quantities.notna()).astype(bool)
+        return (quantities, is_number)
+
+    def is_valid(self) -> bool:
+        """Validate every row, collecting the errors and the cleaned trades"""
+        if self.username is not None:
+            usernames = pd.Series(self.username, index=self.df.index)
+        else:
+            usernames = self._column("username")
+
+        symbols = self._column("symbol")
+        quantities, is_number = self._quantities()
+        actions = self._column("action").str.strip()
+
+        if self.owner is not None:
+            users = {self.owner.username: self.owner}
+        else:
+            users = self._load_users(usernames.unique())
+
+        checks = {
+            "user": [
+                (
+                    ~usernames.isin(users.keys()),
+                    lambda index: f"Nonexistent user '{usernames.at[index]}'",
+                )
+            ],
+            "symbol": [
+                (symbols == "", MSG_NO_SYMBOL),
+                (symbols.str.strip().str.len() > 5, MSG_SYMBOL_TOO_LONG),
+            ],
+            "quantity": [
+                (~is_number, MSG_QUANTITY_NOT_NUMBER),
+                (is_number & (quantities < 1), MSG_QUANTITY_TOO_SMALL),
+                (
+                    is_number & (quantities > MAX_QUANTITY),
+                    MSG_QUANTITY_TOO_LARGE,
+                ),
+            ],
+            "action": [(~actions.isin(["buy", "sell"]), MSG_BAD_ACTION)],
+        }
+        self._collect_raw_errors(checks)
+
+        valid = pd.DataFrame(
+            {
+                "username": usernames,
+                "symbol": symbols.str.strip(),
+                "quantity": quantities,
+                "action": actions.str[:1],
+            }
+        )
+        valid = valid[~valid.index.isin(self.errors.keys())]
+        valid = valid.assign(
+            owner_id=valid["username"].map(
+                {name: user.pk for name, user in users.items()}
+            )
+        )
+        self._validate_sell_orders(valid)
+        self.errors = dict(sorted(self.errors.items()))
+
+        valid = valid[~valid.index.isin(self.errors.keys())]
+        self.valid_trades = [
+            {
+                "owner": users[username],
+                "symbol": symbol,
+                "quantity": int(quantity),
+                "action": action,
+            }
+            for username, symbol, quantity, action in zip(
+                valid["username"].tolist(),
+                valid["symbol"].tolist(),
+                valid["quantity"].tolist(),
+                valid["action"].tolist(),
+            )
+        ]
+
+        return not self.errors
+
+    def _load_users(self, usernames) -> Dict[str, Model]:
+        """Resolve all usernames of the batch in as few queries as possible"""
+        users = {}
+        for usernames_chunk in chunked(usernames):
+            for user in UserModel.objects.filter(username__in=usernames_chunk):
+                users[user.username] = user
+        return users
+
+    def _validate_sell_orders(self, valid: pd.DataFrame) -> None:
+        """Check sells against holdings and earlier rows of the same batch
+
+        The running position of every (user, stock) is computed with a
+        grouped cumulative sum. Only the pairs whose position would go
+        negative at some point are replayed row by row, since a rejected sell
+        must not count towards the rows after it.
+        """
+        is_sell = valid["action"] == TradeActionChoices.SELL
+        if not is_sell.any():
+            return
+
+        sold = valid[is_sell]
+        with primary_reads():
+            holdings = load_holdings_for(sold["owner_id"], sold["symbol"])
+        pairs = list(zip(valid["owner_id"], valid["symbol"]))
+
+        starting = pd.Series(
+            [holdings.get(pair, 0) for pair in pairs], index=valid.index
+        )
+        deltas = valid["quantity"].where(~is_sell, -valid["quantity"])
+        running = (
+            starting
+            + deltas.groupby([valid["owner_id"], valid["symbol"]]).cumsum()
+        )
+        went_negative = (
+            (running < 0)
+            .groupby([valid["owner_id"], valid["symbol"]])
+            .transform("any")
+        )
+
+        positions: Dict[Tuple[int, str], int] = {}
+        replay = valid[went_negative]
+        for index, owner_id, symbol, quantity, action in zip(
+            replay.index,
+            replay["owner_id"],
+            replay["symbol"],
+            replay["quantity"],
+            replay["action"],
+        ):
+            pair = (owner_id, symbol)
+            owned_shares = positions.get(pair, holdings.get(pair, 0))
+            quantity = int(quantity)
+            if action != TradeActionChoices.SELL:
+                positions[pair] = owned_shares + quantity
+            elif quantity > owned_shares:
+                msg = oversell_message(quantity, symbol, owned_shares)
+                self.errors[index] = {"sell": [msg]}
+            else:
+                positions[pair] = owned_shares - quantity
+
+
+class PriceTickValidator(DataFrameValidator):
+    """Validator for a whole DataFrame of price ticks at once
+
+    Every column is checked with column operations, and the symbols are
+    resolved by the stock registry. A tick without `as_of` is for now.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        super().__init__(df)
+        self.valid_ticks = pd.DataFrame(columns=["stock_id", "price", "as_of"])
+
+    def is_valid(self) -> bool:
+        """Validate every row, collecting the errors and the cleaned ticks"""
+        symbols = self._column("symbol").str.strip()
+        prices = self._column("price").str.strip()
+        timestamps = self._column("as_of").str.strip()
+
+        stocks = get_stocks(symbols[symbols != ""].unique())
+        is_price = prices.str.fullmatch(r"\d{1,6}(\.\d{1,2})?")
+        amounts = pd.to_numeric(prices.where(is_price), errors="coerce")
+        as_of = pd.to_datetime(
+            timestamps.where(timestamps != ""),
+            utc=True,
+            errors="coerce",
+            format="ISO8601",
+        )
+
+        checks = {
+            "symbol": [
+                (symbols == "", MSG_NO_SYMBOL),
+                (
+                    (symbols != "") & ~symbols.isin(stocks.keys()),
+                    lambda index: f"Unknown symbol '{symbols.at[index]}'",
+                ),
+            ],
+            "price": [
+                (~is_price, MSG_PRICE_NOT_NUMBER),
+                (is_price & (amounts < 0.01), MSG_PRICE_TOO_SMALL),
+            ],
+            "as_of": [((timestamps != "") & as_of.isna(), MSG_BAD_AS_OF)],
+        }
+        self._collect_raw_errors(checks)
+        self.errors = dict(sorted(self.errors.items()))
+
+        valid = ~self.df.index.isin(self.errors.keys())
+        now = timezone.now()
+        self.valid_ticks = pd.DataFrame(
+            {
+                "stock_id": [
+                    stocks[symbol].id for symbol in symbols[valid].tolist()
+                ],
+                "price": [Decimal(price) for price in prices[valid].tolist()],
+                "as_of": [
+                    now if pd.isna(timestamp) else timestamp.to_pydatetime()
+                    for timestamp in as_of[valid].tolist()
+                ],
+            }
+        )
+
+        return not self.errors
@@ -5,7 +5,8 @@ https://medium.com/django-unleashed/token-based-authentication-and-authorization
 https://stackoverflow.com/a/64824530
 """
 
-from django.contrib.auth import authenticate
+from adrf.views import APIView as AsyncAPIView
+from django.contrib.auth import aauthenticate
 from flexitrade.serializers import UserSerializer
 from rest_framework import generics, permissions, status
 from rest_framework.authtoken.models import Token
@@ -20,13 +21,13 @@ class UserRegistrationView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
 
 
-class UserLoginView(APIView):
+class UserLoginView(AsyncAPIView):
     """Login a user using Token Auth"""
 
     permission_classes = [permissions.AllowAny]
 
-    def post(self, request):
-        user = authenticate(
+    async def post(self, request):
+        user = await aauthenticate(
             username=request.data["username"],
             password=request.data["password"],
         )
@@ -36,7 +37,7 @@ class UserLoginView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
-        token, _ = Token.objects.get_or_create(user=user)
+        token, _ = await Token.objects.aget_or_create(user=user)
         return Response({"token": token.key})
 
 
@@ -46,10 +47,14 @@ class UserLogoutView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def delete(self, request, *args, **kwargs):
-        """Delete the user's token, if it exists, to log them out"""
+        """Delete the user's token, if it exists, to log them out
+
+        Deleting the token revokes it in every process (see
+        `flexitrade.authentication`).
+        """
         token = getattr(request.user, "auth_token", None)
         if token:
-            request.user.auth_token.delete()
+            token.delete()
             data = {
                 "message": "You have successfully logged out.",
             }
@@ -0,0 +1,182 @@
+"""Trade history Views"""
+
+import csv
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from flexitrade.enums import TradeActionChoices
+from flexitrade.pagination import encode_cursor
+from flexitrade.queries import trade_history_queryset
+from flexitrade.reports import Echo
+from flexitrade.routers import replica_reads
+from flexitrade.stock_registry import get_stock
+from flexitrade.validators import TradeHistoryValidator
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+ACTION_NAMES = {
+    TradeActionChoices.BUY: "buy",
+    TradeActionChoices.SELL: "sell",
+}
+EXPORT_COLUMNS = ["id", "created", "symbol", "action", "quantity"]
+
+
+class TradeHistoryMixin:
+    """Mixin that validates the history filters and queries the trades"""
+
+    def history_filters(self, validator) -> Optional[Dict]:
+        """The arguments of `trade_history_queryset` for the filters, None
+        if no trade can match them
+
+        The symbol is resolved by the stock registry, so an unknown symbol
+        needs no query at all.
+        """
+        filters: Dict = dict(validator.cleaned_params())
+        filters.pop("limit", None)
+        symbol = filters.pop("symbol", None)
+        if symbol is not None:
+            stock = get_stock(symbol)
+            if stock is None:
+                return None
+            filters["stock_id"] = stock.id
+        return filters
+
+    def filtered_trades(self, request, validator) -> Optional[QuerySet]:
+        """The user's trades matching the filters, None if there are none"""
+        filters = self.history_filters(validator)
+        if filters is None:
+            return None
+        return trade_history_queryset(request.user, **filters)
+
+
+class TradeHistoryView(APIView, TradeHistoryMixin):
+    """List the user's trades, newest first, one page at a time
+
+    Pages are keyset paginated on (created, id): `next` is the URL of the
+    following page, or null on the last one. The trades are read from the
+    read replica, if there is one.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """Get a page of the user's trades"""
+        validator = TradeHistoryValidator(request.query_params)
+        if not validator.is_valid():
+            return Response(
+                validator.error_dict, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        limit = validator.cleaned_params()["limit"]
+        with replica_reads(request.user):
+            trades = self.filtered_trades(request, validator)
+            # One more than the page, to know if there's a next page
+            rows = list(trades[: limit + 1]) if trades is not None else []
+
+        next_url = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            trade_id, created = rows[-1][:2]
+            params = request.query_params.copy()
+            params["cursor"] = encode_cursor(created, trade_id)
+            next_url = request.build_absolute_uri(
+                f"{request.path}?{params.urlencode()}"
+            )
+
+        results = [
+            {
+                "id": trade_id,
+                "created": created,
+                "symbol": symbol,
+                "action": ACTION_NAMES[action],
+                "quantity": quantity,
+            }
+            for trade_id, created, symbol, action, quantity in rows
+        ]
+        return Response(
+            {"results": results, "next": next_url}, status=status.HTTP_200_OK
+        )
+
+
+class TradeHistoryExportView(APIView, TradeHistoryMixin):
+    """Stream the user's trades matching the filters as a CSV file
+
+    The trades are read `TRADE_EXPORT_CHUNK_SIZE` at a time, each chunk by a
+    keyset query from the end of the previous one, and written out as
+    they're read, so the memory used is the same whatever the number of
+    trades. Under ASGI the chunks are read by an async iterator, since a
+    sync one would be buffered whole. Like the history, the trades are read
+    from the read replica, if there is one.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _read_chunk(self, user, filters) -> List[Tuple]:
+        """The first chunk of the trades matching the filters"""
+        with replica_reads(user):
+            trades = trade_history_queryset(user, **filters)
+            return list(trades[: settings.TRADE_EXPORT_CHUNK_SIZE])
+
+    def _csv_chunk(self, writer, rows) -> str:
+        return "".join(
+            writer.writerow(
+                [
+                    trade_id,
+                    created.isoformat(),
+                    symbol,
+                    ACTION_NAMES[action],
+                    quantity,
+                ]
+            )
+            for trade_id, created, symbol, action, quantity in rows
+        )
+
+    def _next_filters(self, filters, rows) -> Optional[Dict]:
+        """The filters of the chunk after `rows`, None after the last one"""
+        if len(rows) < settings.TRADE_EXPORT_CHUNK_SIZE:
+            return None
+        trade_id, created = rows[-1][:2]
+        return {**filters, "after": (created, trade_id)}
+
+    def _csv_lines(self, user, filters) -> Iterator[str]:
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_COLUMNS)
+        while filters is not None:
+            rows = self._read_chunk(user, filters)
+            yield self._csv_chunk(writer, rows)
+            filters = self._next_filters(filters, rows)
+
+    async def _acsv_lines(self, user, filters) -> AsyncIterator[str]:
+        """Async version of `_csv_lines`"""
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_COLUMNS)
+        while filters is not None:
+            rows = await sync_to_async(self._read_chunk)(user, filters)
+            yield self._csv_chunk(writer, rows)
+            filters = self._next_filters(filters, rows)
+
+    def get(self, request):
+        """Export the user's trades, newest first"""
+        validator = TradeHistoryValidator(request.query_params)
+        if not validator.is_valid():
+            return Response(
+                validator.error_dict, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        filters = self.history_filters(validator)
+        if isinstance(request._request, ASGIRequest):
+            lines = self._acsv_lines(request.user, filters)
+        else:
+            lines = self._csv_lines(request.user, filters)
+        return StreamingHttpResponse(
+            lines,
+            content_type="text/csv",
+            headers={
+                "Content-Disposition": 'attachment; filename="trades.csv"'
+            },
+        )
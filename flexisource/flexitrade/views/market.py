@@ -0,0 +1,94 @@
+"""Market-wide Views"""
+
+from django.conf import settings
+from flexitrade.queries import (
+    load_market,
+    stock_rollup_queryset,
+    top_holders_queryset,
+    values_of,
+)
+from flexitrade.routers import replica_reads
+from flexitrade.stock_registry import get_stock
+from flexitrade.validators import MSG_LIMIT_NOT_NUMBER
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+class MarketView(APIView):
+    """List the net shares, holders and notional value of every stock
+
+    Read from the rollups and the deltas the trade paths append to them, so
+    the cost depends on the number of stocks, not on the number of holdings
+    or trades. The rollups are read from the read replica, if there is one.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """Get the market-wide position in every traded stock"""
+        with replica_reads(request.user):
+            market = load_market()
+        return Response(market, status=status.HTTP_200_OK)
+
+
+class TopHoldersView(APIView):
+    """The rollup of a stock and its largest holders, largest first
+
+    `limit` holders are listed, `MARKET_TOP_HOLDERS_LIMIT` if not given.
+    Read from the read replica, if there is one.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _limit(self, request) -> int:
+        """The number of holders to list. Raises ValueError if invalid"""
+        limit = request.query_params.get("limit")
+        if not limit:
+            return settings.MARKET_TOP_HOLDERS_LIMIT
+
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError(MSG_LIMIT_NOT_NUMBER)
+
+        max_limit = settings.MARKET_TOP_HOLDERS_MAX_LIMIT
+        if not 1 <= limit <= max_limit:
+            raise ValueError(f"limit must be between 1 and {max_limit}")
+        return limit
+
+    def get(self, request, symbol):
+        """Get the rollup and the top holders of the stock"""
+        try:
+            limit = self._limit(request)
+        except ValueError as exc:
+            return Response(
+                {"limit": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        stock = get_stock(symbol)
+        if stock is None:
+            return Response(
+                {"error": f"Unknown symbol {symbol}"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        with replica_reads(request.user):
+            rollup = list(stock_rollup_queryset(stock.id))
+            holders = [
+                {"username": username, "quantity": quantity}
+                for username, quantity in top_holders_queryset(stock.id, limit)
+            ]
+        net_shares, holder_count = rollup[0] if rollup else (0, 0)
+        (notional_value,) = values_of([net_shares], [stock.price])
+        return Response(
+            {
+                "symbol": symbol,
+                "net_shares": net_shares,
+                "holder_count": holder_count,
+                "price": stock.price,
+                "notional_value": notional_value,
+                "holders": holders,
+            },
+            status=status.HTTP_200_OK,
+        )
@@ -0,0 +1,41 @@
+"""Monitoring Views"""
+
+from django.conf import settings
+from django.http import HttpResponse
+from flexitrade.instrumentation import expose_metrics
+from flexitrade.portfolio_cache import portfolio_cache_stats
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class IsAllowedMetricsClient(permissions.BasePermission):
+    """Allow the client addresses of `METRICS_ALLOWED_IPS`
+
+    The address is the one the server sees: behind a proxy, that's the
+    proxy's.
+    """
+
+    def has_permission(self, request, view):
+        return request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+
+
+class MetricsView(APIView):
+    """View that exposes the metrics of this process to Prometheus
+
+    Only staff users and the addresses of `METRICS_ALLOWED_IPS` can read
+    them: the view names and volumes describe the traffic of every user.
+    """
+
+    permission_classes = [permissions.IsAdminUser | IsAllowedMetricsClient]
+
+    def get(self, request):
+        """The request histograms and the portfolio cache counters"""
+        lines = [expose_metrics()]
+        for event, count in portfolio_cache_stats().items():
+            name = f"flexitrade_portfolio_cache_{event}_total"
+            lines.append(f"# TYPE {name} counter\n{name} {count}\n")
+        return HttpResponse(
+            "".join(lines), content_type=PROMETHEUS_CONTENT_TYPE
+        )
@@ -0,0 +1,54 @@
+"""Stock price Views"""
+
+import pandas as pd
+from django.conf import settings
+from flexitrade.prices import upsert_prices
+from flexitrade.validators import PriceTickValidator
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+class PriceUpdateView(APIView):
+    """Update the prices of the stocks with a JSON array of ticks
+
+    Only staff users can move prices. Every tick is validated first, then
+    they're all upserted in one transaction, or none is.
+    """
+
+    COLUMNS = ["symbol", "price", "as_of"]
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def _validate_ticks(self, ticks):
+        """Checks on the shape of the payload, before any tick is read"""
+        if not isinstance(ticks, list) or not ticks:
+            raise ValueError("Expected a non-empty array of ticks")
+
+        if len(ticks) > settings.PRICE_UPDATE_MAX_TICKS:
+            raise ValueError(
+                "Update exceeds the maximum of "
+                f"{settings.PRICE_UPDATE_MAX_TICKS} ticks"
+            )
+
+        if not all(isinstance(tick, dict) for tick in ticks):
+            raise ValueError("Every tick must be an object")
+
+    def post(self, request):
+        """Upsert the ticks and set the current price of their stocks"""
+        try:
+            self._validate_ticks(request.data)
+        except ValueError as exc:
+            return Response(
+                {"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        df = pd.DataFrame.from_records(request.data, columns=self.COLUMNS)
+        ticks_validator = PriceTickValidator(df)
+        if not ticks_validator.is_valid():
+            return Response(
+                ticks_validator.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        written = upsert_prices(ticks_validator.valid_ticks)
+        return Response({"written": written}, status=status.HTTP_201_CREATED)
@@ -1,56 +1,148 @@
 """Trading-related Views"""
 
-import os
 import random
-from copy import deepcopy
-from datetime import datetime
-from pprint import pprint
-from typing import Dict, List, Tuple
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 import pandas as pd
-from django.db import transaction
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.http import StreamingHttpResponse
 from flexitrade.enums import TradeActionChoices
-from flexitrade.models import Stock, Trade
-from flexitrade.queries import load_portfolio
-from flexitrade.validators import TradeValidator
+from flexitrade.formats import file_format, read_bulk_file
+from flexitrade.holdings import (
+    OversellError,
+    apply_deltas,
+    apply_trade,
+    lock_owned_shares,
+    signed_quantity,
+)
+from flexitrade.instrumentation import timed, timed_iter
+from flexitrade.jobs import get_job_progress, run_bulk_trade_job
+from flexitrade.journal import journal_trades
+from flexitrade.ledger import (
+    MSG_SKIPPED,
+    is_applied,
+    key_errors,
+    ledger_keys,
+    record_keys,
+)
+from flexitrade.models import BulkTradeJob, Stock, Trade
+from flexitrade.portfolio_cache import aget_portfolio
+from flexitrade.queries import chunked, load_portfolio
+from flexitrade.reports import error_rows_csv, partial_report
+from flexitrade.routers import areplica_reads
+from flexitrade.serializers import BulkTradeJobSerializer
+from flexitrade.snapshots import load_portfolio_as_of
+from flexitrade.stock_registry import get_or_create_stock, get_stocks
+from flexitrade.validators import (
+    BulkTradeValidator,
+    TradeValidator,
+    oversell_message,
+    parse_timestamp,
+)
 from rest_framework import permissions, status
 from rest_framework.parsers import FileUploadParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 
-class PortfolioView(APIView):
-    """Veiw that loads a user's entire portofolio"""
+class PortfolioView(AsyncAPIView):
+    """Veiw that loads a user's entire portofolio
+
+    Async, so under ASGI a worker doesn't hold a thread per waiting poll.
+    With an `as_of` ISO 8601 datetime, the portfolio at that time is loaded
+    from the holding snapshots instead, valued at the prices of that time.
+    With a `priced_at` one, the portfolio is valued at the prices of then.
+    It's read from the read replica, if there is one.
+    """
 
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request):
+    async def get(self, request):
         """Get the whole porfolio of the user"""
-        portfolio_data = load_portfolio(request.user)
+        timestamps = {}
+        for key in ("as_of", "priced_at"):
+            value = request.query_params.get(key)
+            if value is None:
+                continue
+            try:
+                timestamps[key] = parse_timestamp(value)
+            except ValueError:
+                return Response(
+                    {key: [f"{key} must be an ISO 8601 datetime"]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        as_of = timestamps.get("as_of")
+        priced_at = timestamps.get("priced_at")
+        async with areplica_reads(request.user):
+            if as_of is not None:
+                portfolio_data = await sync_to_async(load_portfolio_as_of)(
+                    request.user, as_of, priced_at
+                )
+            elif priced_at is not None:
+                portfolio_data = await sync_to_async(load_portfolio)(
+                    request.user, priced_at
+                )
+            else:
+                portfolio_data = await aget_portfolio(request.user)
         return Response(portfolio_data, status=status.HTTP_200_OK)
 
 
 class TradeExecutionMixin:
     """Mixin that allows implementing classes to execute trades."""
 
+    BULK_CREATE_BATCH_SIZE = 1000
+
     def execute_trade(self, params):
         """Create a Trade objects after validating that it can execute
 
-        If the stock doesn't yet exist, create it
+        If the stock doesn't yet exist, create it. The stock is resolved by
+        the stock registry, so it's usually not queried at all. The user's
+        holding of the stock is updated in the same transaction as the trade,
+        and the trade is journaled once it commits.
+
+        A sell is checked again with the holding locked, since a concurrent
+        sell may have taken the shares after validation. Raises
+        `OversellError` if it did; nothing is written then.
         """
         random_price = random.uniform(1, 1000)
-        stock_obj, _ = Stock.objects.get_or_create(
-            ticker_symbol=params["symbol"],
-            defaults={"price": random_price},
-        )
+        with transaction.atomic():
+            stock_id = get_or_create_stock(
+                params["symbol"], defaults={"price": random_price}
+            ).id
+
+            if params["action"] == TradeActionChoices.SELL:
+                owned_shares = lock_owned_shares(params["owner"], stock_id)
+                if params["quantity"] > owned_shares:
+                    raise OversellError(
+                        oversell_message(
+                            params["quantity"], params["symbol"], owned_shares
+                        )
+                    )
+
+            trade = Trade.objects.create(
+                actor=params["owner"],
+                stock_id=stock_id,
+                action=params["action"],
+                quantity=params["quantity"],
+            )
+            journal_trades([trade])
+            apply_trade(
+                params["owner"],
+                stock_id,
+                params["action"],
+                params["quantity"],
+            )
 
-        Trade.objects.create(
-            actor=params["owner"],
-            stock=stock_obj,
-            action=params["action"],
-            quantity=params["quantity"],
-        )
+        return self.trade_message(params)
 
+    def trade_message(self, params) -> str:
+        """Describe an executed trade to the user"""
         verb = (
             "bought" if params["action"] == TradeActionChoices.BUY else "sold"
         )
@@ -60,40 +152,178 @@ class TradeExecutionMixin:
         )
         return msg
 
+    def get_or_create_stocks(self, symbols) -> Dict[str, int]:
+        """Map every symbol to its stock id, creating the missing stocks
+
+        Known stocks come from the stock registry. The missing stocks are
+        created with one `bulk_create`. Conflicts from concurrent writers are
+        ignored, and the stocks are re-read and registered afterwards.
+        """
+        symbols = set(symbols)
+        stock_ids = {}
+        for symbols_chunk in chunked(symbols):
+            stock_ids.update(
+                (symbol, stock.id)
+                for symbol, stock in get_stocks(symbols_chunk).items()
+            )
+
+        missing = symbols - stock_ids.keys()
+        if missing:
+            Stock.objects.bulk_create(
+                [
+                    Stock(
+                        ticker_symbol=symbol,
+                        price=random.uniform(1, 1000),
+                    )
+                    for symbol in missing
+                ],
+                batch_size=self.BULK_CREATE_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            for symbols_chunk in chunked(missing):
+                created = get_stocks(symbols_chunk)
+                stock_ids.update(
+                    (symbol, stock.id) for symbol, stock in created.items()
+                )
+
+        return stock_ids
+
+    def bulk_execute_trades(self, trades_to_execute) -> Tuple[bool, Dict]:
+        """Execute the trades in one atomic DB transaction
+
+        The work is set-based: the stocks are resolved in one pass, the trades
+        are inserted with chunked `bulk_create`, and the net change per
+        holding is applied at once. Either every trade is written or none.
+        """
+        executed_trades: Dict[int, str] = {}
+        try:
+            with transaction.atomic():
+                stock_ids = self.get_or_create_stocks(
+                    params["symbol"] for params in trades_to_execute
+                )
+
+                trades = []
+                deltas = defaultdict(int)
+                for params in trades_to_execute:
+                    stock_id = stock_ids[params["symbol"]]
+                    trades.append(
+                        Trade(
+                            actor=params["owner"],
+                            stock_id=stock_id,
+                            action=params["action"],
+                            quantity=params["quantity"],
+                        )
+                    )
+                    key = (params["owner"].pk, stock_id)
+                    deltas[key] += signed_quantity(
+                        params["action"], params["quantity"]
+                    )
+
+                Trade.objects.bulk_create(
+                    trades, batch_size=self.BULK_CREATE_BATCH_SIZE
+                )
+                journal_trades(trades)
+                apply_deltas(deltas)
+        except Exception as err:
+            return (False, {"error": f"Write failure {str(err)}"})
+
+        for index, params in enumerate(trades_to_execute):
+            executed_trades[index] = self.trade_message(params)
 
-class PlaceSingleTradeView(APIView, TradeExecutionMixin):
-    """Place a trade as a User"""
+        return (True, executed_trades)
+
+
+class PlaceSingleTradeView(AsyncAPIView, TradeExecutionMixin):
+    """Place a trade as a User
+
+    The validation is async. The trade is written by the sync ORM, since the
+    async ORM can't run transactions or lock rows yet.
+    """
 
     permission_classes = [permissions.IsAuthenticated]
 
-    def post(self, request):
+    async def post(self, request):
         """The view that places a trade on behalf of a user"""
 
-        params = deepcopy(request.data)
-        params["username"] = request.user.username
-        trade_validator = TradeValidator(params)
+        trade_validator = TradeValidator(request.data, owner=request.user)
 
-        if not trade_validator.is_valid():
+        if not await trade_validator.ais_valid():
             return Response(
                 trade_validator.error_dict, status=status.HTTP_400_BAD_REQUEST
             )
 
-        msg = self.execute_trade(trade_validator.cleaned_params())
+        try:
+            msg = await sync_to_async(self.execute_trade)(
+                trade_validator.cleaned_params()
+            )
+        except OversellError as exc:
+            return Response(
+                {"sell": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST
+            )
         return Response({"message": msg}, status=status.HTTP_201_CREATED)
 
 
+class PlaceTradeBatchView(APIView, TradeExecutionMixin):
+    """Place a basket of trades, given as a JSON array of orders
+
+    The orders are validated together, like the rows of a bulk trade file,
+    so the number of queries doesn't grow with the number of orders. They
+    are executed in one transaction: either every order is placed or none.
+    """
+
+    COLUMNS = ["symbol", "quantity", "action"]
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _validate_orders(self, orders):
+        """Checks on the shape of the payload, before any order is read"""
+        if not isinstance(orders, list) or not orders:
+            raise ValueError("Expected a non-empty array of orders")
+
+        if len(orders) > settings.TRADE_BATCH_MAX_ORDERS:
+            raise ValueError(
+                "Batch exceeds the maximum of "
+                f"{settings.TRADE_BATCH_MAX_ORDERS} orders"
+            )
+
+        if not all(isinstance(order, dict) for order in orders):
+            raise ValueError("Every order must be an object")
+
+    def post(self, request):
+        """Place every order of the batch on behalf of the user"""
+        try:
+            self._validate_orders(request.data)
+        except ValueError as exc:
+            return Response(
+                {"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        df = pd.DataFrame.from_records(request.data, columns=self.COLUMNS)
+        trades_validator = BulkTradeValidator(df, owner=request.user)
+        if not trades_validator.is_valid():
+            return Response(
+                trades_validator.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        is_ok, payload = self.bulk_execute_trades(
+            trades_validator.valid_trades
+        )
+        if not is_ok:
+            return Response(payload, status=status.HTTP_400_BAD_REQUEST)
+        return Response(payload, status=status.HTTP_201_CREATED)
+
+
 class PlaceBulkTrade(APIView, TradeExecutionMixin):
-    """Place multiple trades by taking a CSV
+    """Place multiple trades by taking a CSV, Parquet or Arrow file
 
     Since the database write will be done all at once, each line must be
-    validated the trades are executed.
+    validated the trades are executed. The file is read in chunks of
+    `BULK_TRADE_CHUNK_SIZE` rows, up to `BULK_TRADE_MAX_ROWS` rows.
 
     Reference:
     https://dev.to/frankezenwanne/how-to-upload-a-csv-file-to-django-rest-28fo
     """
 
-    LOCAL_CSV_FILE_PATH = f"{os.getcwd()}/bulk_order_local.csv"
-
     parser_classes = [FileUploadParser]
     permission_classes = [permissions.IsAuthenticated]
 
@@ -102,28 +332,173 @@ class PlaceBulkTrade(APIView, TradeExecutionMixin):
         if not csv_file:
             raise ValueError("No file provided")
 
-        if not csv_file.name.endswith(".csv"):
-            raise ValueError("File is not CSV type")
+        file_format(csv_file.name)
+
+    def _parse_file_for_trades(self, df, username) -> Tuple[List, Dict]:
+        """Parse the provided dataframe for trades and perform validation
 
-    def _parse_file_for_trades(self, df, username) -> Tuple[Dict, Dict]:
-        """Parse the provided dataframe for trades and perform validation"""
+        The whole dataframe is validated as one batch, so sells are checked
+        against the buys and sells of the earlier rows too.
+        """
+        trades_validator = BulkTradeValidator(df, username)
+        trades_validator.is_valid()
 
-        headers = ["symbol", "quantity", "action", "username"]
-        valid_trades: List[Dict] = []
-        errors: Dict[str, str] = {}
+        return (trades_validator.valid_trades, trades_validator.errors)
 
-        for index, row_data in df.iterrows():
-            params = {key: row_data.get(key) for key in headers}
-            if username is not None:
-                params["username"] = username
-            trade_validator = TradeValidator(params)
+    def commit_rows(self, trades, keys=None) -> Optional[str]:
+        """Write trades and their ledger keys in one transaction
 
-            if not trade_validator.is_valid():
-                errors[index] = trade_validator.error_dict
+        Returns the error if nothing could be written, None otherwise.
+        """
+        try:
+            with transaction.atomic():
+                is_ok, payload = self.bulk_execute_trades(trades)
+                if not is_ok:
+                    transaction.set_rollback(True)
+                    return payload["error"]
+                if keys is not None:
+                    record_keys(keys)
+        except DatabaseError as err:
+            return f"Write failure {str(err)}"
+        return None
+
+    def commit_chunk(self, indexes, trades, keys=None) -> Tuple[Dict, Dict]:
+        """Commit the valid rows of a chunk, isolating the ones that fail
+
+        The rows are committed together. If that fails, only this chunk is
+        retried, one row per transaction, so that the rows that can't be
+        written are reported and all the others are still committed.
+        Returns the executed trades and the errors, keyed by row index.
+        """
+        if self.commit_rows(trades, keys) is None:
+            executed_trades = {
+                index: self.trade_message(params)
+                for index, params in zip(indexes, trades)
+            }
+            return (executed_trades, {})
+
+        executed_trades, errors = {}, {}
+        for index, params in zip(indexes, trades):
+            row_keys = keys.loc[[index]] if keys is not None else None
+            error = self.commit_rows([params], row_keys)
+            if error is None:
+                executed_trades[index] = self.trade_message(params)
             else:
-                valid_trades.append(trade_validator.cleaned_params())
-
-        return (valid_trades, errors)
+                errors[index] = {"write": [error]}
+        return (executed_trades, errors)
+
+    def ingest_file(
+        self,
+        csv_file,
+        username,
+        on_progress: Callable = None,
+        file_hash: str = None,
+        partial: bool = False,
+    ) -> Tuple[Dict, Dict]:
+        """Stream the file in bounded chunks, validating and staging each one
+
+        Every chunk is validated and then written inside one transaction, so
+        the sells of a chunk are checked against the rows of earlier chunks
+        and only one chunk is held in memory at a time. If any row is invalid
+        or the file is too long, the whole transaction is rolled back.
+
+        With `partial`, the valid rows of every chunk are committed instead
+        (see `commit_chunk`) and the invalid ones are only reported. A file
+        that is too long is processed up to the maximum number of rows.
+
+        Rows already in the ingestion ledger, by order id or by `file_hash`
+        and row number, are skipped; the executed rows are added to it. An
+        order id repeated in the file is an error of the rows that repeat it.
+
+        `on_progress(rows_validated, rows_staged)` is called after each chunk.
+        Returns the errors and the executed trades, keyed by row index.
+        """
+        errors: Dict = {}
+        executed_trades: Dict[int, str] = {}
+        row_count = 0
+        rows_staged = 0
+        seen_keys = {}
+
+        outer_transaction = nullcontext() if partial else transaction.atomic()
+        with outer_transaction, read_bulk_file(csv_file) as reader:
+            for df in timed_iter(reader, "parse"):
+                row_count += len(df)
+                if row_count > settings.BULK_TRADE_MAX_ROWS:
+                    msg = (
+                        "File exceeds the maximum of "
+                        f"{settings.BULK_TRADE_MAX_ROWS} rows"
+                    )
+                    if not partial:
+                        errors = {}
+                    errors["error"] = msg
+                    break
+
+                keys = ledger_keys(df, file_hash, username)
+                if keys is not None:
+                    with timed("ledger"):
+                        duplicates = key_errors(keys, seen_keys)
+                        applied = is_applied(keys)
+                    errors.update(duplicates)
+                    rejected = df.index.isin(list(duplicates))
+                    if partial or not errors:
+                        executed_trades.update(
+                            dict.fromkeys(
+                                df.index[applied & ~rejected], MSG_SKIPPED
+                            )
+                        )
+                    is_new = ~applied & ~rejected
+                    df, keys = df[is_new], keys[is_new]
+
+                with timed("validate"):
+                    valid_trades, chunk_errors = self._parse_file_for_trades(
+                        df, username
+                    )
+                errors.update(chunk_errors)
+
+                if partial:
+                    indexes = df.index[~df.index.isin(list(chunk_errors))]
+                    valid_keys = None
+                    if keys is not None:
+                        valid_keys = keys.drop(list(chunk_errors))
+                    with timed("insert"):
+                        chunk_executed, write_errors = self.commit_chunk(
+                            indexes, valid_trades, valid_keys
+                        )
+                    errors.update(write_errors)
+                    executed_trades.update(chunk_executed)
+                    rows_staged += len(chunk_executed)
+                    if on_progress:
+                        on_progress(row_count, rows_staged)
+                    continue
+
+                # Valid rows are staged even after errors are found, so the
+                # sells of later rows are still validated correctly.
+                with timed("insert"):
+                    is_ok, payload = self.bulk_execute_trades(valid_trades)
+                if not is_ok:
+                    errors = payload
+                    break
+                if not errors:
+                    executed_trades.update(zip(df.index, payload.values()))
+                if keys is not None:
+                    try:
+                        # A savepoint, so a key recorded concurrently ends
+                        # the file with an error instead of a broken
+                        # transaction
+                        with timed("ledger"), transaction.atomic():
+                            record_keys(keys.drop(list(chunk_errors)))
+                    except IntegrityError as err:
+                        errors = {"error": f"Write failure {str(err)}"}
+                        break
+
+                rows_staged += len(valid_trades)
+                if on_progress:
+                    on_progress(row_count, rows_staged)
+
+            if errors and not partial:
+                transaction.set_rollback(True)
+
+        return (errors, dict(sorted(executed_trades.items())))
 
     def post(self, request):
         csv_file = request.FILES.get("file")
@@ -134,56 +509,117 @@ class PlaceBulkTrade(APIView, TradeExecutionMixin):
                 {"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        df = pd.read_csv(csv_file, delimiter=",", dtype=str)
-        df = df.where(pd.notnull(df), None)
-        valid_trades, errors = self._parse_file_for_trades(
-            df, request.user.username
-        )
+        partial = request.query_params.get("mode") == "partial"
+        if request.query_params.get("async", "").lower() in ("1", "true"):
+            return self.start_job(request.user, csv_file, partial)
 
+        try:
+            errors, executed_trades = self.ingest_file(
+                csv_file, request.user.username, partial=partial
+            )
+        except ValueError as err:
+            return Response(
+                {"error": f"Read failure {str(err)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if partial:
+            return self.partial_response(
+                request, csv_file, errors, executed_trades
+            )
         if errors:
             return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(executed_trades, status=status.HTTP_201_CREATED)
 
-        is_ok, payload = self.bulk_execute_trades(valid_trades)
-        if not is_ok:
-            return Response(payload, status=status.HTTP_400_BAD_REQUEST)
-        return Response(payload, status=status.HTTP_201_CREATED)
+    def partial_response(self, request, csv_file, errors, executed_trades):
+        """The counts and rejected rows, or the rejected rows as a CSV file"""
+        if request.query_params.get("report") == "csv":
+            return error_rows_response(csv_file, errors)
 
-    def bulk_execute_trades(self, trades_to_execute) -> Tuple[bool, Dict]:
-        """Execute the trades in one atomic DB transaction"""
-        executed_trades: Dict[str] = {}
-        try:
-            with transaction.atomic():
-                for index, params in enumerate(trades_to_execute):
-                    msg = self.execute_trade(params)
-                    executed_trades[index] = msg
-        except Exception as err:
-            return (False, {"error": f"Write failure {str(err)}"})
+        report = partial_report(errors, executed_trades)
+        if not errors:
+            return Response(report, status=status.HTTP_201_CREATED)
+        if report["executed"] or report["skipped"]:
+            return Response(report, status=status.HTTP_200_OK)
+        return Response(report, status=status.HTTP_400_BAD_REQUEST)
 
-        return (True, executed_trades)
+    def start_job(self, owner, csv_file, partial=False):
+        """Store the file and hand it to a worker, instead of waiting for it
 
-    def process_from_local_file(self):
-        """Process a csv file locally"""
-        with open(self.LOCAL_CSV_FILE_PATH) as csv_file:
-            self._validate_file(csv_file)
-            df = pd.read_csv(csv_file, delimiter=",", dtype=str)
-            df = df.where(pd.notnull(df), None)
-            valid_trades, errors = self._parse_file_for_trades(
-                df, username=None
+        The job's progress is polled on `/bulk_trade/<job_id>/`.
+        """
+        job = BulkTradeJob.objects.create(
+            owner=owner, file=csv_file, partial=partial
+        )
+        transaction.on_commit(lambda: run_bulk_trade_job.delay(job.pk))
+
+        payload = BulkTradeJobSerializer(job).data
+        return Response(payload, status=status.HTTP_202_ACCEPTED)
+
+
+def error_rows_response(
+    csv_file, errors, close_file=False
+) -> StreamingHttpResponse:
+    """Stream the failed rows of the file, see `error_rows_csv`
+
+    With `close_file`, the file is opened when the response starts and
+    closed when it's closed, however far it was read.
+    """
+    if close_file:
+        lines = _closing_lines(csv_file, errors)
+    else:
+        lines = error_rows_csv(csv_file, errors)
+    return StreamingHttpResponse(
+        lines,
+        content_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="errors.csv"'},
+    )
+
+
+def _closing_lines(stored_file, errors) -> Iterator[str]:
+    # Django closes the iterator of a streaming response, whether it was
+    # read to the end or not, which exits the `with` block
+    with stored_file.open("rb") as opened_file:
+        yield from error_rows_csv(opened_file, errors)
+
+
+class BulkTradeJobView(APIView):
+    """Report the progress of a bulk trade job"""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        """Get the status, counters and errors of one of the user's jobs"""
+        job = BulkTradeJob.objects.filter(
+            pk=job_id, owner=request.user
+        ).first()
+        if job is None:
+            return Response(
+                {"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        if errors:
-            print(f"\n\n[{datetime.now().isoformat()}] ", end="")
-            print("Bulk parse from local file failed")
-            pprint(errors)
-            return
+        payload = BulkTradeJobSerializer(job).data
+        payload.update(get_job_progress(job))
+        return Response(payload, status=status.HTTP_200_OK)
 
-        is_ok, payload = self.bulk_execute_trades(valid_trades)
-        if not is_ok:
-            print(f"\n\n[{datetime.now().isoformat()}] ", end="")
-            print("Bulk trade from local file failed")
-            pprint(payload)
-
-        else:
-            print(f"\n\n[{datetime.now().isoformat()}] ", end="")
-            print("Bulk trade successful")
-            pprint(payload)
+
+class BulkTradeJobErrorsView(APIView):
+    """Export the rejected rows of a finished bulk trade job as a CSV file"""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        """Get the rows of the job's file that failed, with their errors"""
+        job = BulkTradeJob.objects.filter(
+            pk=job_id, owner=request.user
+        ).first()
+        if job is None:
+            return Response(
+                {"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        # Row numbers are stored as strings in the JSON column
+        errors = {
+            int(key) if key.isdigit() else key: row_error
+            for key, row_error in job.errors.items()
+        }
+        return error_rows_response(job.file, errors, close_file=True)